@@ -12,13 +12,11 @@ import sqlite3
 import string
 import threading
 import time
-import traceback
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 # Third-party imports
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 from werkzeug.security import generate_password_hash, check_password_hash
-import requests
 
 # Optional third-party imports
 try:
@@ -26,9 +24,16 @@ try:
 except ImportError:
     websockets = None
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Local application imports
 from utils.logger import get_bclient_logger, setup_print_redirect
 from utils.config_manager import get_nsn_url, get_nsn_host, get_nsn_port
+from utils import json_provider
+from utils.json_provider import OrjsonProvider
 
 # Set up log redirection immediately (takes effect on module import)
 logger = get_bclient_logger('app')
@@ -42,6 +47,11 @@ logger.info("B-Client application module imported")
 if websockets is None:
     logger.warning("WebSocket dependencies not available. Install with: pip install websockets")
 
+# Use uvloop for every event loop created from here on (WebSocket server thread, session sends)
+if uvloop is not None:
+    uvloop.install()
+    logger.info("uvloop event loop policy installed")
+
 def safe_close_websocket(websocket, reason="Connection closed"):
     """
     Universal function for safely closing WebSocket connections
@@ -75,10 +85,10 @@ def safe_close_websocket(websocket, reason="Connection closed"):
 from services.models import db, UserCookie, UserAccount, init_db
 
 # Import service modules
-from services.nsn_client import NSNClient
-from services.db_operations import save_cookie_to_db as db_save_cookie, save_account_to_db as db_save_account
+from services.nsn_client import NSNClient, create_nsn_session
+from services.db_operations import save_cookie_to_db as db_save_cookie, save_account_to_db as db_save_account, store_login_cookie
 from services.websocket_client import CClientWebSocketClient, init_websocket_client
-from services.websocket_server import start_websocket_server, init_websocket_server
+from services.websocket_server import start_websocket_server, init_websocket_server, register_background_task, schedule_background_task_fallback
 from services.sync_manager import SyncManager
 from services.cluster_verification import init_cluster_verification, cluster_verification_service
 from services.nodeManager import NodeManager
@@ -99,6 +109,13 @@ app.config['SECRET_KEY'] = 'b-client-enterprise-secret-key'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///b_client_secure.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Bound request body size so oversized JSON payloads are rejected before parsing
+app.config['MAX_CONTENT_LENGTH'] = 256 * 1024
+
+# Use orjson for request parsing and jsonify responses (falls back to stdlib json)
+app.json_provider_class = OrjsonProvider
+app.json = OrjsonProvider(app)
+
 # Initialize database
 init_db(app)
 
@@ -220,7 +237,7 @@ def get_cookies():
 @app.route('/api/cookies', methods=['POST'])
 def add_cookie():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         required_fields = ['user_id', 'username', 'cookie']
         for field in required_fields:
             if field not in data:
@@ -277,7 +294,7 @@ def get_accounts():
 @app.route('/api/accounts', methods=['POST'])
 def add_account():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         required_fields = ['user_id', 'username', 'website', 'account', 'password']
         for field in required_fields:
             if field not in data:
@@ -348,7 +365,7 @@ def delete_account(user_id, username, website, account):
 @app.route('/api/config/environment', methods=['POST'])
 def set_environment():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         environment = data.get('environment', 'local')
         
         # Save environment to config file
@@ -423,7 +440,7 @@ def database_info():
 def trigger_node_offline():
     """Trigger node offline cleanup"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         node_id = data.get('node_id')
         
         if not node_id:
@@ -450,7 +467,7 @@ def trigger_node_offline():
 class NSNClient:
     def __init__(self):
         self.base_url = self.get_nsn_url()
-        self.session = requests.Session()
+        self.session = create_nsn_session()
     
     def get_nsn_url(self):
         """Get NSN URL based on current environment"""
@@ -764,8 +781,7 @@ class NSNClient:
                 return {'success': False, 'error': f'Signup to website failed: Login failed with HTTP {login_response.status_code}'}
                 
         except Exception as e:
-            logger.error(f"Registration error: {e}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.error(f"Registration error: {e}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
 # Initialize NSN client
@@ -795,22 +811,20 @@ init_nsn_api_routes(db, UserCookie, nsn_client)
 init_c_client_api_routes(c_client_ws)
 # Note: init_bind_routes and send_session_to_client injection will be called after send_session_to_client is defined
 
-# Start WebSocket server when app starts (only in local mode)
-# In ASGI mode (production), WebSocket handling is integrated into ASGI app
+# WebSocket server, NodeManager and cleanup task are started by start_services() (end of module)
 from utils.config_manager import get_current_environment
 environment = get_current_environment()
-if environment == 'local':
-    start_websocket_server()
-else:
-    print(f"🔧 [App] ASGI mode detected - WebSocket handling integrated into ASGI app")
-    logger.info("ASGI mode detected - WebSocket handling integrated into ASGI app")
+
+# Short-lived cache for /api/nsn/status (polled by dashboards)
+_NSN_STATUS_TTL = 3.0
+_nsn_status_cache = {'t': 0.0, 'url': None, 'v': None}
 
 # NSN API Routes
 @app.route('/api/nsn/user-info', methods=['POST'])
 def nsn_user_info():
     """Query user information from NSN"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         username = data.get('username')
         
         if not username:
@@ -825,7 +839,7 @@ def nsn_user_info():
 def nsn_current_user():
     """Get current user from NSN"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         session_cookie = data.get('session_cookie')
         
         if not session_cookie:
@@ -840,7 +854,7 @@ def nsn_current_user():
 def nsn_login():
     """Login to NSN with NMP parameters"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         username = data.get('username')
         password = data.get('password')
         nmp_params = data.get('nmp_params', {})
@@ -853,6 +867,9 @@ def nsn_login():
         result = nsn_client.login_with_nmp(username, password, nmp_params)
         
         if result['success']:
+            # Take one timestamp for the whole request
+            now_ms = int(time.time() * 1000)
+            
             # Store session data in database (like original B-Client)
             session_data = {
                 'nsn_session_data': {
@@ -863,89 +880,96 @@ def nsn_login():
                     'nmp_user_id': nmp_params.get('nmp_user_id'),
                     'nmp_username': nmp_params.get('nmp_username'),
                     'nmp_client_type': 'c-client',
-                    'nmp_timestamp': str(int(time.time() * 1000))
+                    'nmp_timestamp': str(now_ms)
                 },
                 'nsn_user_id': result.get('user_info', {}).get('user_id'),
                 'nsn_username': username,
                 'nsn_role': result.get('user_info', {}).get('role', 'traveller'),
-                'timestamp': int(time.time() * 1000)
+                'timestamp': now_ms
             }
             
+            # Encode once so the stored cookie doesn't re-serialize the dict
+            session_json = json_provider.dumps(session_data)
+            
             # Store in user_cookies table
             if user_id:
                 try:
-                    # Delete existing cookie for this user
-                    UserCookie.query.filter_by(user_id=user_id).delete()
-                    
-                    # Add new cookie
-                    cookie = UserCookie(
-                        user_id=user_id,
-                        username=username,
-                        cookie=json.dumps(session_data),
-                        auto_refresh=True,
-                        refresh_time=datetime.now()
-                    )
-                    
-                    db.session.add(cookie)
-                    db.session.commit()
+                    store_login_cookie(db, UserCookie, user_id, username, session_json,
+                                       datetime.fromtimestamp(now_ms / 1000))
                     
                     result['session_data'] = session_data
                     logger.info(f"Stored NSN session for user: {username}")
                 except Exception as e:
+                    db.session.rollback()
                     logger.warning(f"Failed to store session: {e}")
         
         return jsonify(result)
     except Exception as e:
+        logger.error(f"NSN login error: {e}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/nsn/status')
+@app.route('/api/nsn/status', provide_automatic_options=False)
 def nsn_status():
     """Check NSN server status"""
+    # Serve recent results from cache so dashboard polling doesn't hit NSN every time
+    now = time.monotonic()
+    cached = _nsn_status_cache
+    if cached['v'] is not None and cached['url'] == nsn_client.base_url and now - cached['t'] < _NSN_STATUS_TTL:
+        response = jsonify(cached['v'])
+        response.headers['Cache-Control'] = f'max-age={int(_NSN_STATUS_TTL)}'
+        return response
+    
     try:
         # Try to access NSN root page instead of /api/health which doesn't exist in production
         url = f"{nsn_client.base_url}/"
         logger.info(f"NSN Status Check: Attempting to access {url}")
         
-        response = requests.get(url, timeout=10)
+        response = nsn_client.session.get(url, timeout=10)
         logger.info(f"NSN Status Check: Response status {response.status_code}")
 
         if response.status_code == 200:
             logger.info("NSN Status Check: Success - NSN is online")
-            return jsonify({
+            payload = {
                 'success': True,
                 'nsn_url': nsn_client.base_url,
                 'status': 'online',
                 'response_time': response.elapsed.total_seconds()
-            })
+            }
         else:
             logger.warning(f"NSN Status Check: Failed - HTTP {response.status_code}")
-            return jsonify({
+            payload = {
                 'success': False,
                 'nsn_url': nsn_client.base_url,
                 'status': 'offline',
                 'error': f'HTTP {response.status_code}'
-            })
+            }
     except Exception as e:
         logger.error(f"NSN Status Check: Exception occurred - {str(e)}")
-        return jsonify({
+        payload = {
             'success': False,
             'nsn_url': nsn_client.base_url,
             'status': 'offline',
             'error': str(e)
-        })
+        }
+    
+    _nsn_status_cache.update({'t': now, 'url': nsn_client.base_url, 'v': payload})
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = f'max-age={int(_NSN_STATUS_TTL)}'
+    return response
 
 # Note: B-Client info route has been moved to routes/b_client_api_routes.py
 
 # C-Client WebSocket API Routes
-@app.route('/api/c-client/status')
+@app.route('/api/c-client/status', provide_automatic_options=False)
 def c_client_status():
     """Check C-Client WebSocket server status and connected clients"""
+    timestamp = datetime.utcnow().isoformat()
     if not c_client_ws:
         return jsonify({
             'success': False,
             'error': 'WebSocket functionality not available',
             'connected': False,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': timestamp
         })
     
     # Get connection info using the new method
@@ -960,7 +984,7 @@ def c_client_status():
             'status': 'running'
         },
         'connected_clients': connection_info,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': timestamp
     })
 
 
@@ -968,7 +992,7 @@ def c_client_status():
 def c_client_update_cookie():
     """Update cookie in C-Client via WebSocket"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         username = data.get('username')
         cookie = data.get('cookie')
@@ -997,7 +1021,7 @@ def c_client_update_cookie():
 def c_client_notify_login():
     """Notify C-Client of user login via WebSocket"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         username = data.get('username')
         session_data = data.get('session_data', {})
@@ -1025,7 +1049,7 @@ def c_client_notify_login():
 def c_client_notify_logout():
     """Notify C-Client of user logout via WebSocket"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         username = data.get('username')
 
@@ -1052,7 +1076,7 @@ def c_client_notify_logout():
 def c_client_sync_session():
     """Sync session data with C-Client via WebSocket"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         session_data = data.get('session_data', {})
 
@@ -1078,16 +1102,18 @@ def c_client_sync_session():
 def websocket_check_user():
     """Check if a user is connected to the WebSocket server"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         
         if not user_id:
             return jsonify({'success': False, 'error': 'user_id is required'}), 400
         
-        logger.info(f"Checking WebSocket connection for user_id: {user_id}")
+        logger.debug(f"Checking WebSocket connection for user_id: {user_id}")
         
-        # Check if user exists in user_connections pool
-        user_connected = user_id in c_client_ws.user_connections
+        # Look up the user's connections once so connected/count stay consistent
+        connections = c_client_ws.user_connections.get(user_id)
+        connection_count = len(connections) if connections else 0
+        user_connected = connection_count > 0
         
         # Get WebSocket URL from configuration
         websocket_host = c_client_ws.config.get('server_host', '127.0.0.1')
@@ -1095,8 +1121,7 @@ def websocket_check_user():
         websocket_url = f"ws://{websocket_host}:{websocket_port}"
         
         if user_connected:
-            connections = c_client_ws.user_connections.get(user_id, [])
-            logger.info(f"User {user_id} is connected with {len(connections)} connections")
+            logger.info(f"User {user_id} is connected with {connection_count} connections")
         else:
             logger.info(f"User {user_id} is not connected to WebSocket")
         
@@ -1105,17 +1130,16 @@ def websocket_check_user():
             'connected': user_connected,
             'websocket_url': websocket_url,
             'user_id': user_id,
-            'connection_count': len(c_client_ws.user_connections.get(user_id, [])) if user_connected else 0
+            'connection_count': connection_count
         })
         
     except Exception as e:
+        logger.error(f"Error checking WebSocket user connection: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 # Note: NMP Bind API Endpoint has been moved to routes/bind_routes.py
 # This is the core business logic endpoint that handles signup/login integration
 
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        return jsonify({'success': False, 'error': str(e)}), 500
-
 def save_cookie_to_db(user_id, username, raw_session_cookie, node_id, auto_refresh, nsn_user_id=None, nsn_username=None):
     """Save preprocessed session cookie to user_cookies table"""
     try:
@@ -1173,10 +1197,9 @@ def save_cookie_to_db(user_id, username, raw_session_cookie, node_id, auto_refre
         logger.info(f"===== END SAVING COOKIE TO DATABASE =====")
         
     except Exception as e:
-        logger.error(f"Failed to save cookie to database: {e}")
+        logger.error(f"Failed to save cookie to database: {e}", exc_info=True)
         logger.info(f"Rolling back transaction...")
         db.session.rollback()
-        logger.error(f"Traceback: {traceback.format_exc()}")
         raise e
 
 def save_account_to_db(user_id, username, account, password, account_data):
@@ -1225,12 +1248,18 @@ def save_account_to_db(user_id, username, account, password, account_data):
         logger.info(f"===== END SAVING ACCOUNT TO DATABASE =====")
         
     except Exception as e:
-        logger.error(f"Failed to save account to database: {e}")
+        logger.error(f"Failed to save account to database: {e}", exc_info=True)
         logger.info(f"Rolling back transaction...")
         db.session.rollback()
-        logger.error(f"Traceback: {traceback.format_exc()}")
         raise e
 
+# Fan-out limits for send_session_to_client
+SESSION_SEND_CONCURRENCY = 100  # Max concurrent websocket sends per call
+SESSION_SEND_TIMEOUT = 2.0  # Seconds before a single send is treated as failed
+SESSION_VERIFICATION_SENTINEL = '__cluster_verification__'  # Placeholder spliced per connection
+SESSION_RETRY_BASE = 0.5  # Seconds before the first retry, doubled per attempt
+SESSION_RETRY_MAX_DELAY = 8.0  # Upper bound for the retry backoff
+
 async def send_session_to_client(user_id, processed_session_cookie, nsn_user_id=None, nsn_username=None, website_root_path=None, website_name=None, session_partition=None, max_retries=3, reset_logout_status=False, channel_id=None, node_id=None):
     """Send preprocessed session data to C-Client via WebSocket with feedback and retry"""
     try:
@@ -1281,28 +1310,186 @@ async def send_session_to_client(user_id, processed_session_cookie, nsn_user_id=
             connections = c_client_ws.user_connections[user_id]
             logger.info(f"Found {len(connections)} connections for user {user_id}")
             
+            # Per-connection log lines are skipped entirely (no formatting) when INFO is off
+            log_each = logger.isEnabledFor(logging.INFO)
+            
             # Log each connection's user_id in detail
-            for i, conn in enumerate(connections):
-                conn_user_id = getattr(conn, 'user_id', 'unknown')
-                conn_node_id = getattr(conn, 'node_id', 'unknown')
-                conn_client_id = getattr(conn, 'client_id', 'unknown')
-                logger.info(f"Connection {i+1}: user_id={conn_user_id}, node_id={conn_node_id}, client_id={conn_client_id}")
+            if log_each:
+                for i, conn in enumerate(connections):
+                    logger.info("Connection %d: user_id=%s, node_id=%s, client_id=%s", i + 1,
+                                getattr(conn, 'user_id', 'unknown'), getattr(conn, 'node_id', 'unknown'),
+                                getattr(conn, 'client_id', 'unknown'))
         else:
             logger.warning(f"User {user_id} not found in user_connections")
             logger.info(f"Available users: {list(c_client_ws.user_connections.keys())}")
             logger.info(f"===== END SENDING SESSION: NO CONNECTIONS =====")
             return False
-            
+        
+        # One timestamp per call, shared by every ping and session message
+        # (single clock read; naive UTC ISO text as before, without deprecated utcnow())
+        now = time.time()
+        now_ms = int(now * 1000)
+        now_iso = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None).isoformat()
+        
+        # Build the auto_login message once per call; it is identical for every connection
+        # Extract NSN user info from cookie
+        nsn_user_id_from_cookie = None
+        nsn_username_from_cookie = None
+        
+        try:
+            cookie_data = json.loads(processed_session_cookie)
+            nsn_user_id_from_cookie = cookie_data.get('user_id')
+            nsn_username_from_cookie = cookie_data.get('username')
+            logger.info(f"Extracted from cookie - nsn_user_id: {nsn_user_id_from_cookie}, nsn_username: {nsn_username_from_cookie}")
+        except Exception as e:
+            logger.warning(f"Failed to parse cookie data: {e}")
+            # Use passed parameters as fallback
+            nsn_user_id_from_cookie = nsn_user_id
+            nsn_username_from_cookie = nsn_username
+        
+        # Use info extracted from cookie, use passed parameters if extraction fails
+        final_nsn_user_id = nsn_user_id_from_cookie or nsn_user_id
+        final_nsn_username = nsn_username_from_cookie or nsn_username
+        
+        # Directly use preprocessed session data
+        processed_session_data = {
+            'session_cookie': processed_session_cookie,  # Directly use preprocessed JSON string
+            'nsn_user_id': final_nsn_user_id,
+            'nsn_username': final_nsn_username,
+            'loggedin': True,
+            'role': 'traveller'
+        }
+        
+        # Add website config info
+        # Get NSN root URL from environment configuration
+        nsn_root_url = c_client_ws.get_nsn_root_url() if hasattr(c_client_ws, 'get_nsn_root_url') else get_nsn_url()
+        website_config = {
+            'root_path': website_root_path or nsn_root_url,
+            'name': website_name or 'NSN',
+            'session_partition': session_partition or 'persist:nsn',
+            'root_url': nsn_root_url  # Add NSN root URL
+        }
+        
+        # Check total number of users in WebSocket user pool for message determination
+        total_users = len(c_client_ws.user_connections) if hasattr(c_client_ws, 'user_connections') else 0
+        logger.info(f"🔍 [Session Send] Total users in WebSocket pool: {total_users}")
+        
+        # Only send message field for validation scenarios (multiple users)
+        base_message = {
+            'type': 'auto_login',
+            'user_id': user_id,
+            'session_data': processed_session_data,
+            'website_config': website_config,
+            'nsn_user_id': final_nsn_user_id,
+            'nsn_username': final_nsn_username,
+            'timestamp': now_iso,
+            'channel_id': channel_id,
+            'node_id': node_id,
+            'cluster_verification': SESSION_VERIFICATION_SENTINEL  # Spliced per connection below
+        }
+        
+        # Only add message field for validation scenarios
+        if total_users > 1:
+            base_message['message'] = 'login success with validation'
+            logger.info(f"🔍 [Session Send] Multiple users detected ({total_users}), adding validation message")
+        else:
+            logger.info(f"🔍 [Session Send] Single user detected ({total_users}), no message field needed")
+        
+        # Encode the envelope once as a template; the per-connection cluster_verification field
+        # is spliced in with str.replace instead of re-encoding the whole message (a quoted
+        # key/value pair can't occur inside an encoded JSON string, so the match is unambiguous)
+        message_template = json_provider.dumps(base_message)
+        verification_slot = json_provider.dumps({'cluster_verification': SESSION_VERIFICATION_SENTINEL})[1:-1]
+        base_message_json = message_template.replace(
+            verification_slot, json_provider.dumps({'cluster_verification': None})[1:-1], 1
+        )
+        ping_message_json = json_provider.dumps({'type': 'ping', 'timestamp': now_ms})
+        
+        # Connections that raised ConnectionClosed during a fan-out
+        closed_connections = []
+        
+        # Resolve centralized validation once instead of hasattr() per connection
+        is_connection_valid = getattr(c_client_ws, 'is_connection_valid', None)
+        
+        async def _send_one(i, websocket):
+            """Ping one connection and send it the session, return True on success"""
+            try:
+                # Try to send test message to verify connection is really valid
+                try:
+                    # Send a simple ping message to test connection
+                    await asyncio.wait_for(websocket.send(ping_message_json), timeout=SESSION_SEND_TIMEOUT)
+                    if log_each:
+                        logger.info("Connection %d ping successful, connection is valid", i + 1)
+                except Exception as ping_error:
+                    logger.warning(f"Connection {i+1} ping failed: {ping_error}, skipping")
+                    return False
+                
+                if log_each:
+                    logger.info("Connection %d is valid, sending session", i + 1)
+                
+                # Get cluster verification result from websocket connection if available
+                # (the only per-connection field; everything else was encoded once above)
+                message_json = base_message_json
+                if hasattr(websocket, 'cluster_verification_result'):
+                    verification_result = websocket.cluster_verification_result
+                    if log_each:
+                        logger.info("Found cluster verification result: %s", verification_result)
+                    if verification_result is not None:
+                        message_json = message_template.replace(
+                            verification_slot,
+                            json_provider.dumps({'cluster_verification': verification_result})[1:-1], 1
+                        )
+                
+                # Check if WebSocket connection is still open using centralized validation
+                if is_connection_valid is not None:
+                    if not is_connection_valid(websocket):
+                        logger.warning(f"WebSocket connection {i+1} is invalid, skipping...")
+                        return False
+                else:
+                    # Fallback to simple check if centralized validation is not available
+                    try:
+                        if hasattr(websocket, 'closed') and websocket.closed:
+                            logger.warning(f"WebSocket connection {i+1} is closed, skipping...")
+                            return False
+                    except AttributeError:
+                        # ServerConnection doesn't have 'closed' attribute, try to send anyway
+                        pass
+                
+                await asyncio.wait_for(websocket.send(message_json), timeout=SESSION_SEND_TIMEOUT)
+                if log_each:
+                    logger.info("Session data sent to C-Client connection %d for user %s", i + 1, user_id)
+                return True
+                
+            except asyncio.TimeoutError:
+                logger.warning(f"Session send to C-Client connection {i+1} timed out after {SESSION_SEND_TIMEOUT}s")
+                return False
+            except websockets.exceptions.ConnectionClosed:
+                logger.warning(f"WebSocket connection {i+1} is closed, removing from pool...")
+                # Removed from pool in one pass after the fan-out completes
+                closed_connections.append(websocket)
+                return False
+            except Exception as e:
+                # Don't print full traceback for connection errors
+                logger.error(f"Failed to send session to C-Client connection {i+1}: {e}",
+                             exc_info="ConnectionClosed" not in str(e))
+                return False
+        
+        # Cap in-flight sends so very large pools don't flood the event loop
+        send_semaphore = asyncio.Semaphore(SESSION_SEND_CONCURRENCY)
+        
+        async def _send_limited(i, websocket):
+            async with send_semaphore:
+                return websocket, await _send_one(i, websocket)
+        
         # Try to send session data with retry support
         for attempt in range(max_retries):
             logger.info(f"===== SESSION SEND ATTEMPT {attempt + 1}/{max_retries} =====")
             
-            success_count = 0
-            successful_connections = []  # Track actually successful connections
-            
             # Create feedback tracking dictionary BEFORE sending
-            # This ensures the dictionary exists when C-Client sends feedback
-            feedback_tracking = {conn: False for conn in connections}
+            # This ensures the dictionary exists when C-Client sends feedback;
+            # each future is resolved by the session_feedback handler
+            loop = asyncio.get_running_loop()
+            feedback_tracking = {conn: loop.create_future() for conn in connections}
             
             # Set up feedback tracking on ALL websocket objects BEFORE sending
             for websocket in connections:
@@ -1310,161 +1497,67 @@ async def send_session_to_client(user_id, processed_session_cookie, nsn_user_id=
             
             logger.info(f"Feedback tracking pre-setup for {len(connections)} connections")
             
-            # Send session data to all connections for this user
-            logger.info(f"===== STARTING FOR LOOP: {len(connections)} connections to process =====")
+            # Filter out connections that are logging out or already closed
+            live_connections = []
             for i, websocket in enumerate(connections):
-                logger.info(f"===== FOR LOOP ITERATION {i+1}/{len(connections)} =====")
-                try:
-                        logger.info(f"Checking connection {i+1}/{len(connections)} (attempt {attempt + 1})")
-                        
-                        # Check if connection is being logged out
-                        if hasattr(websocket, '_logout_in_progress') and websocket._logout_in_progress:
-                            logger.warning(f"Connection {i+1} logout in progress, skipping session send")
-                            continue
-                        
-                        # Check if connection is still valid - prioritize our marker
-                        if hasattr(websocket, '_closed_by_logout') and websocket._closed_by_logout:
-                            logger.warning(f"Connection {i+1} was closed by logout, skipping")
-                            continue
-                        
-                        # Check WebSocket's closed attribute
-                        if hasattr(websocket, 'closed') and websocket.closed:
-                            logger.warning(f"Connection {i+1} is closed (closed=True), skipping")
-                            continue
-                        
-                        # Check connection state - stricter check
-                        if hasattr(websocket, 'state'):
-                            state_value = websocket.state
-                            state_name = websocket.state.name if hasattr(websocket.state, 'name') else str(websocket.state)
-                            
-                            # Check state value (3 = CLOSED, 2 = CLOSING)
-                            if state_value in [2, 3] or state_name in ['CLOSED', 'CLOSING']:
-                                logger.warning(f"Connection {i+1} is in {state_name} state (value: {state_value}), skipping")
-                                continue
-                        
-                        # Check close_code - if close_code is set, connection is closed
-                        if hasattr(websocket, 'close_code') and websocket.close_code is not None:
-                            logger.warning(f"Connection {i+1} has close_code {websocket.close_code}, skipping")
-                            continue
-                        
-                        # Try to send test message to verify connection is really valid
-                        try:
-                            # Send a simple ping message to test connection
-                            test_message = {'type': 'ping', 'timestamp': int(time.time() * 1000)}
-                            await websocket.send(json.dumps(test_message))
-                            logger.info(f"Connection {i+1} ping successful, connection is valid")
-                        except Exception as ping_error:
-                            logger.warning(f"Connection {i+1} ping failed: {ping_error}, skipping")
-                            continue
-                        
-                        logger.info(f"Connection {i+1} is valid, sending session")
-                        
-                        # Extract NSN user info from cookie
-                        nsn_user_id_from_cookie = None
-                        nsn_username_from_cookie = None
-                        
-                        try:
-                            cookie_data = json.loads(processed_session_cookie)
-                            nsn_user_id_from_cookie = cookie_data.get('user_id')
-                            nsn_username_from_cookie = cookie_data.get('username')
-                            logger.info(f"Extracted from cookie - nsn_user_id: {nsn_user_id_from_cookie}, nsn_username: {nsn_username_from_cookie}")
-                        except Exception as e:
-                            logger.warning(f"Failed to parse cookie data: {e}")
-                            # Use passed parameters as fallback
-                            nsn_user_id_from_cookie = nsn_user_id
-                            nsn_username_from_cookie = nsn_username
-                        
-                        # Use info extracted from cookie, use passed parameters if extraction fails
-                        final_nsn_user_id = nsn_user_id_from_cookie or nsn_user_id
-                        final_nsn_username = nsn_username_from_cookie or nsn_username
-                        
-                        # Directly use preprocessed session data
-                        processed_session_data = {
-                            'session_cookie': processed_session_cookie,  # Directly use preprocessed JSON string
-                            'nsn_user_id': final_nsn_user_id,
-                            'nsn_username': final_nsn_username,
-                            'loggedin': True,
-                            'role': 'traveller'
-                        }
-                        
-                        # Add website config info
-                        # Get NSN root URL from environment configuration
-                        nsn_root_url = c_client_ws.get_nsn_root_url() if hasattr(c_client_ws, 'get_nsn_root_url') else get_nsn_url()
-                        website_config = {
-                            'root_path': website_root_path or nsn_root_url,
-                            'name': website_name or 'NSN',
-                            'session_partition': session_partition or 'persist:nsn',
-                            'root_url': c_client_ws.get_nsn_root_url()  # Add NSN root URL
-                        }
-                        
-                        # Get cluster verification result from websocket connection if available
-                        verification_result = None
-                        if hasattr(websocket, 'cluster_verification_result'):
-                            verification_result = websocket.cluster_verification_result
-                            logger.info(f"Found cluster verification result: {verification_result}")
-                        
-                        # Check total number of users in WebSocket user pool for message determination
-                        total_users = len(c_client_ws.user_connections) if hasattr(c_client_ws, 'user_connections') else 0
-                        logger.info(f"🔍 [Session Send] Total users in WebSocket pool: {total_users}")
-                        
-                        # Only send message field for validation scenarios (multiple users)
-                        message = {
-                            'type': 'auto_login',
-                            'user_id': user_id,
-                            'session_data': processed_session_data,
-                            'website_config': website_config,
-                            'nsn_user_id': final_nsn_user_id,
-                            'nsn_username': final_nsn_username,
-                            'timestamp': datetime.utcnow().isoformat(),
-                            'channel_id': channel_id,
-                            'node_id': node_id,
-                            'cluster_verification': verification_result  # Add verification result to message
-                        }
-                        
-                        # Only add message field for validation scenarios
-                        if total_users > 1:
-                            message['message'] = 'login success with validation'
-                            logger.info(f"🔍 [Session Send] Multiple users detected ({total_users}), adding validation message")
-                        else:
-                            logger.info(f"🔍 [Session Send] Single user detected ({total_users}), no message field needed")
-                        
-                        # Check if WebSocket connection is still open using centralized validation
-                        if hasattr(c_client_ws, 'is_connection_valid'):
-                            if not c_client_ws.is_connection_valid(websocket):
-                                logger.warning(f"WebSocket connection {i+1} is invalid, skipping...")
-                                continue
-                        else:
-                            # Fallback to simple check if centralized validation is not available
-                            try:
-                                if hasattr(websocket, 'closed') and websocket.closed:
-                                    logger.warning(f"WebSocket connection {i+1} is closed, skipping...")
-                                    continue
-                            except AttributeError:
-                                # ServerConnection doesn't have 'closed' attribute, try to send anyway
-                                pass
-                        
-                        message_json = json.dumps(message)
-                        await websocket.send(message_json)
-                        logger.info(f"Session data sent to C-Client connection {i+1} for user {user_id}")
-                        success_count += 1
-                        successful_connections.append(websocket)  # Track this successful connection
-                        
-                except websockets.exceptions.ConnectionClosed:
-                        logger.warning(f"WebSocket connection {i+1} is closed, removing from pool...")
-                        # Remove closed connection from pool
-                        if user_id in c_client_ws.user_connections:
-                            c_client_ws.user_connections[user_id] = [
-                                conn for conn in c_client_ws.user_connections[user_id] 
-                                if conn != websocket
-                            ]
+                # Check if connection is being logged out
+                if hasattr(websocket, '_logout_in_progress') and websocket._logout_in_progress:
+                    logger.warning(f"Connection {i+1} logout in progress, skipping session send")
+                    continue
+                
+                # Check if connection is still valid - prioritize our marker
+                if hasattr(websocket, '_closed_by_logout') and websocket._closed_by_logout:
+                    logger.warning(f"Connection {i+1} was closed by logout, skipping")
+                    continue
+                
+                # Check WebSocket's closed attribute
+                if hasattr(websocket, 'closed') and websocket.closed:
+                    logger.warning(f"Connection {i+1} is closed (closed=True), skipping")
+                    continue
+                
+                # Check connection state - stricter check
+                if hasattr(websocket, 'state'):
+                    state_value = websocket.state
+                    state_name = websocket.state.name if hasattr(websocket.state, 'name') else str(websocket.state)
+                    
+                    # Check state value (3 = CLOSED, 2 = CLOSING)
+                    if state_value in [2, 3] or state_name in ['CLOSED', 'CLOSING']:
+                        logger.warning(f"Connection {i+1} is in {state_name} state (value: {state_value}), skipping")
                         continue
-                except Exception as e:
-                        logger.error(f"Failed to send session to C-Client connection {i+1}: {e}")
-                        # Don't print full traceback for connection errors
-                        if "ConnectionClosed" not in str(e):
-                            logger.error(f"Traceback: {traceback.format_exc()}")
+                
+                # Check close_code - if close_code is set, connection is closed
+                if hasattr(websocket, 'close_code') and websocket.close_code is not None:
+                    logger.warning(f"Connection {i+1} has close_code {websocket.close_code}, skipping")
+                    continue
+                
+                live_connections.append((i, websocket))
+            
+            # Send session data to all live connections for this user concurrently
+            logger.info(f"===== SENDING TO {len(live_connections)}/{len(connections)} live connections concurrently =====")
+            results = await asyncio.gather(
+                *[_send_limited(i, websocket) for i, websocket in live_connections],
+                return_exceptions=True
+            )
+            
+            # Drop connections that closed mid-send with a single pass over the user's pool
+            if closed_connections:
+                closed_ids = set(map(id, closed_connections))
+                closed_connections.clear()
+                if user_id in c_client_ws.user_connections:
+                    c_client_ws.user_connections[user_id] = [
+                        conn for conn in c_client_ws.user_connections[user_id]
+                        if id(conn) not in closed_ids
+                    ]
             
-            logger.info(f"===== FOR LOOP COMPLETED: {success_count} successful sends out of {len(connections)} connections =====")
+            # Track actually successful connections
+            successful_connections = [
+                result[0] for result in results
+                if isinstance(result, tuple) and result[1]
+            ]
+            success_count = len(successful_connections)
+            
+            logger.info(f"===== CONCURRENT SEND COMPLETED: {success_count}/{len(live_connections)} successful, "
+                        f"{len(live_connections) - success_count} failed, {len(connections) - len(live_connections)} skipped =====")
             
             if success_count == 0:
                 logger.error(f"Failed to send to any connections on attempt {attempt + 1}")
@@ -1472,39 +1565,37 @@ async def send_session_to_client(user_id, processed_session_cookie, nsn_user_id=
             
             # Wait for feedback - only wait for actually successful connections (already tracked above)
             logger.info(f"Waiting for session feedback from {len(successful_connections)} successful connections...")
-            start_time = asyncio.get_event_loop().time()
             timeout = 5  # 5 second timeout (reduced from 30 for faster sync)
             
             # Wait for feedback from successfully sent connections only
-            while asyncio.get_event_loop().time() - start_time < timeout:
-                # Check feedback_tracking dictionary (shared with websocket objects)
-                successful_feedbacks = [feedback_tracking[conn] for conn in successful_connections]
-                if all(successful_feedbacks):
-                    logger.info(f"All session feedback received for user {user_id} on attempt {attempt + 1}")
-                    # Clean up feedback tracking
-                    for websocket in successful_connections:
-                        if hasattr(websocket, '_session_feedback_tracking'):
-                            delattr(websocket, '_session_feedback_tracking')
-                    
-                    logger.info(f"===== END SENDING SESSION: SUCCESS =====")
-                    return True
-                
-                await asyncio.sleep(0.5)
+            done, pending = await asyncio.wait(
+                [feedback_tracking[conn] for conn in successful_connections],
+                timeout=timeout
+            )
+            
+            # Clean up feedback tracking
+            for websocket in connections:
+                try:
+                    del websocket._session_feedback_tracking
+                except AttributeError:
+                    pass
+            
+            if not pending:
+                logger.info(f"All session feedback received for user {user_id} on attempt {attempt + 1}")
+                logger.info(f"===== END SENDING SESSION: SUCCESS =====")
+                return True
             else:
                 # Timeout
-                missing_feedback = [conn for conn in successful_connections if not feedback_tracking[conn]]
+                for feedback in pending:
+                    feedback.cancel()
                 logger.warning(f"Session feedback timeout on attempt {attempt + 1}")
-                logger.warning(f"   Missing feedback from {len(missing_feedback)} connections")
-                logger.warning(f"   Feedback status: {sum(feedback_tracking.values())} / {len(feedback_tracking)} received")
-                
-                # Clean up feedback tracking
-                for websocket in successful_connections:
-                    if hasattr(websocket, '_session_feedback_tracking'):
-                        delattr(websocket, '_session_feedback_tracking')
+                logger.warning(f"   Missing feedback from {len(pending)} connections")
+                logger.warning(f"   Feedback status: {len(done)} / {len(successful_connections)} received")
                 
                 if attempt < max_retries - 1:
                     logger.info(f"Retrying session send... ({attempt + 2}/{max_retries})")
-                    await asyncio.sleep(2)  # Wait 2 seconds before retry
+                    # Exponential backoff with jitter so mass reconnects don't retry in lockstep
+                    await asyncio.sleep(min(SESSION_RETRY_MAX_DELAY, SESSION_RETRY_BASE * (2 ** attempt)) * (0.5 + random.random()))
                     continue
                 else:
                     logger.error(f"Max retries reached, giving up")
@@ -1519,8 +1610,7 @@ async def send_session_to_client(user_id, processed_session_cookie, nsn_user_id=
             return False
             
     except Exception as e:
-        logger.error(f"Error sending session to C-Client: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Error sending session to C-Client: {e}", exc_info=True)
         logger.error(f"===== END SENDING SESSION: ERROR =====")
         return False
 
@@ -1532,34 +1622,9 @@ init_websocket_client(app, db, UserCookie, UserAccount, send_session_to_client)
 init_bind_routes(db, UserCookie, UserAccount, nsn_client, c_client_ws, 
                  save_cookie_to_db, save_account_to_db, send_session_to_client)
 
-# Initialize node manager for node management system
-logger.info("=" * 80)
-logger.info("Initializing NodeManager for node management system...")
-node_manager = NodeManager()
-logger.info(f"NodeManager instance created: {node_manager}")
-logger.info("Registering node management routes...")
-init_node_management_routes(node_manager)
-logger.info("Node management routes registered")
-
-# Inject NodeManager into WebSocket client for C-Client registration
-logger.info("Injecting NodeManager into WebSocket client...")
-c_client_ws.node_manager = node_manager
-logger.info(f"NodeManager injected into c_client_ws")
-logger.info(f"   c_client_ws.node_manager = {c_client_ws.node_manager}")
-
-# Reinitialize SyncManager with updated NodeManager
-logger.info("Reinitializing SyncManager with updated NodeManager...")
-from utils.config_manager import get_config_manager
-config_manager = get_config_manager()
-sync_manager = SyncManager(c_client_ws, node_manager, config_manager)
-logger.info(f"SyncManager reinitialized: {sync_manager}")
-
-# Inject SyncManager into WebSocket client
-logger.info("Injecting SyncManager into WebSocket client...")
-import services.websocket_client as ws_module
-ws_module.sync_manager = sync_manager
-logger.info(f"SyncManager injected into websocket_client module")
-logger.info("=" * 80)
+# NodeManager and SyncManager (created by start_services)
+node_manager = None
+sync_manager = None
 
 # ===== Security Code Cleanup Task =====
 logger.info("=" * 80)
@@ -1575,48 +1640,103 @@ def cleanup_old_security_codes():
             # Calculate cutoff time (15 minutes ago)
             cutoff_time = datetime.utcnow() - timedelta(minutes=15)
             
-            # Query old security codes
-            old_codes = UserSecurityCode.query.filter(
+            # Delete old security codes with a single bulk DELETE ... WHERE (no row hydration)
+            deleted = UserSecurityCode.query.filter(
                 UserSecurityCode.create_time < cutoff_time
-            ).all()
+            ).delete(synchronize_session=False)
+            db.session.commit()
             
-            if old_codes:
-                logger.info(f"🧹 Cleaning up {len(old_codes)} old security codes...")
-                for code in old_codes:
-                    logger.info(f"🧹 Deleting security code for user {code.nmp_username} (created at {code.create_time})")
-                    db.session.delete(code)
-                
-                db.session.commit()
-                logger.info(f"✅ Successfully cleaned up {len(old_codes)} old security codes")
+            if deleted:
+                logger.info(f"✅ Successfully cleaned up {deleted} old security codes")
             else:
                 logger.debug("✅ No old security codes to clean up")
                 
     except Exception as e:
-        logger.error(f"❌ Error cleaning up old security codes: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"❌ Error cleaning up old security codes: {e}", exc_info=True)
 
 # Schedule cleanup task to run every 15 minutes
-import threading
+async def _periodic_cleanup():
+    """Run security code cleanup every 15 minutes on the WebSocket event loop"""
+    while True:
+        # Only the blocking SQLAlchemy work leaves the event loop
+        await asyncio.to_thread(cleanup_old_security_codes)
+        await asyncio.sleep(900)
 
-# Global variable to track cleanup timer
-cleanup_timer = None
-
-def schedule_cleanup_task():
-    """Schedule periodic cleanup task"""
-    global cleanup_timer
-    cleanup_old_security_codes()
-    # Schedule next cleanup in 15 minutes (900 seconds)
-    # Use daemon thread to allow clean shutdown
-    cleanup_timer = threading.Timer(900, schedule_cleanup_task)
-    cleanup_timer.daemon = True  # Set as daemon thread so it won't block shutdown
-    cleanup_timer.start()
-
-# Start the cleanup task
-schedule_cleanup_task()
-logger.info("✅ Security code cleanup task scheduled (runs every 15 minutes)")
 logger.info("=" * 80)
 
 
+# ===== Per-process services =====
+_services_lock = threading.Lock()
+_services_started = False
+
+def start_services():
+    """
+    Start the per-process B-Client services: NodeManager, the local WebSocket server and the
+    security code cleanup task. Idempotent; concurrent callers return once everything is injected
+    """
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _start_services()
+        _services_started = True
+
+def _start_services():
+    """start_services() body (runs once, under _services_lock)"""
+    global node_manager, sync_manager
+    
+    # Initialize node manager for node management system
+    logger.info("=" * 80)
+    logger.info("Initializing NodeManager for node management system...")
+    node_manager = NodeManager()
+    logger.info(f"NodeManager instance created: {node_manager}")
+    logger.info("Registering node management routes...")
+    init_node_management_routes(node_manager)
+    logger.info("Node management routes registered")
+
+    # Inject NodeManager into WebSocket client for C-Client registration
+    logger.info("Injecting NodeManager into WebSocket client...")
+    c_client_ws.node_manager = node_manager
+    logger.info(f"NodeManager injected into c_client_ws")
+    logger.info(f"   c_client_ws.node_manager = {c_client_ws.node_manager}")
+
+    # Reinitialize SyncManager with updated NodeManager
+    logger.info("Reinitializing SyncManager with updated NodeManager...")
+    from utils.config_manager import get_config_manager
+    config_manager = get_config_manager()
+    sync_manager = SyncManager(c_client_ws, node_manager, config_manager)
+    logger.info(f"SyncManager reinitialized: {sync_manager}")
+
+    # Inject SyncManager into WebSocket client
+    logger.info("Injecting SyncManager into WebSocket client...")
+    import services.websocket_client as ws_module
+    ws_module.sync_manager = sync_manager
+    logger.info(f"SyncManager injected into websocket_client module")
+    logger.info("=" * 80)
+    
+    # Start WebSocket server (only in local mode)
+    # In ASGI mode (production), WebSocket handling is integrated into ASGI app
+    if environment == 'local':
+        start_websocket_server()
+    else:
+        print(f"🔧 [App] ASGI mode detected - WebSocket handling integrated into ASGI app")
+        logger.info("ASGI mode detected - WebSocket handling integrated into ASGI app")
+    
+    # Start the cleanup task once the WebSocket event loop is running (or on a fallback thread when
+    # this process has no WebSocket loop, e.g. run.py outside local mode or gunicorn app:app)
+    register_background_task(_periodic_cleanup)
+    schedule_background_task_fallback()
+    logger.info("✅ Security code cleanup task scheduled (runs every 15 minutes)")
+
+# Werkzeug's debug reloader imports this module in a watcher process that never serves, then again
+# in the child it spawns (WERKZEUG_RUN_MAIN=true); only the serving process starts services.
+# "python app.py" always runs with debug=True (see __main__ below)
+if __name__ == '__main__':
+    app.debug = True
+if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    start_services()
+
+
 if __name__ == '__main__':
     logger.info("B-Client application starting...")
     
@@ -16,6 +16,7 @@ from asgiref.wsgi import WsgiToAsgi
 
 # Local imports
 from app import app, c_client_ws
+from services.websocket_server import start_background_tasks
 from utils.logger import get_bclient_logger
 
 # Initialize logger
@@ -34,8 +35,14 @@ class ASGIAppWithWebSocket:
     def __init__(self, flask_app):
         self.flask_app = flask_app
         self.websocket_started = False
+        self.background_tasks_started = False
     
     async def __call__(self, scope, receive, send):
+        # Run periodic tasks (e.g. security code cleanup) on the server's event loop (first call only)
+        if not self.background_tasks_started:
+            self.background_tasks_started = True
+            start_background_tasks(asyncio.get_running_loop())
+        
         # Handle WebSocket connections using the real WebSocket service
         if scope["type"] == "websocket":
             print(f"🔧 [ASGI] Handling WebSocket connection using real service")
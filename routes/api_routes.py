@@ -169,7 +169,7 @@ def get_cookies():
 @api_routes.route('/api/cookies', methods=['POST'])
 def add_cookie():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         required_fields = ['user_id', 'username', 'cookie']
         for field in required_fields:
             if field not in data:
@@ -228,7 +228,7 @@ def get_accounts():
 @api_routes.route('/api/accounts', methods=['POST'])
 def add_account():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         required_fields = ['user_id', 'username', 'website', 'account', 'password']
         for field in required_fields:
             if field not in data:
@@ -301,7 +301,7 @@ def delete_account(user_id, username, website, account):
 @api_routes.route('/api/config/environment', methods=['POST'])
 def set_environment():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         environment = data.get('environment', 'local')
         
         # Validate environment value
@@ -383,7 +383,7 @@ def database_info():
 def trigger_node_offline():
     """Trigger node offline cleanup"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         node_id = data.get('node_id')
         
         if not node_id:
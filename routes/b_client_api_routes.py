@@ -16,47 +16,65 @@ from flask import Blueprint, request, jsonify
 b_client_api_routes = Blueprint('b_client_api_routes', __name__)
 
 
-@b_client_api_routes.route('/api/b-client/info')
+# Static part of /api/b-client/info, keyed by (environment, http_port);
+# only the timestamp changes between calls
+_b_client_info_cache = {}
+
+
+def _get_b_client_info_static(environment, http_port):
+    """Build (once per environment/port) the b_client_info fields that don't change per request"""
+    key = (environment, http_port)
+    static_info = _b_client_info_cache.get(key)
+    if static_info is not None:
+        return static_info
+    
+    # WebSocket port configuration
+    # In local development, use the configured port
+    # In production (Heroku), use the same port as HTTP
+    if environment == 'local':
+        websocket_port = 8766  # Default local WebSocket port
+    else:
+        websocket_port = http_port  # Production: Same port as HTTP for Heroku (integrated WebSocket)
+    
+    # Get B-Client WebSocket server configuration
+    websocket_config = {
+        'enabled': True,
+        'host': '0.0.0.0',  # B-Client WebSocket server host
+        'port': websocket_port,  # Dynamic WebSocket port
+        'environment': environment
+    }
+    
+    # Get network information (gethostbyname can hit DNS, so resolve only once)
+    hostname = socket.gethostname()
+    local_ip = socket.gethostbyname(hostname)
+    
+    static_info = {
+        'websocket': websocket_config,
+        'environment': environment,
+        'hostname': hostname,
+        'local_ip': local_ip,
+        'api_port': http_port,  # Dynamic HTTP port
+        'websocket_port': websocket_port  # Explicit WebSocket port
+    }
+    _b_client_info_cache[key] = static_info
+    return static_info
+
+
+@b_client_api_routes.route('/api/b-client/info', provide_automatic_options=False)
 def b_client_info():
     """Return B-Client configuration information for C-Client connections"""
     try:
-        # Get current environment
+        # Get current environment (can be switched at runtime via /api/config/environment)
         from utils.config_manager import get_current_environment
         environment = get_current_environment()
         
-        # Calculate ports dynamically
         # HTTP port is the main PORT environment variable
         http_port = int(os.environ.get('PORT', 8000))
         
-        # WebSocket port configuration
-        # In local development, use the configured port
-        # In production (Heroku), use the same port as HTTP
-        if environment == 'local':
-            websocket_port = 8766  # Default local WebSocket port
-        else:
-            websocket_port = http_port  # Production: Same port as HTTP for Heroku (integrated WebSocket)
-        
-        # Get B-Client WebSocket server configuration
-        websocket_config = {
-            'enabled': True,
-            'host': '0.0.0.0',  # B-Client WebSocket server host
-            'port': websocket_port,  # Dynamic WebSocket port
-            'environment': environment
-        }
-        
-        # Get network information
-        hostname = socket.gethostname()
-        local_ip = socket.gethostbyname(hostname)
-        
         return jsonify({
             'success': True,
             'b_client_info': {
-                'websocket': websocket_config,
-                'environment': environment,
-                'hostname': hostname,
-                'local_ip': local_ip,
-                'api_port': http_port,  # Dynamic HTTP port
-                'websocket_port': websocket_port,  # Explicit WebSocket port
+                **_get_b_client_info_static(environment, http_port),
                 'timestamp': int(time.time() * 1000)
             }
         })
@@ -67,7 +85,7 @@ def b_client_info():
         })
 
 
-@b_client_api_routes.route('/api/b-client/websocket-info')
+@b_client_api_routes.route('/api/b-client/websocket-info', provide_automatic_options=False)
 def websocket_info():
     """Simple endpoint for C-Client to discover WebSocket connection details"""
     try:
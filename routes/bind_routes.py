@@ -9,7 +9,6 @@ import time
 import threading
 import asyncio
 import requests
-import traceback
 import random
 import string
 import re
@@ -20,7 +19,6 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from utils.logger import get_bclient_logger
 from utils.config_manager import get_nsn_base_url, get_nsn_api_url, get_current_environment
-from services.nodeManager import ClientConnection
 
 # Create blueprint for bind routes
 bind_routes = Blueprint('bind_routes', __name__)
@@ -116,8 +114,7 @@ def _send_session_to_client(nmp_user_id, session_cookie, nsn_user_id, nsn_userna
         logger.info(f"Session sent to C-Client for user {nmp_user_id}")
         return True
     except Exception as e:
-        logger.warning(f"Failed to send session to C-Client: {e}")
-        traceback.print_exc()
+        logger.warning(f"Failed to send session to C-Client: {e}", exc_info=True)
         return False
     finally:
         loop.close()
@@ -193,13 +190,14 @@ def _return_error_response(error_message, status_code=400):
 
 def _parse_bind_request():
     """Parse bind request parameters"""
+    request_time = datetime.utcnow()
     logger.info(f"===== BIND API CALLED =====")
-    logger.info(f"Request timestamp: {datetime.now()}")
+    logger.info(f"Request timestamp: {request_time}")
     logger.info(f"Request IP: {request.remote_addr}")
     logger.info(f"Request method: {request.method}")
     logger.info(f"Request content type: {request.content_type}")
     
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     logger.info(f"Raw request data: {data}")
     
     # Extract request parameters
@@ -218,7 +216,7 @@ def _parse_bind_request():
     nsn_username = data.get('nsn_username', '')  # NSN username from successful login
     
     logger.info(f"===== BIND API REQUEST =====")
-    logger.info(f"Request timestamp: {datetime.utcnow().isoformat()}")
+    logger.info(f"Request timestamp: {request_time.isoformat()}")
     logger.info(f"Request data: {data}")
     logger.info(f"nmp_user_id: {nmp_user_id}")
     logger.info(f"nmp_username: {nmp_username}")
@@ -343,27 +341,16 @@ def _cleanup_websocket_connections(nmp_user_id):
             ws._closed_by_logout = True
             # Clean connection cache
             websocket_id = id(ws)
-            if hasattr(c_client_ws, 'connection_validity_cache') and websocket_id in c_client_ws.connection_validity_cache:
-                del c_client_ws.connection_validity_cache[websocket_id]
+            if hasattr(c_client_ws, 'connection_validity_cache'):
+                c_client_ws.connection_validity_cache.pop(websocket_id, None)
         
         # Notify NodeManager to clean up hierarchy structure
         if hasattr(c_client_ws, 'node_manager') and c_client_ws.node_manager:
             for ws in user_connections:
                 try:
-                    
-                    connection = ClientConnection(
-                        websocket=ws,
-                        node_id=getattr(ws, 'node_id', 'unknown'),
-                        user_id=getattr(ws, 'user_id', 'unknown'),
-                        username=getattr(ws, 'username', 'unknown'),
-                        domain_id=getattr(ws, 'domain_id', None),
-                        cluster_id=getattr(ws, 'cluster_id', None),
-                        channel_id=getattr(ws, 'channel_id', None),
-                        is_domain_main_node=getattr(ws, 'is_domain_main_node', False),
-                        is_cluster_main_node=getattr(ws, 'is_cluster_main_node', False),
-                        is_channel_main_node=getattr(ws, 'is_channel_main_node', False)
-                    )
-                    c_client_ws.node_manager.remove_connection(connection)
+                    node_id = getattr(ws, 'node_id', None)
+                    if node_id:
+                        c_client_ws.node_manager.remove_by_node_id(node_id)
                 except Exception as e:
                     logger.warning(f"Error notifying NodeManager: {e}")
         
@@ -387,8 +374,7 @@ def _cleanup_internal_cache(nmp_user_id):
     for cache_key in cache_keys:
         if hasattr(c_client_ws, cache_key):
             cache = getattr(c_client_ws, cache_key)
-            if nmp_user_id in cache:
-                del cache[nmp_user_id]
+            cache.pop(nmp_user_id, None)
 
 
 def _handle_existing_cookie_check(nmp_user_id, nmp_username, channel_id=None, node_id=None):
@@ -486,8 +472,7 @@ def _handle_existing_cookie_check(nmp_user_id, nmp_username, channel_id=None, no
             return _return_success_response(existing_cookie.cookie, 'Existing session found and sent to C-Client')
         
     except Exception as e:
-        logger.error(f"Failed to send session to C-Client: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Failed to send session to C-Client: {e}", exc_info=True)
         return _return_error_response('Failed to send session to C-Client', 500)
 
 
@@ -784,8 +769,7 @@ def _handle_logout_request(nmp_user_id, nmp_username, client_id=None):
         })
         
     except Exception as e:
-        logger.error(f"Error during logout process: {e}")
-        traceback.print_exc()
+        logger.error(f"Error during logout process: {e}", exc_info=True)
         return _return_error_response(f'Logout failed: {str(e)}', 500)
 
 
@@ -850,6 +834,5 @@ def bind():
             return _return_error_response('Wrong account or password, please try again or sign up with NMP')
         
     except Exception as e:
-        logger.error(f"Bind API error: {e}")
-        traceback.print_exc()
+        logger.error(f"Bind API error: {e}", exc_info=True)
         return _return_error_response(str(e), 500)
\ No newline at end of file
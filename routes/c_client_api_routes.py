@@ -28,15 +28,16 @@ def init_c_client_api_routes(websocket_client):
     c_client_ws = websocket_client
 
 
-@c_client_api_routes.route('/api/c-client/status')
+@c_client_api_routes.route('/api/c-client/status', provide_automatic_options=False)
 def c_client_status():
     """Check C-Client WebSocket server status and connected clients"""
+    timestamp = datetime.utcnow().isoformat()
     if not c_client_ws:
         return jsonify({
             'success': False,
             'error': 'WebSocket functionality not available',
             'connected': False,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': timestamp
         })
     
     # Get connection info using the new method
@@ -51,7 +52,7 @@ def c_client_status():
             'status': 'running'
         },
         'connected_clients': connection_info,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': timestamp
     })
 
 
@@ -59,7 +60,7 @@ def c_client_status():
 def c_client_update_cookie():
     """Update cookie in C-Client via WebSocket"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         username = data.get('username')
         cookie = data.get('cookie')
@@ -89,7 +90,7 @@ def c_client_update_cookie():
 def c_client_notify_login():
     """Notify C-Client of user login via WebSocket"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         username = data.get('username')
         session_data = data.get('session_data', {})
@@ -118,7 +119,7 @@ def c_client_notify_login():
 def c_client_notify_logout():
     """Notify C-Client of user logout via WebSocket"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         username = data.get('username')
 
@@ -146,7 +147,7 @@ def c_client_notify_logout():
 def c_client_sync_session():
     """Sync session data with C-Client via WebSocket"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         session_data = data.get('session_data', {})
 
@@ -173,16 +174,18 @@ def c_client_sync_session():
 def websocket_check_user():
     """Check if a user is connected to the WebSocket server"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         user_id = data.get('user_id')
         
         if not user_id:
             return jsonify({'success': False, 'error': 'user_id is required'}), 400
         
-        logger.info(f"Checking WebSocket connection for user_id: {user_id}")
+        logger.debug(f"Checking WebSocket connection for user_id: {user_id}")
         
-        # Check if user exists in user_connections pool
-        user_connected = user_id in c_client_ws.user_connections
+        # Look up the user's connections once so connected/count stay consistent
+        connections = c_client_ws.user_connections.get(user_id)
+        connection_count = len(connections) if connections else 0
+        user_connected = connection_count > 0
         
         # Get WebSocket URL from configuration
         websocket_host = c_client_ws.config.get('server_host', '127.0.0.1')
@@ -190,8 +193,7 @@ def websocket_check_user():
         websocket_url = f"ws://{websocket_host}:{websocket_port}"
         
         if user_connected:
-            connections = c_client_ws.user_connections.get(user_id, [])
-            logger.info(f"User {user_id} is connected with {len(connections)} connections")
+            logger.info(f"User {user_id} is connected with {connection_count} connections")
         else:
             logger.info(f"User {user_id} is not connected to WebSocket")
         
@@ -199,7 +201,8 @@ def websocket_check_user():
             'success': True,
             'connected': user_connected,
             'websocket_url': websocket_url,
-            'user_id': user_id
+            'user_id': user_id,
+            'connection_count': connection_count
         })
     
     except Exception as e:
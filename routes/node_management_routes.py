@@ -3,9 +3,15 @@ Node Management Routes
 Handles node management dashboard and API endpoints
 """
 
-from flask import Blueprint, render_template, jsonify, request
+from collections import defaultdict
+from flask import Blueprint, Response, render_template, request
 import logging
 
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils import json_provider
+
 logger = logging.getLogger(__name__)
 
 node_management_routes = Blueprint('node_management', __name__)
@@ -19,6 +25,33 @@ def init_node_management_routes(nm):
     node_manager = nm
     logger.info("Node management routes initialized")
 
+def _json(payload, status=200):
+    """Encode payload with the fast JSON helper (orjson when installed) instead of jsonify"""
+    return Response(json_provider.dumps(payload), status=status, mimetype='application/json')
+
+# Encoded view payloads: view name -> (node_manager.revision, JSON body)
+_view_cache = {}
+
+def _cached_view(name, build):
+    """Return build()'s JSON, re-encoding only when the NodeManager pools changed"""
+    revision = node_manager.revision
+    cached = _view_cache.get(name)
+    if cached is None or cached[0] != revision:
+        cached = (revision, json_provider.dumps(build()))
+        _view_cache[name] = cached
+    return Response(cached[1], mimetype='application/json')
+
+def _node_dict(conn):
+    """Serialize a ClientConnection for the structure view"""
+    return {
+        'node_id': conn.node_id,
+        'user_id': conn.user_id,
+        'username': conn.username,
+        'is_domain_main': conn.is_domain_main_node,
+        'is_cluster_main': conn.is_cluster_main_node,
+        'is_channel_main': conn.is_channel_main_node
+    }
+
 @node_management_routes.route('/node-management')
 def node_management_dashboard():
     """Render node management dashboard page"""
@@ -29,15 +62,15 @@ def get_node_stats():
     """Get node management statistics"""
     try:
         if node_manager is None:
-            return jsonify({
+            return _json({
                 'success': False,
                 'error': 'Node manager not initialized'
-            }), 500
+            }, 500)
         
         # Get statistics from node manager
         stats = node_manager.get_pool_stats()
         
-        return jsonify({
+        return _json({
             'success': True,
             'stats': stats,
             'timestamp': str(datetime.now())
@@ -45,262 +78,228 @@ def get_node_stats():
         
     except Exception as e:
         logger.error(f"Error getting node stats: {e}")
-        return jsonify({
+        return _json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
+
+def _build_domains():
+    """Build the /domains payload from the domain pool"""
+    domains = []
+    for domain_id, connections in node_manager.domain_pool.items():
+        domains.append({
+            'domain_id': domain_id,
+            'connection_count': len(connections),
+            'connections': [
+                {
+                    'node_id': conn.node_id,
+                    'cluster_id': conn.cluster_id,
+                    'channel_id': conn.channel_id
+                }
+                for conn in connections.values()
+            ]
+        })
+    
+    return {
+        'success': True,
+        'domains': domains
+    }
 
 @node_management_routes.route('/api/node-management/domains')
 def get_domains():
     """Get all domain information"""
     try:
         if node_manager is None:
-            return jsonify({
+            return _json({
                 'success': False,
                 'error': 'Node manager not initialized'
-            }), 500
+            }, 500)
         
-        domains = []
-        for domain_id, connections in node_manager.domain_pool.items():
-            domains.append({
-                'domain_id': domain_id,
-                'connection_count': len(connections),
-                'connections': [
-                    {
-                        'node_id': conn.node_id,
-                        'cluster_id': conn.cluster_id,
-                        'channel_id': conn.channel_id
-                    }
-                    for conn in connections
-                ]
-            })
-        
-        return jsonify({
-            'success': True,
-            'domains': domains
-        })
+        return _cached_view('domains', _build_domains)
         
     except Exception as e:
         logger.error(f"Error getting domains: {e}")
-        return jsonify({
+        return _json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
+
+def _build_clusters():
+    """Build the /clusters payload from the cluster pool"""
+    clusters = []
+    for cluster_id, connections in node_manager.cluster_pool.items():
+        clusters.append({
+            'cluster_id': cluster_id,
+            'connection_count': len(connections),
+            'connections': [
+                {
+                    'node_id': conn.node_id,
+                    'domain_id': conn.domain_id,
+                    'channel_id': conn.channel_id
+                }
+                for conn in connections.values()
+            ]
+        })
+    
+    return {
+        'success': True,
+        'clusters': clusters
+    }
 
 @node_management_routes.route('/api/node-management/clusters')
 def get_clusters():
     """Get all cluster information"""
     try:
         if node_manager is None:
-            return jsonify({
+            return _json({
                 'success': False,
                 'error': 'Node manager not initialized'
-            }), 500
-        
-        clusters = []
-        for cluster_id, connections in node_manager.cluster_pool.items():
-            clusters.append({
-                'cluster_id': cluster_id,
-                'connection_count': len(connections),
-                'connections': [
-                    {
-                        'node_id': conn.node_id,
-                        'domain_id': conn.domain_id,
-                        'channel_id': conn.channel_id
-                    }
-                    for conn in connections
-                ]
-            })
+            }, 500)
         
-        return jsonify({
-            'success': True,
-            'clusters': clusters
-        })
+        return _cached_view('clusters', _build_clusters)
         
     except Exception as e:
         logger.error(f"Error getting clusters: {e}")
-        return jsonify({
+        return _json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
+
+def _build_channels():
+    """Build the /channels payload from the channel pool"""
+    channels = []
+    for channel_id, connections in node_manager.channel_pool.items():
+        channels.append({
+            'channel_id': channel_id,
+            'connection_count': len(connections),
+            'connections': [
+                {
+                    'node_id': conn.node_id,
+                    'domain_id': conn.domain_id,
+                    'cluster_id': conn.cluster_id
+                }
+                for conn in connections.values()
+            ]
+        })
+    
+    return {
+        'success': True,
+        'channels': channels
+    }
 
 @node_management_routes.route('/api/node-management/channels')
 def get_channels():
     """Get all channel information"""
     try:
         if node_manager is None:
-            return jsonify({
+            return _json({
                 'success': False,
                 'error': 'Node manager not initialized'
-            }), 500
+            }, 500)
         
-        channels = []
-        for channel_id, connections in node_manager.channel_pool.items():
-            channels.append({
-                'channel_id': channel_id,
-                'connection_count': len(connections),
-                'connections': [
-                    {
-                        'node_id': conn.node_id,
-                        'domain_id': conn.domain_id,
-                        'cluster_id': conn.cluster_id
-                    }
-                    for conn in connections
-                ]
-            })
-        
-        return jsonify({
-            'success': True,
-            'channels': channels
-        })
+        return _cached_view('channels', _build_channels)
         
     except Exception as e:
         logger.error(f"Error getting channels: {e}")
-        return jsonify({
+        return _json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
+
+def _build_structure():
+    """Build the /structure payload from one-pass domain/cluster groupings"""
+    structure = {
+        'domains': []
+    }
+    
+    # Group connections once: cluster connections by domain, channel connections by cluster
+    # (domain_id -> {cluster_id: [conn]}, cluster_id -> {channel_id: [conn]})
+    clusters_by_domain = defaultdict(dict)
+    for cluster_id, cluster_connections in node_manager.cluster_pool.items():
+        for conn in cluster_connections.values():
+            clusters_by_domain[conn.domain_id].setdefault(cluster_id, []).append(conn)
+    
+    channels_by_cluster = defaultdict(dict)
+    for channel_id, channel_connections in node_manager.channel_pool.items():
+        for conn in channel_connections.values():
+            channels_by_cluster[conn.cluster_id].setdefault(channel_id, []).append(conn)
+    
+    # Build hierarchical structure
+    for domain_id, domain_connections in node_manager.domain_pool.items():
+        domain_data = {
+            'domain_id': domain_id,
+            'connection_count': len(domain_connections),
+            # Only show domain main nodes
+            'main_nodes': [_node_dict(conn) for conn in domain_connections.values() if conn.is_domain_main_node],
+            'clusters': []
+        }
+        
+        # Get clusters for this domain
+        for cluster_id, cluster_domain_connections in clusters_by_domain.get(domain_id, {}).items():
+            cluster_data = {
+                'cluster_id': cluster_id,
+                'connection_count': len(cluster_domain_connections),
+                # Only show cluster main nodes
+                'main_nodes': [_node_dict(conn) for conn in cluster_domain_connections if conn.is_cluster_main_node],
+                'channels': []
+            }
+            
+            # Get channels for this cluster
+            for channel_id, channel_cluster_connections in channels_by_cluster.get(cluster_id, {}).items():
+                # Split channel main nodes and regular nodes
+                channel_main_nodes = []
+                regular_nodes = []
+                for conn in channel_cluster_connections:
+                    (channel_main_nodes if conn.is_channel_main_node else regular_nodes).append(_node_dict(conn))
+                
+                cluster_data['channels'].append({
+                    'channel_id': channel_id,
+                    'connection_count': len(channel_cluster_connections),
+                    'main_nodes': channel_main_nodes,
+                    'nodes': regular_nodes
+                })
+            
+            domain_data['clusters'].append(cluster_data)
+        
+        structure['domains'].append(domain_data)
+    
+    return {
+        'success': True,
+        'structure': structure
+    }
 
 @node_management_routes.route('/api/node-management/structure')
 def get_full_structure():
     """Get complete hierarchical node structure"""
     try:
         if node_manager is None:
-            return jsonify({
+            return _json({
                 'success': False,
                 'error': 'Node manager not initialized'
-            }), 500
+            }, 500)
         
-        structure = {
-            'domains': []
-        }
-        
-        # Build hierarchical structure
-        for domain_id, domain_connections in node_manager.domain_pool.items():
-            # Get domain main nodes (only nodes that are domain main nodes)
-            domain_main_nodes = [
-                {
-                    'node_id': conn.node_id,
-                    'user_id': conn.user_id,
-                    'username': conn.username,
-                    'is_domain_main': conn.is_domain_main_node,
-                    'is_cluster_main': conn.is_cluster_main_node,
-                    'is_channel_main': conn.is_channel_main_node
-                }
-                for conn in domain_connections
-                if conn.is_domain_main_node  # ✅ Only show domain main nodes
-            ]
-            
-            domain_data = {
-                'domain_id': domain_id,
-                'connection_count': len(domain_connections),
-                'main_nodes': domain_main_nodes,
-                'clusters': []
-            }
-            
-            # Get clusters for this domain
-            for cluster_id, cluster_connections in node_manager.cluster_pool.items():
-                # Check if cluster belongs to this domain
-                cluster_domain_connections = [
-                    conn for conn in cluster_connections 
-                    if conn.domain_id == domain_id
-                ]
-                
-                if cluster_domain_connections:
-                    # Get cluster main nodes (only nodes that are cluster main nodes)
-                    cluster_main_nodes = [
-                        {
-                            'node_id': conn.node_id,
-                            'user_id': conn.user_id,
-                            'username': conn.username,
-                            'is_domain_main': conn.is_domain_main_node,
-                            'is_cluster_main': conn.is_cluster_main_node,
-                            'is_channel_main': conn.is_channel_main_node
-                        }
-                        for conn in cluster_domain_connections
-                        if conn.is_cluster_main_node  # ✅ Only show cluster main nodes
-                    ]
-                    
-                    cluster_data = {
-                        'cluster_id': cluster_id,
-                        'connection_count': len(cluster_domain_connections),
-                        'main_nodes': cluster_main_nodes,
-                        'channels': []
-                    }
-                    
-                    # Get channels for this cluster
-                    for channel_id, channel_connections in node_manager.channel_pool.items():
-                        # Check if channel belongs to this cluster
-                        channel_cluster_connections = [
-                            conn for conn in channel_connections 
-                            if conn.cluster_id == cluster_id
-                        ]
-                        
-                        if channel_cluster_connections:
-                            # Get channel main nodes and regular nodes
-                            channel_main_nodes = [
-                                {
-                                    'node_id': conn.node_id,
-                                    'user_id': conn.user_id,
-                                    'username': conn.username,
-                                    'is_domain_main': conn.is_domain_main_node,
-                                    'is_cluster_main': conn.is_cluster_main_node,
-                                    'is_channel_main': conn.is_channel_main_node
-                                }
-                                for conn in channel_cluster_connections
-                                if conn.is_channel_main_node
-                            ]
-                            
-                            regular_nodes = [
-                                {
-                                    'node_id': conn.node_id,
-                                    'user_id': conn.user_id,
-                                    'username': conn.username,
-                                    'is_domain_main': conn.is_domain_main_node,
-                                    'is_cluster_main': conn.is_cluster_main_node,
-                                    'is_channel_main': conn.is_channel_main_node
-                                }
-                                for conn in channel_cluster_connections
-                                if not conn.is_channel_main_node
-                            ]
-                            
-                            channel_data = {
-                                'channel_id': channel_id,
-                                'connection_count': len(channel_cluster_connections),
-                                'main_nodes': channel_main_nodes,
-                                'nodes': regular_nodes
-                            }
-                            cluster_data['channels'].append(channel_data)
-                    
-                    domain_data['clusters'].append(cluster_data)
-            
-            structure['domains'].append(domain_data)
-        
-        return jsonify({
-            'success': True,
-            'structure': structure
-        })
+        return _cached_view('structure', _build_structure)
         
     except Exception as e:
         logger.error(f"Error getting full structure: {e}")
-        return jsonify({
+        return _json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 @node_management_routes.route('/api/node-management/cleanup', methods=['POST'])
 def cleanup_connections():
     """Cleanup disconnected connections"""
     try:
         if node_manager is None:
-            return jsonify({
+            return _json({
                 'success': False,
                 'error': 'Node manager not initialized'
-            }), 500
+            }, 500)
         
         # This would need to be an async call in production
         # For now, we'll return a placeholder
-        return jsonify({
+        return _json({
             'success': True,
             'message': 'Cleanup initiated',
             'note': 'Cleanup is performed automatically in background'
@@ -308,10 +307,10 @@ def cleanup_connections():
         
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
-        return jsonify({
+        return _json({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 # Import datetime for timestamp
 from datetime import datetime
@@ -4,14 +4,14 @@ Handles NSN-related API endpoints
 """
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import json
 import time
-import requests
 
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from utils.logger import get_bclient_logger
+from utils import json_provider
+from services.db_operations import store_login_cookie
 
 # Create blueprint for NSN API routes
 nsn_api_routes = Blueprint('nsn_api_routes', __name__)
@@ -24,6 +24,10 @@ db = None
 UserCookie = None
 nsn_client = None
 
+# Short-lived cache for /api/nsn/status (polled by dashboards)
+_NSN_STATUS_TTL = 3.0
+_nsn_status_cache = {'t': 0.0, 'url': None, 'v': None}
+
 
 def init_nsn_api_routes(database, user_cookie_model, nsn_service):
     """Initialize NSN API routes with database models and NSN client"""
@@ -37,7 +41,7 @@ def init_nsn_api_routes(database, user_cookie_model, nsn_service):
 def nsn_user_info():
     """Query user information from NSN"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         username = data.get('username')
         
         if not username:
@@ -53,7 +57,7 @@ def nsn_user_info():
 def nsn_current_user():
     """Get current user from NSN"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         session_cookie = data.get('session_cookie')
         
         if not session_cookie:
@@ -69,7 +73,7 @@ def nsn_current_user():
 def nsn_login():
     """Login to NSN with NMP parameters"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         username = data.get('username')
         password = data.get('password')
         nmp_params = data.get('nmp_params', {})
@@ -82,6 +86,9 @@ def nsn_login():
         result = nsn_client.login_with_nmp(username, password, nmp_params)
         
         if result['success']:
+            # Take one timestamp for the whole request
+            now_ms = int(time.time() * 1000)
+            
             # Store session data in database (like original B-Client)
             session_data = {
                 'nsn_session_data': {
@@ -92,75 +99,81 @@ def nsn_login():
                     'nmp_user_id': nmp_params.get('nmp_user_id'),
                     'nmp_username': nmp_params.get('nmp_username'),
                     'nmp_client_type': 'c-client',
-                    'nmp_timestamp': str(int(time.time() * 1000))
+                    'nmp_timestamp': str(now_ms)
                 },
                 'nsn_user_id': result.get('user_info', {}).get('user_id'),
                 'nsn_username': username,
                 'nsn_role': result.get('user_info', {}).get('role', 'traveller'),
-                'timestamp': int(time.time() * 1000)
+                'timestamp': now_ms
             }
             
+            # Encode once so the stored cookie doesn't re-serialize the dict
+            session_json = json_provider.dumps(session_data)
+            
             # Store in user_cookies table
             if user_id:
                 try:
-                    # Delete existing cookie for this user
-                    UserCookie.query.filter_by(user_id=user_id).delete()
-                    
-                    # Add new cookie
-                    cookie = UserCookie(
-                        user_id=user_id,
-                        username=username,
-                        cookie=json.dumps(session_data),
-                        auto_refresh=True,
-                        refresh_time=datetime.now()
-                    )
-                    
-                    db.session.add(cookie)
-                    db.session.commit()
+                    store_login_cookie(db, UserCookie, user_id, username, session_json,
+                                       datetime.fromtimestamp(now_ms / 1000))
                     
                     result['session_data'] = session_data
                     logger.info(f"Stored NSN session for user: {username}")
                 except Exception as e:
+                    db.session.rollback()
                     logger.warning(f"Failed to store session: {e}")
         
         return jsonify(result)
     except Exception as e:
+        logger.error(f"NSN login error: {e}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@nsn_api_routes.route('/api/nsn/status')
+@nsn_api_routes.route('/api/nsn/status', provide_automatic_options=False)
 def nsn_status():
     """Check NSN server status"""
+    # Serve recent results from cache so dashboard polling doesn't hit NSN every time
+    now = time.monotonic()
+    cached = _nsn_status_cache
+    if cached['v'] is not None and cached['url'] == nsn_client.base_url and now - cached['t'] < _NSN_STATUS_TTL:
+        response = jsonify(cached['v'])
+        response.headers['Cache-Control'] = f'max-age={int(_NSN_STATUS_TTL)}'
+        return response
+    
     try:
         # Try to access NSN root page instead of /api/health which doesn't exist in production
         url = f"{nsn_client.base_url}/"
         logger.info(f"NSN Status Check: Attempting to access {url}")
         
-        response = requests.get(url, timeout=10)
+        response = nsn_client.session.get(url, timeout=10)
         logger.info(f"NSN Status Check: Response status {response.status_code}")
 
         if response.status_code == 200:
             logger.info("NSN Status Check: Success - NSN is online")
-            return jsonify({
+            payload = {
                 'success': True,
                 'nsn_url': nsn_client.base_url,
                 'status': 'online',
                 'response_time': response.elapsed.total_seconds()
-            })
+            }
         else:
             logger.warning(f"NSN Status Check: Failed - HTTP {response.status_code}")
-            return jsonify({
+            payload = {
                 'success': False,
                 'nsn_url': nsn_client.base_url,
                 'status': 'offline',
                 'error': f'HTTP {response.status_code}'
-            })
+            }
     except Exception as e:
         logger.error(f"NSN Status Check: Exception occurred - {str(e)}")
-        return jsonify({
+        payload = {
             'success': False,
             'nsn_url': nsn_client.base_url,
             'status': 'offline',
             'error': str(e)
-        })
+        }
+    
+    _nsn_status_cache.update({'t': now, 'url': nsn_client.base_url, 'v': payload})
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = f'max-age={int(_NSN_STATUS_TTL)}'
+    return response
 
@@ -6,7 +6,7 @@ Contains all service modules for B-Client
 # Import all services
 from .cluster_verification import init_cluster_verification, verify_user_cluster
 from .cluster_verification_handler import init_cluster_verification_handler, handle_cluster_verification_message
-from .sync_data_queries import init_sync_data_queries, get_valid_batches_for_channel, get_batch_first_record_data, get_user_recent_activity, get_user_browsing_patterns
+from .sync_data_queries import init_sync_data_queries, get_valid_batches_for_channel, get_valid_batches_for_channels, get_batch_first_record_data, get_user_recent_activity, get_user_browsing_patterns
 
 __all__ = [
     'init_cluster_verification',
@@ -15,6 +15,7 @@ __all__ = [
     'handle_cluster_verification_message',
     'init_sync_data_queries',
     'get_valid_batches_for_channel',
+    'get_valid_batches_for_channels',
     'get_batch_first_record_data',
     'get_user_recent_activity',
     'get_user_browsing_patterns'
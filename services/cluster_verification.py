@@ -346,11 +346,9 @@ class ClusterVerificationService:
     def _cleanup_response_event(self, node_id: str):
         """Clean up response event after processing"""
         try:
-            if node_id in self.response_events:
-                del self.response_events[node_id]
+            if self.response_events.pop(node_id, None) is not None:
                 logger.info(f"🔍 ✅ Cleaned up response event for node {node_id}")
-            if node_id in self.pending_responses:
-                del self.pending_responses[node_id]
+            if self.pending_responses.pop(node_id, None) is not None:
                 logger.info(f"🔍 ✅ Cleaned up pending response for node {node_id}")
         except Exception as e:
             logger.error(f"Error cleaning up response event for node {node_id}: {e}")
@@ -359,11 +357,9 @@ class ClusterVerificationService:
         """Clean up client response event after processing"""
         try:
             response_key = f"client_{user_id}"
-            if response_key in self.response_events:
-                del self.response_events[response_key]
+            if self.response_events.pop(response_key, None) is not None:
                 logger.info(f"🔍 ✅ Cleaned up client response event for user {user_id}")
-            if response_key in self.pending_responses:
-                del self.pending_responses[response_key]
+            if self.pending_responses.pop(response_key, None) is not None:
                 logger.info(f"🔍 ✅ Cleaned up client pending response for user {user_id}")
         except Exception as e:
             logger.error(f"Error cleaning up client response event for user {user_id}: {e}")
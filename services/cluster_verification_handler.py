@@ -1,32 +1,215 @@
 """
 Cluster Verification WebSocket Handler
 Handles WebSocket messages for cluster verification process
+
+Note: app.py does not call init_cluster_verification_handler / init_sync_data_queries (this
+B-Client has no sync_data table), so the handler only runs where a host app initializes it.
 """
 import asyncio
-import datetime
-import json
-import os
-import sys
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
 
-# Import logging system
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from flask import current_app
+
+# Import logging system (repo root is on sys.path: this module is only loaded via the services package)
 from utils.logger import get_bclient_logger
 
 # Import sync data queries
-from .sync_data_queries import get_valid_batches_for_channel, get_batch_first_record_data
+from .sync_data_queries import get_valid_batches_for_channels, get_batch_first_record_data
 
 # Initialize logger
 logger = get_bclient_logger('cluster_verification_handler')
 
+# In-process caches for the read-only sync_data lookups used during verification
+FIRST_RECORD_CACHE_SIZE = 4096  # A batch's first record doesn't change once written
+VALID_BATCHES_CACHE_SIZE = 1024
+VALID_BATCHES_TTL = 60.0  # Seconds; new batches keep arriving per channel
+
+_first_record_cache = OrderedDict()  # batch_id -> first record (LRU order)
+_valid_batches_cache = OrderedDict()  # (channel_id, min_batch_size) -> (expires_at, batches)
+
+# Shared miss responses (returned as-is; callers only serialize them)
+RESPONSE_NO_VALID_BATCHES = {
+    'type': 'cluster_verification_response',
+    'success': False,
+    'message': 'No valid batches found'
+}
+RESPONSE_NO_FIRST_RECORD = {
+    'type': 'cluster_verification_response',
+    'success': False,
+    'message': 'No first record found for batch'
+}
+RESPONSE_INTERNAL_ERROR = {
+    'type': 'cluster_verification_response',
+    'success': False,
+    'error': 'Internal error during cluster verification'
+}
+
+# Repeated failures (e.g. a DB outage) are logged once per interval per (context, exception type)
+ERROR_LOG_INTERVAL = 60.0  # Seconds
+_error_log_state = {}  # (context, exception type) -> [last logged monotonic time, suppressed count]
+
+
+def _log_error_throttled(context: str, e: Exception):
+    """logger.error(context: e), rate-limited so an outage doesn't flood the log on every request"""
+    now = time.monotonic()
+    key = (context, type(e))
+    state = _error_log_state.get(key)
+    if state is None:
+        state = _error_log_state[key] = [now - ERROR_LOG_INTERVAL, 0]
+    if now - state[0] < ERROR_LOG_INTERVAL:
+        state[1] += 1
+        return
+    
+    if state[1]:
+        logger.error("%s: %s (%d similar errors suppressed)", context, e, state[1])
+    else:
+        logger.error("%s: %s", context, e)
+    state[0] = now
+    state[1] = 0
+
+# Blocking SQLAlchemy lookups run on a small dedicated pool so the WebSocket loop stays free
+# (kept small to bound concurrent SQLite readers)
+DB_EXECUTOR_WORKERS = 8
+
+# get_valid_batch queries arriving within this window are answered by one IN (...) query
+BATCH_QUERY_WINDOW = 0.002  # Seconds
+BATCH_QUERY_MAX = 64
+
+# Upper bound on how long a coalesced lookup (and its pending_requests entry) may stay in flight
+PENDING_LOOKUP_TIMEOUT = 30.0  # Seconds
+
+
+def _call_in_app_context(app, database, func, *args):
+    """Run func(*args) on a DB pool thread inside an app context, releasing that thread's scoped session"""
+    with app.app_context():
+        try:
+            return func(*args)
+        finally:
+            database.session.remove()
+
 
 class ClusterVerificationHandler:
     """WebSocket handler for cluster verification messages"""
     
-    def __init__(self, websocket_client, database):
+    # Fixed attribute set: no per-instance __dict__, slot access on every message
+    __slots__ = ('websocket_client', 'db', 'app', 'pending_requests', '_db_pool',
+                 '_batch_query_queue', '_batch_query_task', '_msg_dispatch')
+    
+    def __init__(self, websocket_client, database, app=None):
         self.websocket_client = websocket_client
         self.db = database
-        self.pending_requests = {}  # Store pending verification requests
+        # db.session needs an application context; DB pool threads push this app's context per lookup
+        self.app = app if app is not None else current_app._get_current_object()
+        self.pending_requests: Dict[tuple, asyncio.Future] = {}  # In-flight lookups: cache key -> shared Future
+        self._db_pool = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='cluster-verification-db')
+        self._batch_query_queue = None
+        self._batch_query_task = None
+        # Message type -> coroutine handler, looked up once per message in process_websocket_message
+        self._msg_dispatch = {
+            'cluster_verification_query': self.handle_cluster_verification_query,
+            'cluster_verification_request': self.handle_client_verification_request,
+        }
+    
+    async def _run_db(self, func, *args):
+        """Run a blocking sync_data query on the DB pool so the event loop stays free"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._db_pool, _call_in_app_context, self.app, self.db, func, *args)
+    
+    async def _queue_valid_batches_query(self, channel_id: str, min_batch_size: int):
+        """Queue a get_valid_batch lookup for the micro-batching worker and wait for its rows"""
+        loop = asyncio.get_running_loop()
+        task = self._batch_query_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._batch_query_queue = asyncio.Queue()
+            self._batch_query_task = loop.create_task(self._valid_batches_worker(self._batch_query_queue))
+        
+        future = loop.create_future()
+        self._batch_query_queue.put_nowait((channel_id, min_batch_size, future))
+        return await future
+    
+    async def _valid_batches_worker(self, queue):
+        """Drain queued get_valid_batch lookups every few ms into one query per min_batch_size"""
+        while True:
+            pending = [await queue.get()]
+            await asyncio.sleep(BATCH_QUERY_WINDOW)
+            while len(pending) < BATCH_QUERY_MAX and not queue.empty():
+                pending.append(queue.get_nowait())
+            
+            requests_by_size = defaultdict(list)
+            for channel_id, min_batch_size, future in pending:
+                requests_by_size[min_batch_size].append((channel_id, future))
+            
+            for min_batch_size, requests in requests_by_size.items():
+                channel_ids = list(dict.fromkeys(channel_id for channel_id, _ in requests))
+                try:
+                    batches_by_channel = await self._run_db(get_valid_batches_for_channels, channel_ids, min_batch_size)
+                except Exception as e:
+                    _log_error_throttled("Error running batched valid batch query", e)
+                    for _, future in requests:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                
+                for channel_id, future in requests:
+                    if not future.done():
+                        future.set_result(batches_by_channel.get(channel_id, []))
+    
+    async def _coalesced_lookup(self, key, fetch, *args):
+        """Await fetch(*args) once for concurrent callers asking for the same key"""
+        loop = asyncio.get_running_loop()
+        pending = self.pending_requests.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            return await asyncio.shield(pending)
+        
+        future = loop.create_future()
+        self.pending_requests[key] = future
+        try:
+            result = await asyncio.wait_for(fetch(*args), PENDING_LOOKUP_TIMEOUT)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()  # Don't leave waiters hanging on an abandoned lookup
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved here; waiters still get it raised
+            raise
+        finally:
+            if self.pending_requests.get(key) is future:
+                del self.pending_requests[key]
+    
+    async def _get_valid_batches(self, channel_id: str, min_batch_size: int):
+        """Valid batches for a channel (micro-batched query) with a short TTL cache"""
+        key = (channel_id, min_batch_size)
+        cached = _valid_batches_cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        
+        valid_batches = await self._coalesced_lookup(('valid_batches',) + key, self._queue_valid_batches_query, channel_id, min_batch_size)
+        if valid_batches:
+            _valid_batches_cache[key] = (time.monotonic() + VALID_BATCHES_TTL, valid_batches)
+            _valid_batches_cache.move_to_end(key)
+            if len(_valid_batches_cache) > VALID_BATCHES_CACHE_SIZE:
+                _valid_batches_cache.popitem(last=False)
+        return valid_batches
+    
+    async def _get_first_record(self, batch_id: str):
+        """get_batch_first_record_data with an LRU cache (first records are immutable)"""
+        record = _first_record_cache.get(batch_id)
+        if record is not None:
+            _first_record_cache.move_to_end(batch_id)
+            return record
+        
+        record = await self._coalesced_lookup(('first_record', batch_id), self._run_db, get_batch_first_record_data, batch_id)
+        if record:
+            _first_record_cache[batch_id] = record
+            if len(_first_record_cache) > FIRST_RECORD_CACHE_SIZE:
+                _first_record_cache.popitem(last=False)
+        return record
     
     async def handle_cluster_verification_query(self, message: Dict, connection) -> Optional[Dict]:
         """
@@ -40,33 +223,26 @@ class ClusterVerificationHandler:
             Response message, or None if no response needed
         """
         try:
-            logger.info(f"===== OTHER NODE RECEIVED CLUSTER VERIFICATION QUERY =====")
-            logger.info(f"Query action: {message.get('action')}")
-            logger.info(f"Channel ID: {message.get('channel_id')}")
-            logger.info(f"Min batch size: {message.get('min_batch_size', 3)}")
-            logger.info(f"Timestamp: {message.get('timestamp')}")
-            
             action = message.get('action')
             channel_id = message.get('channel_id')
             min_batch_size = message.get('min_batch_size', 3)
             
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("===== OTHER NODE RECEIVED CLUSTER VERIFICATION QUERY =====")
+                logger.debug("Query action: %s, channel ID: %s, min batch size: %s, timestamp: %s",
+                             action, channel_id, min_batch_size, message.get('timestamp'))
+            
             if action == 'get_valid_batch':
-                logger.info(f"===== OTHER NODE PROCESSING GET_VALID_BATCH QUERY =====")
                 result = await self._handle_get_valid_batch_query(channel_id, min_batch_size)
-                logger.info(f"===== OTHER NODE PREPARING RESPONSE =====")
-                logger.info(f"Response: {result}")
+                logger.debug("Response ready: success=%s", result.get('success'))
                 return result
             else:
                 logger.warning(f"Unknown cluster verification action: {action}")
                 return None
                 
         except Exception as e:
-            logger.error(f"Error handling cluster verification query: {e}")
-            return {
-                'type': 'cluster_verification_response',
-                'success': False,
-                'error': str(e)
-            }
+            _log_error_throttled("Error handling cluster verification query", e)
+            return RESPONSE_INTERNAL_ERROR
     
     async def _handle_get_valid_batch_query(self, channel_id: str, min_batch_size: int) -> Dict:
         """
@@ -80,43 +256,27 @@ class ClusterVerificationHandler:
             Response with batch data
         """
         try:
-            logger.info(f"===== OTHER NODE QUERYING DATABASE FOR VALID BATCHES =====")
-            logger.info(f"Channel ID: {channel_id}")
-            logger.info(f"Min batch size: {min_batch_size}")
-            
             # Get valid batches
-            valid_batches = get_valid_batches_for_channel(channel_id, min_batch_size)
+            valid_batches = await self._get_valid_batches(channel_id, min_batch_size)
             
             if not valid_batches:
-                logger.info(f"===== OTHER NODE NO VALID BATCHES FOUND FOR CHANNEL {channel_id} =====")
-                return {
-                    'type': 'cluster_verification_response',
-                    'success': False,
-                    'message': 'No valid batches found'
-                }
-            
-            logger.info(f"===== OTHER NODE FOUND {len(valid_batches)} VALID BATCHES =====")
-            logger.info(f"Valid batches: {[batch['batch_id'] for batch in valid_batches]}")
+                logger.info("No valid batches found for channel %s", channel_id)
+                return RESPONSE_NO_VALID_BATCHES
             
             # Get the first valid batch
             first_batch = valid_batches[0]
             batch_id = first_batch['batch_id']
-            
-            logger.info(f"===== OTHER NODE GETTING FIRST RECORD FOR BATCH {batch_id} =====")
+            logger.debug("Found %d valid batches for channel %s, using batch %s", len(valid_batches), channel_id, batch_id)
             
             # Get the first record of the batch
-            first_record = get_batch_first_record_data(batch_id)
+            first_record = await self._get_first_record(batch_id)
             
             if not first_record:
-                logger.warning(f"===== OTHER NODE NO FIRST RECORD FOUND FOR BATCH {batch_id} =====")
-                return {
-                    'type': 'cluster_verification_response',
-                    'success': False,
-                    'message': 'No first record found for batch'
-                }
+                logger.warning("No first record found for batch %s", batch_id)
+                return RESPONSE_NO_FIRST_RECORD
             
-            logger.info(f"===== OTHER NODE FOUND VALID BATCH {batch_id} WITH {first_batch['record_count']} RECORDS =====")
-            logger.info(f"First record keys: {list(first_record.keys())}")
+            logger.debug("Found valid batch %s with %s records (%d fields in first record)",
+                         batch_id, first_batch['record_count'], len(first_record))
             
             return {
                 'type': 'cluster_verification_response',
@@ -129,12 +289,8 @@ class ClusterVerificationHandler:
             }
             
         except Exception as e:
-            logger.error(f"Error handling get valid batch query: {e}")
-            return {
-                'type': 'cluster_verification_response',
-                'success': False,
-                'error': str(e)
-            }
+            _log_error_throttled("Error handling get valid batch query", e)
+            return RESPONSE_INTERNAL_ERROR
     
     async def handle_client_verification_request(self, message: Dict, connection) -> Optional[Dict]:
         """
@@ -148,37 +304,30 @@ class ClusterVerificationHandler:
             Response message, or None if no response needed
         """
         try:
-            logger.info(f"===== C-CLIENT RECEIVED VERIFICATION REQUEST =====")
-            logger.info(f"Request action: {message.get('action')}")
-            logger.info(f"User ID: {message.get('user_id')}")
-            logger.info(f"Batch ID: {message.get('batch_id')}")
-            logger.info(f"Timestamp: {message.get('timestamp')}")
-            
             action = message.get('action')
             user_id = message.get('user_id')
             batch_id = message.get('batch_id')
             
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("===== C-CLIENT RECEIVED VERIFICATION REQUEST =====")
+                logger.debug("Request action: %s, user ID: %s, batch ID: %s, timestamp: %s",
+                             action, user_id, batch_id, message.get('timestamp'))
+            
             if action == 'verify_batch':
-                logger.info(f"===== C-CLIENT PROCESSING VERIFY_BATCH REQUEST =====")
                 result = await self._handle_verify_batch_request(user_id, batch_id)
-                logger.info(f"===== C-CLIENT PREPARING VERIFICATION RESPONSE =====")
-                logger.info(f"Response: {result}")
+                logger.debug("Response ready: success=%s", result.get('success'))
                 return result
             else:
                 logger.warning(f"Unknown client verification action: {action}")
                 return None
                 
         except Exception as e:
-            logger.error(f"Error handling client verification request: {e}")
-            return {
-                'type': 'cluster_verification_response',
-                'success': False,
-                'error': str(e)
-            }
+            _log_error_throttled("Error handling client verification request", e)
+            return RESPONSE_INTERNAL_ERROR
     
     async def _handle_verify_batch_request(self, user_id: str, batch_id: str) -> Dict:
         """
-        Handle verify batch request
+        Handle verify batch request (shared by both verify-batch entry points)
         
         Args:
             user_id: User ID
@@ -188,37 +337,36 @@ class ClusterVerificationHandler:
             Response with verification result
         """
         try:
-            logger.info(f"===== C-CLIENT VERIFYING BATCH {batch_id} FOR USER {user_id} =====")
+            # Integer clock read only; it is formatted solely when DEBUG logging is on
+            debug = logger.isEnabledFor(logging.DEBUG)
+            started_ns = time.monotonic_ns() if debug else 0
             
-            logger.info(f"===== C-CLIENT QUERYING DATABASE FOR BATCH {batch_id} =====")
+            if debug:
+                logger.debug("Verifying batch %s for user %s", batch_id, user_id)
             
             # Get the first record of the batch
-            first_record = get_batch_first_record_data(batch_id)
+            first_record = await self._get_first_record(batch_id)
             
             if not first_record:
-                logger.warning(f"===== C-CLIENT NO FIRST RECORD FOUND FOR BATCH {batch_id} =====")
-                return {
-                    'type': 'cluster_verification_response',
-                    'success': False,
-                    'message': 'No first record found for batch'
-                }
-            
-            logger.info(f"===== C-CLIENT FOUND FIRST RECORD FOR BATCH {batch_id} =====")
-            logger.info(f"Record keys: {list(first_record.keys())}")
+                logger.warning("No first record found for batch %s (user %s)", batch_id, user_id)
+                return RESPONSE_NO_FIRST_RECORD
             
-            return {
+            response = {
                 'type': 'cluster_verification_response',
                 'success': True,
                 'record': first_record
             }
             
+            if debug:
+                logger.debug("Found first record %s for batch %s (%d fields), response ready in %.3f ms",
+                             first_record.get('id'), batch_id, len(first_record),
+                             (time.monotonic_ns() - started_ns) / 1e6)
+            
+            return response
+            
         except Exception as e:
-            logger.error(f"Error handling verify batch request: {e}")
-            return {
-                'type': 'cluster_verification_response',
-                'success': False,
-                'error': str(e)
-            }
+            _log_error_throttled("Error handling verify batch request", e)
+            return RESPONSE_INTERNAL_ERROR
     
     async def process_websocket_message(self, message: Dict, connection) -> Optional[Dict]:
         """
@@ -232,18 +380,15 @@ class ClusterVerificationHandler:
             Response message, or None if no response needed
         """
         try:
-            message_type = message.get('type')
-            
-            if message_type == 'cluster_verification_query':
-                return await self.handle_cluster_verification_query(message, connection)
-            elif message_type == 'cluster_verification_request':
-                return await self.handle_client_verification_request(message, connection)
-            else:
+            handler = self._msg_dispatch.get(message.get('type'))
+            if handler is None:
                 # Not a cluster verification message
                 return None
+            
+            return await handler(message, connection)
                 
         except Exception as e:
-            logger.error(f"Error processing WebSocket message: {e}")
+            _log_error_throttled("Error processing WebSocket message", e)
             return None
     
     async def handle_verify_batch_request(self, message: Dict) -> Dict:
@@ -256,75 +401,25 @@ class ClusterVerificationHandler:
         Returns:
             Response message
         """
-        try:
-            batch_id = message.get('batch_id')
-            user_id = message.get('user_id')
-            
-            logger.info(f"===== C-CLIENT RECEIVED VERIFICATION REQUEST FROM B-CLIENT =====")
-            logger.info(f"Request Type: {message.get('type')}")
-            logger.info(f"Action: {message.get('action')}")
-            logger.info(f"Batch ID: {batch_id}")
-            logger.info(f"User ID: {user_id}")
-            logger.info(f"Timestamp: {message.get('timestamp')}")
-            logger.info(f"Received Time: {datetime.now().isoformat()}")
-            
-            logger.info(f"===== C-CLIENT QUERYING LOCAL DATABASE FOR BATCH {batch_id} =====")
-            
-            # Get first record from batch
-            first_record = get_batch_first_record_data(batch_id)
-            
-            if not first_record:
-                logger.warning(f"===== C-CLIENT NO FIRST RECORD FOUND FOR BATCH {batch_id} =====")
-                logger.warning(f"Batch ID: {batch_id}")
-                logger.warning(f"User ID: {user_id}")
-                return {
-                    'type': 'cluster_verification_response',
-                    'success': False,
-                    'message': 'No first record found for batch'
-                }
-            
-            logger.info(f"===== C-CLIENT FOUND FIRST RECORD FOR BATCH {batch_id} =====")
-            logger.info(f"Record ID: {first_record.get('id')}")
-            logger.info(f"Record URL: {first_record.get('url')}")
-            logger.info(f"Record Title: {first_record.get('title')}")
-            logger.info(f"Record Timestamp: {first_record.get('timestamp')}")
-            logger.info(f"Record Keys: {list(first_record.keys())}")
-            
-            # Create response message
-            response = {
-                'type': 'cluster_verification_response',
-                'success': True,
-                'record': first_record
-            }
-            
-            logger.info(f"===== C-CLIENT SENDING VERIFICATION RESPONSE TO B-CLIENT =====")
-            logger.info(f"Response Type: {response['type']}")
-            logger.info(f"Response Success: {response['success']}")
-            logger.info(f"Response Record Keys: {list(response['record'].keys())}")
-            logger.info(f"Sent Time: {datetime.now().isoformat()}")
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"===== C-CLIENT ERROR HANDLING VERIFY BATCH REQUEST =====")
-            logger.error(f"Batch ID: {batch_id}")
-            logger.error(f"User ID: {user_id}")
-            logger.error(f"Error: {e}")
-            return {
-                'type': 'cluster_verification_response',
-                'success': False,
-                'error': str(e)
-            }
+        batch_id = message.get('batch_id')
+        user_id = message.get('user_id')
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("===== C-CLIENT RECEIVED VERIFICATION REQUEST FROM B-CLIENT =====")
+            logger.debug("Request type: %s, action: %s, batch ID: %s, user ID: %s, timestamp: %s",
+                         message.get('type'), message.get('action'), batch_id, user_id, message.get('timestamp'))
+        
+        return await self._handle_verify_batch_request(user_id, batch_id)
 
 
 # Global instance
 cluster_verification_handler = None
 
 
-def init_cluster_verification_handler(websocket_client, database):
-    """Initialize cluster verification handler"""
+def init_cluster_verification_handler(websocket_client, database, app=None):
+    """Initialize cluster verification handler (app defaults to the current Flask app)"""
     global cluster_verification_handler
-    cluster_verification_handler = ClusterVerificationHandler(websocket_client, database)
+    cluster_verification_handler = ClusterVerificationHandler(websocket_client, database, app)
     logger.info("Cluster verification handler initialized")
 
 
@@ -7,7 +7,9 @@ import json
 import time
 import sys
 import os
-import traceback
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # Import logging system
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -75,13 +77,44 @@ def save_cookie_to_db(db, UserCookie, user_id, username, raw_session_cookie, nod
         logger.info(f"===== END SAVING COOKIE TO DATABASE =====")
         
     except Exception as e:
-        logger.error(f"Failed to save cookie to database: {e}")
+        logger.error(f"Failed to save cookie to database: {e}", exc_info=True)
         logger.info(f"Rolling back transaction...")
         db.session.rollback()
-        logger.error(f"Traceback: {traceback.format_exc()}")
         raise e
 
 
+def store_login_cookie(db, UserCookie, user_id, username, cookie, refresh_time):
+    """
+    Store the NSN login session as the user's only cookie row (caller rolls back on error)
+    Rows under other usernames are dropped; an existing (user_id, username) row is updated in place,
+    keeping its node_id and create_time
+    """
+    cookie_table = UserCookie.__table__
+    
+    # Drop cookies stored for this user under other usernames
+    db.session.execute(
+        delete(cookie_table).where(
+            cookie_table.c.user_id == user_id,
+            cookie_table.c.username != username
+        )
+    )
+    
+    # Insert or update this user's cookie in one Core statement (no ORM load/flush)
+    stmt = sqlite_insert(cookie_table).values(
+        user_id=user_id,
+        username=username,
+        cookie=cookie,
+        auto_refresh=True,
+        refresh_time=refresh_time
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'username'],
+        set_={column: stmt.excluded[column] for column in ('cookie', 'auto_refresh', 'refresh_time')}
+    )
+    db.session.execute(stmt)
+    db.session.commit()
+
+
 def save_account_to_db(db, UserAccount, user_id, username, account, password, account_data, logger=None):
     """Save account information to user_accounts table"""
     # Initialize logger if not provided
@@ -132,9 +165,8 @@ def save_account_to_db(db, UserAccount, user_id, username, account, password, ac
         logger.info(f"===== END SAVING ACCOUNT TO DATABASE =====")
         
     except Exception as e:
-        logger.error(f"Failed to save account to database: {e}")
+        logger.error(f"Failed to save account to database: {e}", exc_info=True)
         logger.info(f"Rolling back transaction...")
         db.session.rollback()
-        logger.error(f"Traceback: {traceback.format_exc()}")
         raise e
 
@@ -4,6 +4,7 @@ Database table definitions for B-Client Flask Application
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import datetime
 
 # Import logging system
@@ -51,6 +52,10 @@ class UserAccount(db.Model):
     personal details, and registration metadata.
     """
     __tablename__ = 'user_accounts'
+    __table_args__ = (
+        # NSN account lookups filter by (user_id, website), skipping the username column of the PK
+        db.Index('ix_user_accounts_user_website', 'user_id', 'website'),
+    )
     
     # Primary Keys (Composite)
     user_id = db.Column(db.String(50), primary_key=True, comment='User ID')
@@ -87,6 +92,13 @@ class UserSecurityCode(db.Model):
     Links users with their domain, cluster, and channel hierarchy.
     """
     __tablename__ = 'user_security_codes'
+    __table_args__ = (
+        db.Index('ix_user_security_codes_security_code', 'security_code'),
+        db.Index('ix_user_security_codes_nmp_username', 'nmp_username'),
+        db.Index('ix_user_security_codes_channel', 'channel_id'),
+        # Periodic cleanup deletes by create_time range
+        db.Index('ix_user_security_codes_create_time', 'create_time'),
+    )
     
     # Primary Key
     nmp_user_id = db.Column(db.String(50), primary_key=True, comment='NMP User ID (UUID)')
@@ -109,6 +121,25 @@ class UserSecurityCode(db.Model):
     def __repr__(self):
         return f'<UserSecurityCode {self.nmp_username}@{self.nmp_user_id}>'
 
+# Per-connection SQLite settings: WAL lets verification reads run alongside writes,
+# synchronous=NORMAL is durable under WAL without an fsync per commit
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',  # 256 MB memory-mapped reads
+    'PRAGMA cache_size=-65536',    # 64 MB page cache
+    'PRAGMA temp_store=MEMORY',
+)
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Engine 'connect' listener: apply SQLITE_PRAGMAS to each new pooled connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
 # Note: DomainNode class removed - domain information now managed by NodeManager connection pools
 
 # Database initialization function
@@ -121,13 +152,31 @@ def init_db(app):
     db.init_app(app)
     
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _apply_sqlite_pragmas)
+        
         try:
             db.create_all()
             logger.info("Database tables created successfully")
+            ensure_indexes()
         except Exception as e:
             logger.warning(f"Database creation warning: {e}")
             logger.info("If using SQLCipher, make sure pysqlcipher3 is installed")
             logger.info("Run: pip install pysqlcipher3")
 
+def ensure_indexes():
+    """Create model indexes missing from tables that predate them
+    
+    create_all() skips tables that already exist, so indexes added later are
+    created here individually (CREATE INDEX IF NOT EXISTS semantics).
+    Must be called inside an application context.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except Exception as e:
+                logger.warning(f"Index creation warning for {index.name}: {e}")
+
 # Export all models for easy importing
-__all__ = ['db', 'UserCookie', 'UserAccount', 'UserSecurityCode', 'init_db']
+__all__ = ['db', 'UserCookie', 'UserAccount', 'UserSecurityCode', 'init_db', 'ensure_indexes']
@@ -1,21 +1,65 @@
-import uuid
 import asyncio
+import functools
+import itertools
+import types
 import logging
 import sys
 import os
 import traceback
-import json
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from websockets.exceptions import ConnectionClosed
 
 # Import logging system
 sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
 from utils.logger import get_bclient_logger
+from utils import json_provider
 
-@dataclass
+# Log section separators, built once
+_BANNER = "=" * 80
+_RULE = "─" * 80
+
+# NMP URL parameters read by register_c_client, in unpacking order
+_NMP_FIELDS = (
+    'nmp_node_id', 'nmp_user_id', 'nmp_username',
+    'nmp_domain_main_node_id', 'nmp_cluster_main_node_id', 'nmp_channel_main_node_id',
+    'nmp_domain_id', 'nmp_cluster_id', 'nmp_channel_id',
+)
+
+
+# Shared read-only stand-in for a response without a "data" object
+_NO_DATA = types.MappingProxyType({})
+
+def _response_data(response: Dict[str, Any]):
+    """Return a C-Client response's "data" mapping without allocating an empty dict when it is missing"""
+    return response.get('data') or _NO_DATA
+
+def _intern(value):
+    """sys.intern ID strings so repeated pool hashing/equality hits the identity fast path"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+# C-Client command round trips
+COMMAND_RESPONSE_TIMEOUT = 30.0  # Seconds (default)
+# Shorter limits for commands the C-Client answers from local state; node creation keeps the
+# default since a slow new_*_node reply is still applied through the late-response path
+COMMAND_TIMEOUTS = {
+    "count_peers_amount": 5.0,
+    "assign_to_channel": 15.0,
+    "assign_to_cluster": 15.0,
+    "assign_to_domain": 15.0,
+}
+# How long a timed-out request_id stays in pending_requests so a late response can still be applied
+LATE_RESPONSE_GRACE = 120.0  # Seconds
+# Maximum nodes per channel / channels per cluster / clusters per domain
+POOL_CAPACITY = 1000
+# Request ID prefix for notifications sent without waiting for a response
+_NOTIFY_PREFIX = "notify-"
+# Result set on a pending request's future when its timeout fires
+_TIMED_OUT = object()
+
+@dataclass(slots=True)
 class ClientConnection:
-    """Represents a WebSocket connection to a C-Client"""
+    """Represents a WebSocket connection to a C-Client (slotted: fixed fields, no per-instance __dict__)"""
     websocket: Any
     node_id: Optional[str] = None
     user_id: Optional[str] = None
@@ -31,6 +75,20 @@ class ClientConnection:
     is_domain_main_node: bool = False
     is_cluster_main_node: bool = False
     is_channel_main_node: bool = False
+    # websocket.send bound once per websocket (send_to_c_client hot path)
+    ws_send: Any = field(default=None, init=False, repr=False, compare=False)
+    # Set once the websocket is seen closed; a closed websocket never becomes valid again, so
+    # later validity checks skip the attribute walk (reset on reconnect / logout flag cleared)
+    ws_closed: bool = field(default=False, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.ws_send = getattr(self.websocket, 'send', None)
+    
+    def set_websocket(self, websocket: Any):
+        """Switch to a new websocket (reconnect), rebinding the cached send method"""
+        self.websocket = websocket
+        self.ws_send = getattr(websocket, 'send', None)
+        self.ws_closed = False
 
 class NodeManager:
     """
@@ -42,18 +100,48 @@ class NodeManager:
         # Initialize logging system
         self.logger = get_bclient_logger('nodemanager')
         
-        # Connection pools: key -> list of ClientConnection
-        self.domain_pool: Dict[str, List[ClientConnection]] = {}
-        self.cluster_pool: Dict[str, List[ClientConnection]] = {}
-        self.channel_pool: Dict[str, List[ClientConnection]] = {}
+        # Connection pools: key -> {node_id: ClientConnection} (insertion ordered, O(1) add/remove by node_id)
+        self.domain_pool: Dict[str, Dict[str, ClientConnection]] = {}
+        self.cluster_pool: Dict[str, Dict[str, ClientConnection]] = {}
+        self.channel_pool: Dict[str, Dict[str, ClientConnection]] = {}
+        
+        # level -> (pool, ClientConnection attribute holding that level's ID)
+        self._pools: Dict[str, Tuple[Dict[str, Dict[str, ClientConnection]], str]] = {
+            'domain': (self.domain_pool, 'domain_id'),
+            'cluster': (self.cluster_pool, 'cluster_id'),
+            'channel': (self.channel_pool, 'channel_id'),
+        }
+        
+        # Reverse index of live child pools: cluster_id -> channel_ids, domain_id -> cluster_ids
+        # (lets the pool-removal checks test for active children without scanning connections)
+        self.cluster_channels: Dict[str, set] = {}
+        self.domain_clusters: Dict[str, set] = {}
+        # child level -> (parent ID attribute, parent -> children index, child -> parent map)
+        self._child_links: Dict[str, Tuple[str, Dict[str, set], Dict[str, str]]] = {
+            'channel': ('cluster_id', self.cluster_channels, {}),
+            'cluster': ('domain_id', self.domain_clusters, {}),
+        }
+        
+        # node_id -> pooled ClientConnection, so disconnects resolve without knowing the hierarchy
+        self.node_index: Dict[str, ClientConnection] = {}
         
-        # Fast lookup indexes for O(1) removal by node_id
-        self.domain_node_index: Dict[str, Dict[str, ClientConnection]] = {}    # domain_id -> {node_id: ClientConnection}
-        self.cluster_node_index: Dict[str, Dict[str, ClientConnection]] = {}   # cluster_id -> {node_id: ClientConnection}
-        self.channel_node_index: Dict[str, Dict[str, ClientConnection]] = {}   # channel_id -> {node_id: ClientConnection}
+        # Disconnects waiting for the next loop tick: node_id -> websocket that disconnected
+        self._pending_removals: Dict[str, Any] = {}
         
         # Request tracking for async operations
         self.pending_requests: Dict[str, asyncio.Future] = {}
+        # Broadcast sends in flight (strong references so the tasks are not garbage collected)
+        self._background_sends: set = set()
+        # Late responses waiting for _late_response_loop (created on first use, on the running loop)
+        self._late_responses: Optional[asyncio.Queue] = None
+        self._late_response_task: Optional[asyncio.Task] = None
+        # Request IDs only need to be unique within this process
+        self._request_seq = itertools.count(1)
+        
+        # Bumped on every pool/topology change so read-only views can cache their output
+        self.revision: int = 0
+        # (revision, stats) from the last get_pool_stats() call
+        self._pool_stats_cache: Optional[Tuple[int, Dict[str, Any]]] = None
         
         self.logger.info("NodeManager initialized with connection pools")
     
@@ -71,64 +159,60 @@ class NodeManager:
         Returns:
             ClientConnection instance
         """
+        connection, needs_assignment = self.register_connection(websocket, nmp_params)
+        if needs_assignment:
+            return await self.finalize_connection(connection)
+        
+        self._log_connected(connection)
+        return connection
+    
+    def register_connection(self, websocket: Any, nmp_params: Dict[str, Any]) -> Tuple[ClientConnection, bool]:
+        """
+        Synchronous part of handle_new_connection: register the client and check its hierarchy
+        
+        Args:
+            websocket: WebSocket connection
+            nmp_params: NMP parameters from URL
+            
+        Returns:
+            (ClientConnection, needs_assignment). When needs_assignment is True the caller must
+            await finalize_connection(); otherwise the connection is complete and nothing is awaited.
+        """
         try:
-            self.logger.info("=" * 80)
-            self.logger.info("🔧 NODEMANAGER: handle_new_connection() CALLED")
-            self.logger.info(f"📋 NMP Parameters received: {nmp_params}")
-            self.logger.info("=" * 80)
+            debug = self.logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                self.logger.debug(_BANNER)
+                self.logger.debug("🔧 NODEMANAGER: register_connection() CALLED")
+                self.logger.debug("📋 NMP Parameters received: %s", nmp_params)
+                self.logger.debug(_BANNER)
             
             # Register the C-Client
-            self.logger.info("📝 Step 1: Calling register_c_client()...")
             connection = self.register_c_client(websocket, nmp_params)
-            self.logger.info(f"✅ Step 1 completed: Connection created for node {connection.node_id}")
-            
-            # Check if client needs node assignment
-            self.logger.info(f"🔍 Step 2: Checking if assignment needed...")
-            self.logger.info(f"   connection.domain_id = {connection.domain_id}")
-            self.logger.info(f"   connection.cluster_id = {connection.cluster_id}")
-            self.logger.info(f"   connection.channel_id = {connection.channel_id}")
             
             # Check if full hierarchy exists
-            needs_assignment = False
+            needs_assignment = not (connection.domain_id and connection.cluster_id and connection.channel_id)
+            if debug:
+                self.logger.debug("🔍 Hierarchy: domain_id=%s, cluster_id=%s, channel_id=%s -> %s",
+                                  connection.domain_id, connection.cluster_id, connection.channel_id,
+                                  'needs assignment' if needs_assignment else 'complete, skipping assignment')
             
-            if not connection.domain_id:
-                self.logger.info(f"⚠️ Client missing domain_id, needs full assignment")
-                needs_assignment = True
-            elif not connection.cluster_id:
-                self.logger.info(f"⚠️ Client has domain but missing cluster_id, needs cluster/channel assignment")
-                needs_assignment = True
-            elif not connection.channel_id:
-                self.logger.info(f"⚠️ Client has domain/cluster but missing channel_id, needs channel assignment")
-                needs_assignment = True
-            
-            if needs_assignment:
-                self.logger.info("📍 Step 3: Calling assign_new_client()...")
-                await self.assign_new_client(connection)
-                self.logger.info("✅ Step 3 completed: Client assigned to node structure")
-            else:
-                self.logger.info(f"✅ Client already has full hierarchy (domain/cluster/channel), skipping assignment")
-            
-            self.logger.info("=" * 80)
-            self.logger.info("🎉 NODEMANAGER: handle_new_connection() COMPLETED")
-            self.logger.info(f"   Node ID: {connection.node_id}")
-            self.logger.info(f"   Domain ID: {connection.domain_id}")
-            self.logger.info(f"   Cluster ID: {connection.cluster_id}")
-            self.logger.info(f"   Channel ID: {connection.channel_id}")
-            self.logger.info(f"   Is Domain Main: {connection.is_domain_main_node}")
-            self.logger.info(f"   Is Cluster Main: {connection.is_cluster_main_node}")
-            self.logger.info(f"   Is Channel Main: {connection.is_channel_main_node}")
-            self.logger.info("=" * 80)
-            
-            return connection
+            return connection, needs_assignment
             
         except Exception as e:
-            self.logger.error("=" * 80)
-            self.logger.error(f"❌ NODEMANAGER: ERROR in handle_new_connection()")
-            self.logger.error(f"   Error: {e}")
-            traceback.print_exc()
-            self.logger.error("=" * 80)
+            self.logger.exception("❌ NODEMANAGER: ERROR in register_connection(): %s", e)
             raise
     
+    async def finalize_connection(self, connection: ClientConnection) -> ClientConnection:
+        """Assign a registered client that is missing part of its domain/cluster/channel hierarchy"""
+        await self.assign_new_client(connection)
+        self._log_connected(connection)
+        return connection
+    
+    def _log_connected(self, connection: ClientConnection):
+        self.logger.info("🎉 NODEMANAGER: node %s connected (domain=%s, cluster=%s, channel=%s, main: domain=%s cluster=%s channel=%s)",
+                         connection.node_id, connection.domain_id, connection.cluster_id, connection.channel_id,
+                         connection.is_domain_main_node, connection.is_cluster_main_node, connection.is_channel_main_node)
+    
     async def assign_new_client(self, connection: ClientConnection) -> bool:
         """
         Assign a new C-Client to node structure
@@ -141,70 +225,54 @@ class NodeManager:
             True if assignment successful
         """
         try:
-            self.logger.info("─" * 80)
-            self.logger.info(f"🆕 NODEMANAGER: assign_new_client() STARTED")
-            self.logger.info(f"   Client node_id: {connection.node_id}")
-            self.logger.info(f"   Current state: domain_id={connection.domain_id}, cluster_id={connection.cluster_id}, channel_id={connection.channel_id}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(_RULE)
+                self.logger.debug("🆕 NODEMANAGER: assign_new_client() STARTED")
+                self.logger.debug("   Client node_id: %s", connection.node_id)
+                self.logger.debug("   Current state: domain_id=%s, cluster_id=%s, channel_id=%s",
+                                  connection.domain_id, connection.cluster_id, connection.channel_id)
             
             # Check what level needs to be created
             if not connection.domain_id:
                 # No domain - create full hierarchy
-                self.logger.info("📍 No domain_id - need to create full hierarchy")
-                self.logger.info(f"🔍 Checking domain_pool...")
-                self.logger.info(f"   domain_pool size: {len(self.domain_pool)}")
-                self.logger.info(f"   domain_pool keys: {list(self.domain_pool.keys())}")
+                self.logger.debug("📍 No domain_id - need to create full hierarchy (%d existing domain(s))", len(self.domain_pool))
                 
-                if len(self.domain_pool) == 0:
-                    self.logger.info("📍 No domains exist, creating first domain node")
-                    self.logger.info("🏗️ Calling new_domain_node() to create full hierarchy...")
-                    result = await self.new_domain_node(connection)
-                    self.logger.info(f"─" * 80)
-                    return result
+                if not self.domain_pool:
+                    self.logger.info("📍 No domains exist, creating first domain node for %s", connection.node_id)
+                    return await self.new_domain_node(connection)
                 
                 # Try to assign to existing domain
-                self.logger.info(f"📍 Found {len(self.domain_pool)} existing domain(s), trying to assign...")
-                for domain_id, domain_connections in self.domain_pool.items():
-                    if len(domain_connections) == 0:
+                for domain_id, domain_connections in list(self.domain_pool.items()):
+                    if not domain_connections:
                         continue
-                    domain_main_connection = domain_connections[0]
+                    domain_main_connection = next(iter(domain_connections.values()))
                     success = await self.assign_to_domain(connection, domain_id, domain_main_connection.node_id)
                     if success:
-                        self.logger.info(f"✅ Successfully assigned to domain {domain_id}")
-                        self.logger.info(f"─" * 80)
+                        self.logger.info("✅ Assigned node %s to domain %s", connection.node_id, domain_id)
                         return True
                 
                 # All domains full, create new
-                self.logger.info("📍 All domains full, creating new domain")
-                result = await self.new_domain_node(connection)
-                self.logger.info(f"─" * 80)
-                return result
+                self.logger.info("📍 All domains full, creating new domain for %s", connection.node_id)
+                return await self.new_domain_node(connection)
                 
             elif not connection.cluster_id:
                 # Has domain but no cluster - create cluster and channel
-                self.logger.info(f"📍 Has domain_id but no cluster_id - need to create cluster/channel")
-                self.logger.info(f"🏗️ Calling new_cluster_node() for domain {connection.domain_id}...")
-                result = await self.new_cluster_node(connection, connection.domain_id)
-                self.logger.info(f"─" * 80)
-                return result
+                self.logger.info("📍 Node %s has no cluster_id, creating cluster/channel in domain %s",
+                                 connection.node_id, connection.domain_id)
+                return await self.new_cluster_node(connection, connection.domain_id)
                 
             elif not connection.channel_id:
                 # Has domain/cluster but no channel - create channel only
-                self.logger.info(f"📍 Has domain/cluster but no channel_id - need to create channel")
-                self.logger.info(f"🏗️ Calling new_channel_node() for cluster {connection.cluster_id}...")
-                result = await self.new_channel_node(connection, connection.domain_id, connection.cluster_id)
-                self.logger.info(f"─" * 80)
-                return result
+                self.logger.info("📍 Node %s has no channel_id, creating channel in cluster %s",
+                                 connection.node_id, connection.cluster_id)
+                return await self.new_channel_node(connection, connection.domain_id, connection.cluster_id)
             
             # Should not reach here
             self.logger.warning("⚠️ Client has full hierarchy but assign_new_client was called")
-            self.logger.info(f"─" * 80)
             return True
             
         except Exception as e:
-            self.logger.error(f"❌ NODEMANAGER: ERROR in assign_new_client()")
-            self.logger.error(f"   Error: {e}")
-            traceback.print_exc()
-            self.logger.error(f"─" * 80)
+            self.logger.exception("❌ NODEMANAGER: ERROR in assign_new_client(): %s", e)
             return False
     
     def register_c_client(self, websocket: Any, nmp_params: Dict[str, Any]) -> ClientConnection:
@@ -229,33 +297,40 @@ class NodeManager:
             ClientConnection instance
         """
         try:
-            self.logger.info("─" * 80)
-            self.logger.info("📝 NODEMANAGER: register_c_client() STARTED")
-            
-            # Extract parameters
-            node_id = nmp_params.get('nmp_node_id')
-            user_id = nmp_params.get('nmp_user_id')
-            username = nmp_params.get('nmp_username')
-            domain_main_node_id = nmp_params.get('nmp_domain_main_node_id')
-            cluster_main_node_id = nmp_params.get('nmp_cluster_main_node_id')
-            channel_main_node_id = nmp_params.get('nmp_channel_main_node_id')
-            domain_id = nmp_params.get('nmp_domain_id')
-            cluster_id = nmp_params.get('nmp_cluster_id')
-            channel_id = nmp_params.get('nmp_channel_id')
-            
-            self.logger.info(f"📋 Registering C-Client: node_id={node_id}")
-            self.logger.info(f"📋 NMP Parameters:")
-            self.logger.info(f"   node_id: {node_id}")
-            self.logger.info(f"   user_id: {user_id}")
-            self.logger.info(f"   username: {username}")
-            self.logger.info(f"   domain_main_node_id: {domain_main_node_id}")
-            self.logger.info(f"   cluster_main_node_id: {cluster_main_node_id}")
-            self.logger.info(f"   channel_main_node_id: {channel_main_node_id}")
-            self.logger.info(f"   domain_id: {domain_id}")
-            self.logger.info(f"   cluster_id: {cluster_id}")
-            self.logger.info(f"   channel_id: {channel_id}")
-            
-            # Create connection object
+            # Extract parameters (missing ones are None)
+            get = nmp_params.get
+            (node_id, user_id, username,
+             domain_main_node_id, cluster_main_node_id, channel_main_node_id,
+             domain_id, cluster_id, channel_id) = [_intern(get(field)) for field in _NMP_FIELDS]
+            
+            # Fast path: a pooled node reconnecting with the same hierarchy only needs its
+            # websocket and user/main-node info refreshed, the pools themselves are unchanged
+            existing = self.node_index.get(node_id)
+            if (existing is not None and existing.domain_id == domain_id
+                    and existing.cluster_id == cluster_id and existing.channel_id == channel_id):
+                existing.set_websocket(websocket)
+                existing.user_id = user_id
+                existing.username = username
+                existing.domain_main_node_id = domain_main_node_id
+                existing.cluster_main_node_id = cluster_main_node_id
+                existing.channel_main_node_id = channel_main_node_id
+                existing.is_domain_main_node = bool(domain_main_node_id) and node_id == domain_main_node_id
+                existing.is_cluster_main_node = bool(cluster_main_node_id) and node_id == cluster_main_node_id
+                existing.is_channel_main_node = bool(channel_main_node_id) and node_id == channel_main_node_id
+                self.bump_revision()
+                self.logger.info("✅ NODEMANAGER: re-registered C-Client %s (hierarchy unchanged)", node_id)
+                return existing
+            
+            debug = self.logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                self.logger.debug(_RULE)
+                self.logger.debug("📝 NODEMANAGER: register_c_client() STARTED")
+                self.logger.debug("📋 NMP Parameters: node_id=%s, user_id=%s, username=%s", node_id, user_id, username)
+                self.logger.debug("   main node IDs: domain=%s, cluster=%s, channel=%s",
+                                  domain_main_node_id, cluster_main_node_id, channel_main_node_id)
+                self.logger.debug("   hierarchy IDs: domain=%s, cluster=%s, channel=%s", domain_id, cluster_id, channel_id)
+            
+            # Create connection object; node type comes from comparing node_id with the main node IDs
             connection = ClientConnection(
                 websocket=websocket,
                 node_id=node_id,
@@ -266,414 +341,338 @@ class NodeManager:
                 channel_id=channel_id,
                 domain_main_node_id=domain_main_node_id,
                 cluster_main_node_id=cluster_main_node_id,
-                channel_main_node_id=channel_main_node_id
+                channel_main_node_id=channel_main_node_id,
+                is_domain_main_node=bool(domain_main_node_id) and node_id == domain_main_node_id,
+                is_cluster_main_node=bool(cluster_main_node_id) and node_id == cluster_main_node_id,
+                is_channel_main_node=bool(channel_main_node_id) and node_id == channel_main_node_id
             )
             
-            self.logger.info("🔍 Determining node type by ID comparison...")
-            
-            # Determine node type by comparing node_id with main node IDs
-            self.logger.info(f"🔍 Checking if Domain main node:")
-            self.logger.info(f"   node_id ({node_id}) == domain_main_node_id ({domain_main_node_id})?")
-            if domain_main_node_id and node_id == domain_main_node_id:
-                connection.is_domain_main_node = True
-                self.logger.info(f"  ✅ YES - Node {node_id} is a DOMAIN main node")
-            else:
-                self.logger.info(f"  ❌ NO - Not a domain main node")
-            
-            self.logger.info(f"🔍 Checking if Cluster main node:")
-            self.logger.info(f"   node_id ({node_id}) == cluster_main_node_id ({cluster_main_node_id})?")
-            if cluster_main_node_id and node_id == cluster_main_node_id:
-                connection.is_cluster_main_node = True
-                self.logger.info(f"  ✅ YES - Node {node_id} is a CLUSTER main node")
-            else:
-                self.logger.info(f"  ❌ NO - Not a cluster main node")
-            
-            self.logger.info(f"🔍 Checking if Channel main node:")
-            self.logger.info(f"   node_id ({node_id}) == channel_main_node_id ({channel_main_node_id})?")
-            if channel_main_node_id and node_id == channel_main_node_id:
-                connection.is_channel_main_node = True
-                self.logger.info(f"  ✅ YES - Node {node_id} is a CHANNEL main node")
-            else:
-                self.logger.info(f"  ❌ NO - Not a channel main node")
-            
-            self.logger.info("📦 Adding to connection pools...")
-            self.logger.info(f"  📋 Node type: Domain={'MAIN' if connection.is_domain_main_node else 'REGULAR'}, Cluster={'MAIN' if connection.is_cluster_main_node else 'REGULAR'}, Channel={'MAIN' if connection.is_channel_main_node else 'REGULAR'}")
+            if debug:
+                self.logger.debug("📋 Node type: Domain=%s, Cluster=%s, Channel=%s",
+                                  'MAIN' if connection.is_domain_main_node else 'REGULAR',
+                                  'MAIN' if connection.is_cluster_main_node else 'REGULAR',
+                                  'MAIN' if connection.is_channel_main_node else 'REGULAR')
             
             # Add to domain pool if domain_id exists (main node or regular node)
             if domain_id:
                 self.add_to_domain_pool(domain_id, connection)
-                node_type = "MAIN" if connection.is_domain_main_node else "regular"
-                self.logger.info(f"  ✅ Added {node_type} node to domain_pool[{domain_id}]")
             
             # Add to cluster pool if cluster_id exists (main node or regular node)
             if cluster_id:
                 self.add_to_cluster_pool(cluster_id, connection)
-                node_type = "MAIN" if connection.is_cluster_main_node else "regular"
-                self.logger.info(f"  ✅ Added {node_type} node to cluster_pool[{cluster_id}]")
             
             # Add to channel pool if channel_id exists (main node or regular node)
             if channel_id:
                 self.add_to_channel_pool(channel_id, connection)
-                node_type = "MAIN" if connection.is_channel_main_node else "regular"
-                self.logger.info(f"  ✅ Added {node_type} node to channel_pool[{channel_id}]")
             
             # If not a main node at any level, add to channel pool as regular node
             if not (connection.is_domain_main_node or connection.is_cluster_main_node or connection.is_channel_main_node):
-                self.logger.info(f"  ℹ️ Not a main node at any level")
                 if channel_id:
                     self.add_to_channel_pool(channel_id, connection)
-                    self.logger.info(f"  ✅ Added to channel_pool[{channel_id}] as regular node")
                 else:
-                    self.logger.warning(f"  ⚠️ Regular node without channel_id, NOT added to any pool")
-            
-            # Display pool stats
-            stats = self.get_pool_stats()
-            self.logger.info(f"📊 Current pool stats after registration:")
-            self.logger.info(f"   Total domains: {stats['domains']}")
-            self.logger.info(f"   Total clusters: {stats['clusters']}")
-            self.logger.info(f"   Total channels: {stats['channels']}")
-            self.logger.info(f"   Total connections: {stats['total_connections']}")
-            
-            self.logger.info(f"✅ NODEMANAGER: register_c_client() COMPLETED for {node_id}")
-            self.logger.info("─" * 80)
+                    self.logger.warning("  ⚠️ Regular node %s without channel_id, NOT added to any pool", node_id)
+            
+            # Display pool stats (walks every pool, so only when debugging)
+            if debug:
+                stats = self.get_pool_stats()
+                self.logger.debug("📊 Pool stats after registration: domains=%s, clusters=%s, channels=%s, connections=%s",
+                                  stats['domains'], stats['clusters'], stats['channels'], stats['total_connections'])
+            
+            self.logger.info("✅ NODEMANAGER: registered C-Client %s", node_id)
             return connection
             
         except Exception as e:
-            self.logger.error(f"Error registering C-Client: {e}")
+            self.logger.error("Error registering C-Client: %s", e)
             raise
     
     # ===================== Connection Pool Management =====================
     
+    def bump_revision(self):
+        """Mark the pool topology as changed (invalidates cached node management views)"""
+        self.revision += 1
+    
     def add_to_domain_pool(self, domain_id: str, connection: ClientConnection):
         """Add connection to domain pool"""
-        if domain_id not in self.domain_pool:
-            self.domain_pool[domain_id] = []
-            self.domain_node_index[domain_id] = {}
-        
-        # Check if this connection already exists using fast index lookup
-        if connection.node_id in self.domain_node_index[domain_id]:
-            # Connection already exists, update it instead of adding duplicate
-            existing_connection = self.domain_node_index[domain_id][connection.node_id]
-            self.logger.info(f"Connection for node {connection.node_id} already exists in domain pool {domain_id}, updating...")
-            # Update the existing connection with new websocket and user info
-            existing_connection.websocket = connection.websocket
-            existing_connection.user_id = connection.user_id
-            existing_connection.username = connection.username
-            existing_connection.is_domain_main_node = connection.is_domain_main_node
-            existing_connection.is_cluster_main_node = connection.is_cluster_main_node
-            existing_connection.is_channel_main_node = connection.is_channel_main_node
-            self.logger.info(f"Updated existing connection for node {connection.node_id} in domain pool {domain_id}")
-        else:
-            # New connection, add it to the pool and index
-            self.domain_pool[domain_id].append(connection)
-            self.domain_node_index[domain_id][connection.node_id] = connection
-            connection.domain_id = domain_id
-            self.logger.info(f"Added new connection to domain pool {domain_id}")
+        self._add_to_pool('domain', domain_id, connection)
     
     def add_to_cluster_pool(self, cluster_id: str, connection: ClientConnection):
         """Add connection to cluster pool"""
-        if cluster_id not in self.cluster_pool:
-            self.cluster_pool[cluster_id] = []
-            self.cluster_node_index[cluster_id] = {}
-        
-        # Check if this connection already exists using fast index lookup
-        if connection.node_id in self.cluster_node_index[cluster_id]:
-            # Connection already exists, update it instead of adding duplicate
-            existing_connection = self.cluster_node_index[cluster_id][connection.node_id]
-            self.logger.info(f"Connection for node {connection.node_id} already exists in cluster pool {cluster_id}, updating...")
-            # Update the existing connection with new websocket and user info
-            existing_connection.websocket = connection.websocket
-            existing_connection.user_id = connection.user_id
-            existing_connection.username = connection.username
-            existing_connection.is_domain_main_node = connection.is_domain_main_node
-            existing_connection.is_cluster_main_node = connection.is_cluster_main_node
-            existing_connection.is_channel_main_node = connection.is_channel_main_node
-            self.logger.info(f"Updated existing connection for node {connection.node_id} in cluster pool {cluster_id}")
-        else:
-            # New connection, add it to the pool and index
-            self.cluster_pool[cluster_id].append(connection)
-            self.cluster_node_index[cluster_id][connection.node_id] = connection
-            connection.cluster_id = cluster_id
-            self.logger.info(f"Added new connection to cluster pool {cluster_id}")
+        self._add_to_pool('cluster', cluster_id, connection)
     
     def add_to_channel_pool(self, channel_id: str, connection: ClientConnection):
         """Add connection to channel pool"""
-        if channel_id not in self.channel_pool:
-            self.channel_pool[channel_id] = []
-            self.channel_node_index[channel_id] = {}
+        self._add_to_pool('channel', channel_id, connection)
+    
+    def _add_to_pool(self, level: str, pool_id: str, connection: ClientConnection):
+        """Add connection to the domain/cluster/channel pool, updating it in place if already present"""
+        pools, id_attr = self._pools[level]
+        pool_id = _intern(pool_id)
+        pool = pools.get(pool_id)
+        if pool is None:
+            pool = pools[pool_id] = {}
+            self._link_child_pool(level, pool_id, connection)
         
-        # Check if this connection already exists using fast index lookup
-        if connection.node_id in self.channel_node_index[channel_id]:
+        # Check if this connection already exists (O(1) lookup by node_id)
+        existing_connection = pool.get(connection.node_id)
+        if existing_connection is not None:
             # Connection already exists, update it instead of adding duplicate
-            existing_connection = self.channel_node_index[channel_id][connection.node_id]
-            self.logger.info(f"Connection for node {connection.node_id} already exists in channel pool {channel_id}, updating...")
-            # Update the existing connection with new websocket and user info
-            existing_connection.websocket = connection.websocket
-            existing_connection.user_id = connection.user_id
-            existing_connection.username = connection.username
-            existing_connection.is_domain_main_node = connection.is_domain_main_node
-            existing_connection.is_cluster_main_node = connection.is_cluster_main_node
-            existing_connection.is_channel_main_node = connection.is_channel_main_node
-            self.logger.info(f"Updated existing connection for node {connection.node_id} in channel pool {channel_id}")
+            self._update_existing(existing_connection, connection)
+            self.node_index[connection.node_id] = existing_connection
+            self.logger.info(f"Updated existing connection for node {connection.node_id} in {level} pool {pool_id}")
         else:
-            # New connection, add it to the pool and index
-            self.channel_pool[channel_id].append(connection)
-            self.channel_node_index[channel_id][connection.node_id] = connection
-            connection.channel_id = channel_id
-            self.logger.info(f"Added new connection to channel pool {channel_id}")
+            # New connection, add it to the pool
+            pool[connection.node_id] = connection
+            setattr(connection, id_attr, pool_id)
+            self.node_index[connection.node_id] = connection
+            self.logger.info(f"Added new connection to {level} pool {pool_id}")
+        
+        self.bump_revision()
+    
+    def _link_child_pool(self, level: str, pool_id: str, connection: ClientConnection):
+        """Record a new channel/cluster pool under the parent cluster/domain of the connection that created it"""
+        link = self._child_links.get(level)
+        if link is None:
+            return
+        parent_attr, children, parents = link
+        parent_id = getattr(connection, parent_attr)
+        if parent_id:
+            parents[pool_id] = parent_id
+            children.setdefault(parent_id, set()).add(pool_id)
+    
+    def _unlink_child_pool(self, level: str, pool_id: str):
+        """Drop a deleted channel/cluster pool from its parent's child set"""
+        link = self._child_links.get(level)
+        if link is None:
+            return
+        _, children, parents = link
+        parent_id = parents.pop(pool_id, None)
+        siblings = children.get(parent_id)
+        if siblings is not None:
+            siblings.discard(pool_id)
+            if not siblings:
+                del children[parent_id]
+    
+    @staticmethod
+    def _update_existing(existing_connection: ClientConnection, connection: ClientConnection):
+        """Refresh a pooled connection with the new websocket, user info and main-node flags"""
+        existing_connection.set_websocket(connection.websocket)
+        existing_connection.user_id = connection.user_id
+        existing_connection.username = connection.username
+        existing_connection.is_domain_main_node = connection.is_domain_main_node
+        existing_connection.is_cluster_main_node = connection.is_cluster_main_node
+        existing_connection.is_channel_main_node = connection.is_channel_main_node
+    
+    def remove_by_node_id(self, node_id: str) -> bool:
+        """Remove a node from all pools by node_id; returns False if the node is not pooled"""
+        connection = self.node_index.get(node_id)
+        if connection is None:
+            self.logger.warning("⚠️ NodeManager: Node %s not found in node index", node_id)
+            return False
+        
+        self.remove_connection(connection)
+        return True
     
     def remove_connection(self, connection: ClientConnection):
         """Remove connection from all pools with proper hierarchy cleanup"""
-        
-        self.logger.info(f"🔧 NodeManager: Starting connection removal process")
-        self.logger.info(f"🔧 NodeManager: Connection details - node_id: {connection.node_id}, user_id: {connection.user_id}")
-        self.logger.info(f"🔧 NodeManager: Connection hierarchy - domain: {connection.domain_id}, cluster: {connection.cluster_id}, channel: {connection.channel_id}")
-        self.logger.info(f"🔧 NodeManager: Connection types - domain_main: {connection.is_domain_main_node}, cluster_main: {connection.is_cluster_main_node}, channel_main: {connection.is_channel_main_node}")
-        
-        # 1. Remove connection from all pools (using WebSocket object reference)
+        self.remove_connections([connection])
+    
+    def remove_connections(self, connections: List[ClientConnection]):
+        """
+        Remove a batch of connections from all pools
+        Each touched pool is checked for deletion once, after every node in the batch is unlinked
+        """
         removed_from = []
+        # level -> pool IDs that lost a node in this batch
+        touched: Dict[str, set] = {'channel': set(), 'cluster': set(), 'domain': set()}
         
-        # Remove from channel pool using O(1) index lookup
-        if connection.channel_id and connection.channel_id in self.channel_pool:
-            original_count = len(self.channel_pool[connection.channel_id])
-            self.logger.info(f"🔧 NodeManager: Channel pool {connection.channel_id} has {original_count} connections before removal")
-            
-            # Use fast index lookup for O(1) removal
-            if connection.node_id in self.channel_node_index[connection.channel_id]:
-                # Remove from index first
-                del self.channel_node_index[connection.channel_id][connection.node_id]
-                
-                # Remove from pool using list comprehension (still O(n) but only one pass)
-                self.channel_pool[connection.channel_id] = [
-                    conn for conn in self.channel_pool[connection.channel_id] 
-                    if conn.node_id != connection.node_id
-                ]
+        # 1. Remove connections from all pools by node_id
+        for connection in connections:
+            # Prefer the pooled connection: its hierarchy IDs are the ones the pools are keyed by
+            pooled_connection = self.node_index.pop(connection.node_id, None)
+            if pooled_connection is not None:
+                connection = pooled_connection
+            
+            self.logger.debug("🔧 NodeManager: Removing node %s (user %s) - domain: %s, cluster: %s, channel: %s",
+                              connection.node_id, connection.user_id, connection.domain_id, connection.cluster_id, connection.channel_id)
+            
+            for level, level_touched in touched.items():
+                pools, id_attr = self._pools[level]
+                pool_id = getattr(connection, id_attr)
+                if not pool_id:
+                    continue
+                pool = pools.get(pool_id)
+                if pool is None:
+                    continue
                 
-                removed_from.append(f"channel({connection.channel_id})")
-                self.logger.info(f"✅ NodeManager: Successfully removed connection from channel pool {connection.channel_id} using O(1) index lookup for node_id: {connection.node_id}")
+                # O(1) removal by node_id
+                if pool.pop(connection.node_id, None) is None:
+                    self.logger.warning("⚠️ NodeManager: Node %s not found in %s pool %s", connection.node_id, level, pool_id)
+                    continue
                 
-                # Check if channel pool can be deleted
-                if self._should_remove_channel_pool(connection.channel_id):
-                    del self.channel_pool[connection.channel_id]
-                    del self.channel_node_index[connection.channel_id]
-                    removed_from.append(f"channel_pool({connection.channel_id})")
-                    self.logger.info(f"🗑️ NodeManager: Removed empty channel pool and index: {connection.channel_id}")
-                else:
-                    self.logger.info(f"📊 NodeManager: Channel pool {connection.channel_id} still has connections, keeping pool")
-            else:
-                self.logger.warning(f"⚠️ NodeManager: Node {connection.node_id} not found in channel index {connection.channel_id}")
+                removed_from.append(f"{level}({pool_id})")
+                level_touched.add(pool_id)
         
-        # Remove from cluster pool using O(1) index lookup
-        if connection.cluster_id and connection.cluster_id in self.cluster_pool:
-            original_count = len(self.cluster_pool[connection.cluster_id])
-            self.logger.info(f"🔧 NodeManager: Cluster pool {connection.cluster_id} has {original_count} connections before removal")
-            
-            # Use fast index lookup for O(1) removal
-            if connection.node_id in self.cluster_node_index[connection.cluster_id]:
-                # Remove from index first
-                del self.cluster_node_index[connection.cluster_id][connection.node_id]
-                
-                # Remove from pool using list comprehension (still O(n) but only one pass)
-                self.cluster_pool[connection.cluster_id] = [
-                    conn for conn in self.cluster_pool[connection.cluster_id] 
-                    if conn.node_id != connection.node_id
-                ]
-                
-                removed_from.append(f"cluster({connection.cluster_id})")
-                self.logger.info(f"✅ NodeManager: Successfully removed connection from cluster pool {connection.cluster_id} using O(1) index lookup for node_id: {connection.node_id}")
-                
-                # Check if cluster pool can be deleted
-                if self._should_remove_cluster_pool(connection.cluster_id):
-                    del self.cluster_pool[connection.cluster_id]
-                    del self.cluster_node_index[connection.cluster_id]
-                    removed_from.append(f"cluster_pool({connection.cluster_id})")
-                    self.logger.info(f"🗑️ NodeManager: Removed empty cluster pool and index: {connection.cluster_id}")
-                else:
-                    self.logger.info(f"📊 NodeManager: Cluster pool {connection.cluster_id} still has connections, keeping pool")
-            else:
-                self.logger.warning(f"⚠️ NodeManager: Node {connection.node_id} not found in cluster index {connection.cluster_id}")
+        orphans: List[ClientConnection] = []
         
-        # Remove from domain pool using O(1) index lookup
-        if connection.domain_id and connection.domain_id in self.domain_pool:
-            original_count = len(self.domain_pool[connection.domain_id])
-            self.logger.info(f"🔧 NodeManager: Domain pool {connection.domain_id} has {original_count} connections before removal")
-            
-            # Use fast index lookup for O(1) removal
-            if connection.node_id in self.domain_node_index[connection.domain_id]:
-                # Remove from index first
-                del self.domain_node_index[connection.domain_id][connection.node_id]
-                
-                # Remove from pool using list comprehension (still O(n) but only one pass)
-                self.domain_pool[connection.domain_id] = [
-                    conn for conn in self.domain_pool[connection.domain_id] 
-                    if conn.node_id != connection.node_id
-                ]
-                
-                removed_from.append(f"domain({connection.domain_id})")
-                self.logger.info(f"✅ NodeManager: Successfully removed connection from domain pool {connection.domain_id} using O(1) index lookup for node_id: {connection.node_id}")
-                
-                # Check if domain pool can be deleted
-                if self._should_remove_domain_pool(connection.domain_id):
-                    del self.domain_pool[connection.domain_id]
-                    del self.domain_node_index[connection.domain_id]
-                    removed_from.append(f"domain_pool({connection.domain_id})")
-                    self.logger.info(f"🗑️ NodeManager: Removed empty domain pool and index: {connection.domain_id}")
-                else:
-                    self.logger.info(f"📊 NodeManager: Domain pool {connection.domain_id} still has connections, keeping pool")
-            else:
-                self.logger.warning(f"⚠️ NodeManager: Node {connection.node_id} not found in domain index {connection.domain_id}")
+        # 2. Check each touched pool once. Bottom-up: the cluster/domain emptiness checks
+        # look at which channel/cluster pools remain
+        for level, should_remove_pool in (('channel', self._should_remove_channel_pool),
+                                          ('cluster', self._should_remove_cluster_pool),
+                                          ('domain', self._should_remove_domain_pool)):
+            pools = self._pools[level][0]
+            for pool_id in touched[level]:
+                pool = pools.get(pool_id)
+                if pool is None:
+                    continue
+                # An empty pool needs no further checks
+                if not pool or should_remove_pool(pool_id):
+                    del pools[pool_id]
+                    self._unlink_child_pool(level, pool_id)
+                    # Members left in a deleted pool (e.g. a closed main node) may now be in no pool at all
+                    orphans.extend(pool.values())
+                    removed_from.append(f"{level}_pool({pool_id})")
+                    self.logger.debug("🗑️ NodeManager: Removed empty %s pool: %s", level, pool_id)
+        
+        # 3. Drop node_index entries for connections no longer in any pool
+        for orphan in orphans:
+            if self.node_index.get(orphan.node_id) is orphan and not self._is_pooled(orphan):
+                del self.node_index[orphan.node_id]
         
         # Log final pool status
-        total_domains = len(self.domain_pool)
-        total_clusters = len(self.cluster_pool)
-        total_channels = len(self.channel_pool)
-        self.logger.info(f"📊 NodeManager: Final pool status after removal - Domains: {total_domains}, Clusters: {total_clusters}, Channels: {total_channels}")
+        self.logger.debug("📊 NodeManager: Final pool status after removal - Domains: %s, Clusters: %s, Channels: %s",
+                          len(self.domain_pool), len(self.cluster_pool), len(self.channel_pool))
         
         if removed_from:
-            self.logger.info(f"✅ NodeManager: Successfully removed connection from: {', '.join(removed_from)}")
+            self.bump_revision()
+            self.logger.info("✅ NodeManager: Successfully removed %d connection(s) from: %s", len(connections), ', '.join(removed_from))
         else:
-            self.logger.warning(f"⚠️ NodeManager: Connection was not found in any hierarchy pools")
+            self.logger.warning("⚠️ NodeManager: Connection was not found in any hierarchy pools")
+    
+    def _is_pooled(self, connection: ClientConnection) -> bool:
+        """Check whether connection's node is still in any domain/cluster/channel pool"""
+        for pools, id_attr in self._pools.values():
+            pool = pools.get(getattr(connection, id_attr))
+            if pool is not None and connection.node_id in pool:
+                return True
+        return False
+    
+    def schedule_removal(self, connection: ClientConnection):
+        """
+        Queue a disconnected connection for removal on the next event loop tick
+        Disconnects arriving in the same tick (e.g. a main node going down) are removed as one batch.
+        Must be called from the event loop thread.
+        """
+        if not self._pending_removals:
+            asyncio.get_running_loop().call_soon(self._drain_removals)
+        # Remember the websocket so a reconnect before the drain is not removed
+        self._pending_removals[connection.node_id] = connection.websocket
+    
+    def _drain_removals(self):
+        """Remove every connection queued by schedule_removal in one batch"""
+        pending, self._pending_removals = self._pending_removals, {}
+        connections = []
+        for node_id, websocket in pending.items():
+            connection = self.node_index.get(node_id)
+            # Skip nodes that already left or reconnected with a new websocket
+            if connection is not None and connection.websocket is websocket:
+                connections.append(connection)
+        
+        if connections:
+            self.remove_connections(connections)
 
     def _should_remove_channel_pool(self, channel_id: str) -> bool:
         """Check if channel pool should be removed"""
-        self.logger.info(f"🔍 NodeManager: Checking if channel pool {channel_id} should be removed")
-        
-        # Channel pool can be deleted if:
-        # 1. Pool has no connections
-        # 2. Or pool only has main node connection, but main node is also disconnected
-        if channel_id not in self.channel_pool:
-            self.logger.info(f"✅ NodeManager: Channel pool {channel_id} not found, should be removed")
-            return True
-            
-        remaining_connections = self.channel_pool[channel_id]
-        self.logger.info(f"🔍 NodeManager: Channel pool {channel_id} has {len(remaining_connections)} remaining connections")
-        
-        if not remaining_connections:
-            self.logger.info(f"✅ NodeManager: Channel pool {channel_id} is empty, should be removed")
-            return True
-            
-        # If only main node remains and main node is disconnected, can be deleted
-        if len(remaining_connections) == 1:
-            main_connection = remaining_connections[0]
-            self.logger.info(f"🔍 NodeManager: Channel pool {channel_id} has 1 connection, checking if it's a closed main node")
-            self.logger.info(f"🔍 NodeManager: Connection is_channel_main_node: {main_connection.is_channel_main_node}")
-            
-            # Check if the main node connection is still valid
-            is_connection_valid = self._is_websocket_valid(main_connection.websocket)
-            self.logger.info(f"🔍 NodeManager: Connection is_valid: {is_connection_valid}")
-            
-            if (main_connection.is_channel_main_node and not is_connection_valid):
-                self.logger.info(f"✅ NodeManager: Channel pool {channel_id} has only invalid main node, should be removed")
-                return True
-            else:
-                self.logger.info(f"📊 NodeManager: Channel pool {channel_id} has active connection, keeping pool")
-        else:
-            self.logger.info(f"📊 NodeManager: Channel pool {channel_id} has multiple connections, keeping pool")
-                
-        return False
+        return self._should_remove_pool('channel', channel_id)
 
     def _should_remove_cluster_pool(self, cluster_id: str) -> bool:
         """Check if cluster pool should be removed"""
-        self.logger.info(f"🔍 NodeManager: Checking if cluster pool {cluster_id} should be removed")
-        
-        # Cluster pool can be deleted if:
-        # 1. Pool has no connections
-        # 2. Or pool only has main node connection, but main node is also disconnected
-        # 3. Or all channels under this cluster have been deleted
-        if cluster_id not in self.cluster_pool:
-            self.logger.info(f"✅ NodeManager: Cluster pool {cluster_id} not found, should be removed")
-            return True
-            
-        remaining_connections = self.cluster_pool[cluster_id]
-        self.logger.info(f"🔍 NodeManager: Cluster pool {cluster_id} has {len(remaining_connections)} remaining connections")
-        
-        if not remaining_connections:
-            self.logger.info(f"✅ NodeManager: Cluster pool {cluster_id} is empty, should be removed")
-            return True
-            
-        # Check if there are still related channels
-        active_channels = []
-        for conn in remaining_connections:
-            if conn.channel_id and conn.channel_id in self.channel_pool:
-                active_channels.append(conn.channel_id)
-        
-        self.logger.info(f"🔍 NodeManager: Cluster pool {cluster_id} has active channels: {active_channels}")
-        
-        if not active_channels:
-            self.logger.info(f"✅ NodeManager: Cluster pool {cluster_id} has no active channels, should be removed")
-            return True
-        else:
-            self.logger.info(f"📊 NodeManager: Cluster pool {cluster_id} has active channels, keeping pool")
-            
-        return False
+        return self._should_remove_pool('cluster', cluster_id)
 
     def _should_remove_domain_pool(self, domain_id: str) -> bool:
         """Check if domain pool should be removed"""
-        self.logger.info(f"🔍 NodeManager: Checking if domain pool {domain_id} should be removed")
-        
-        # Domain pool can be deleted if:
-        # 1. Pool has no connections
-        # 2. Or pool only has main node connection, but main node is also disconnected
-        # 3. Or all clusters under this domain have been deleted
-        if domain_id not in self.domain_pool:
-            self.logger.info(f"✅ NodeManager: Domain pool {domain_id} not found, should be removed")
-            return True
-            
-        remaining_connections = self.domain_pool[domain_id]
-        self.logger.info(f"🔍 NodeManager: Domain pool {domain_id} has {len(remaining_connections)} remaining connections")
+        return self._should_remove_pool('domain', domain_id)
+    
+    def _should_remove_pool(self, level: str, pool_id: str) -> bool:
+        """
+        Check if a domain/cluster/channel pool should be removed
         
+        A pool can be deleted if:
+        1. Pool has no connections
+        2. Channel: only a main node connection remains, and that main node is disconnected
+        3. Cluster/domain: all channels/clusters under it have been deleted
+        """
+        remove, reason = self._pool_removal_verdict(level, pool_id)
+        # One record per check instead of a breadcrumb per step
+        self.logger.debug("🔍 NodeManager: %s pool %s check: %s -> %s", level, pool_id, reason,
+                          'remove' if remove else 'keep')
+        return remove
+    
+    def _pool_removal_verdict(self, level: str, pool_id: str) -> Tuple[bool, str]:
+        """Return (should_remove, reason) for _should_remove_pool"""
+        remaining_connections = self._pools[level][0].get(pool_id)
+        if remaining_connections is None:
+            return True, "not found"
         if not remaining_connections:
-            self.logger.info(f"✅ NodeManager: Domain pool {domain_id} is empty, should be removed")
-            return True
-            
-        # Check if there are still related clusters
-        active_clusters = []
-        for conn in remaining_connections:
-            if conn.cluster_id and conn.cluster_id in self.cluster_pool:
-                active_clusters.append(conn.cluster_id)
+            return True, "empty"
         
-        self.logger.info(f"🔍 NodeManager: Domain pool {domain_id} has active clusters: {active_clusters}")
+        if level == 'channel':
+            # If only main node remains and main node is disconnected, can be deleted
+            if len(remaining_connections) != 1:
+                return False, "multiple connections"
+            main_connection = next(iter(remaining_connections.values()))
+            if main_connection.is_channel_main_node and not self._is_connection_valid(main_connection):
+                return True, "only an invalid main node left"
+            return False, "1 active connection"
         
-        if not active_clusters:
-            self.logger.info(f"✅ NodeManager: Domain pool {domain_id} has no active clusters, should be removed")
-            return True
-        else:
-            self.logger.info(f"📊 NodeManager: Domain pool {domain_id} has active clusters, keeping pool")
-            
-        return False
+        # Check if there are still related channels/clusters (reverse index, no connection scan)
+        children = self.cluster_channels if level == 'cluster' else self.domain_clusters
+        if not children.get(pool_id):
+            return True, "no active children"
+        return False, "has active children"
     
     # ===================== WebSocket Communication =====================
     
     async def send_to_c_client(self, connection: ClientConnection, command: Dict[str, Any]) -> Dict[str, Any]:
         """Send command to C-Client and wait for response"""
         try:
-            request_id = str(uuid.uuid4())
+            request_id = str(next(self._request_seq))
             command['request_id'] = request_id
             
-            # Create future for response
-            future = asyncio.Future()
+            # Create future for response (bound to the running loop directly)
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
             self.pending_requests[request_id] = future
             
             # Send command
-            await connection.websocket.send(json.dumps(command))
-            self.logger.info(f"Sent command {command['type']} to C-Client with request_id: {request_id}")
-            
-            # Wait for response with timeout
             try:
-                self.logger.info(f"⏳ Waiting for response (timeout: 30s)...")
-                response = await asyncio.wait_for(future, timeout=30.0)
-                self.logger.info(f"✅ Received response for {command['type']}")
-                self.logger.info(f"📋 Response data: {response}")
-                # Clean up on success
-                if request_id in self.pending_requests:
-                    del self.pending_requests[request_id]
-                return response
-            except asyncio.TimeoutError:
-                self.logger.error(f"❌ Timeout waiting for response to {command['type']} (request_id: {request_id})")
-                self.logger.error(f"   No response received after 30 seconds")
-                self.logger.error(f"   Keeping request_id in pending_requests for late response handling")
-                # Don't delete yet - allow late response to be processed
+                await connection.ws_send(json_provider.dumps(command))
+            except BaseException:
+                # Nothing will ever answer this request_id
+                self.pending_requests.pop(request_id, None)
+                raise
+            self.logger.info("Sent command %s to C-Client with request_id: %s", command['type'], request_id)
+            
+            # Wait for response; a timer resolves the future on timeout (no wait_for wrapper task)
+            timeout = COMMAND_TIMEOUTS.get(command['type'], COMMAND_RESPONSE_TIMEOUT)
+            timeout_handle = loop.call_later(timeout, self._expire_request, request_id, future)
+            try:
+                response = await future
+            except BaseException:
+                self.pending_requests.pop(request_id, None)
+                raise
+            finally:
+                timeout_handle.cancel()
+            
+            if response is _TIMED_OUT:
+                self.logger.error("❌ Timeout waiting for response to %s (request_id: %s) after %.0f seconds",
+                                  command['type'], request_id, timeout)
                 return {"success": False, "error": "Timeout"}
+            
+            self.logger.info("✅ Received response for %s", command['type'])
+            self.logger.debug("📋 Response data: %s", response)
+            # Clean up on success
+            self.pending_requests.pop(request_id, None)
+            return response
                     
         except ConnectionClosed:
             self.logger.error("Connection closed while sending command")
@@ -682,81 +681,134 @@ class NodeManager:
             self.logger.error(f"Error sending command: {e}")
             return {"success": False, "error": str(e)}
     
+    def _broadcast(self, connections: List[ClientConnection], command: Dict[str, Any]) -> int:
+        """
+        Send one notification to many C-Clients without waiting for responses
+        No future or pending_requests entry is created; the C-Clients' acknowledgements are dropped.
+        The command is encoded once and the same frame text is sent to every connection
+        (they share one notification request_id, since acknowledgements are dropped anyway)
+        
+        Returns:
+            Number of connections the notification was sent to
+        """
+        connections = [connection for connection in connections if connection.ws_send is not None]
+        if not connections:
+            return 0
+        
+        command['request_id'] = f"{_NOTIFY_PREFIX}{next(self._request_seq)}"
+        payload = json_provider.dumps(command)
+        # Fire and forget: one task per send, no gather; failures are logged when each task finishes
+        loop = asyncio.get_running_loop()
+        for connection in connections:
+            task = loop.create_task(connection.ws_send(payload))
+            self._background_sends.add(task)
+            task.add_done_callback(functools.partial(self._on_broadcast_sent, connection.node_id))
+        return len(connections)
+    
+    def _on_broadcast_sent(self, node_id: str, task: asyncio.Task):
+        """Done callback for _broadcast sends: release the task and log a failed send"""
+        self._background_sends.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.warning("⚠️ Failed to notify node %s: %s", node_id, task.exception())
+    
+    def _expire_request(self, request_id: str, future: asyncio.Future):
+        """Timeout callback for send_to_c_client: wake the waiter and schedule request_id eviction"""
+        if future.done():
+            return
+        future.set_result(_TIMED_OUT)
+        # Keep the request_id for late response handling, but not forever
+        future.get_loop().call_later(LATE_RESPONSE_GRACE, self.pending_requests.pop, request_id, None)
+    
     async def handle_c_client_response(self, connection: ClientConnection, response: Dict[str, Any]):
         """Handle response from C-Client"""
         request_id = response.get('request_id')
         command_type = response.get('command_type')
         
-        self.logger.info(f"📥 NODEMANAGER: handle_c_client_response() CALLED")
-        self.logger.info(f"   Request ID: {request_id}")
-        self.logger.info(f"   Command type: {command_type}")
-        self.logger.info(f"   Success: {response.get('success')}")
+        self.logger.debug("📥 NODEMANAGER: handle_c_client_response() CALLED")
+        self.logger.debug("   Request ID: %s", request_id)
+        self.logger.debug("   Command type: %s", command_type)
+        self.logger.debug("   Success: %s", response.get('success'))
         
-        if request_id and request_id in self.pending_requests:
-            future = self.pending_requests[request_id]
+        # Clean up while looking up (the late-response eviction timer may already have removed it)
+        future = self.pending_requests.pop(request_id, None) if request_id else None
+        if future is not None:
             if not future.done():
-                self.logger.info(f"✅ Setting result for pending request {request_id}")
+                self.logger.debug("✅ Setting result for pending request %s", request_id)
                 future.set_result(response)
             else:
                 self.logger.warning(f"⚠️ Future for request {request_id} already done (likely timed out)")
-                self.logger.info(f"   Processing late response manually...")
                 
                 # Handle late response - process the result even though timeout occurred
                 if response.get('success') and command_type:
-                    await self._process_late_response(connection, command_type, response)
-            
-            # Clean up after handling
-            del self.pending_requests[request_id]
-            self.logger.info(f"✅ Cleaned up request_id: {request_id}")
+                    self._queue_late_response(connection, command_type, response)
+        elif isinstance(request_id, str) and request_id.startswith(_NOTIFY_PREFIX):
+            # Acknowledgement of a notification sent without waiting for a response
+            self.logger.debug("📥 Notification %s acknowledged by %s", request_id, connection.node_id)
         else:
             self.logger.warning(f"⚠️ No pending request found for request_id: {request_id}")
     
+    def _queue_late_response(self, connection: ClientConnection, command_type: str, response: Dict[str, Any]):
+        """
+        Hand a late response to the late-response worker
+        Processing it may send further commands to the same C-Client, whose replies arrive on the
+        message loop that called handle_c_client_response, so it must not be awaited inline
+        """
+        if self._late_responses is None:
+            self._late_responses = asyncio.Queue()
+            self._late_response_task = asyncio.get_running_loop().create_task(self._late_response_loop())
+        self.logger.debug("   Queued late %s response for processing", command_type)
+        self._late_responses.put_nowait((connection, command_type, response))
+    
+    async def _late_response_loop(self):
+        """Process queued late responses one at a time, in arrival order"""
+        while True:
+            connection, command_type, response = await self._late_responses.get()
+            await self._process_late_response(connection, command_type, response)
+    
     async def _process_late_response(self, connection: ClientConnection, command_type: str, response: Dict[str, Any]):
         """Process a late response that arrived after timeout"""
         try:
-            self.logger.info(f"🔄 PROCESSING LATE RESPONSE for {command_type}")
-            data = response.get('data', {})
+            self.logger.debug("🔄 PROCESSING LATE RESPONSE for %s", command_type)
+            data = _response_data(response)
             
             if command_type == 'new_domain_node':
                 domain_id = data.get('domain_id')
                 if domain_id:
-                    self.logger.info(f"   Late response: domain_id = {domain_id}")
+                    self.logger.debug("   Late response: domain_id = %s", domain_id)
                     connection.domain_id = domain_id
                     # Continue with cluster creation
-                    self.logger.info(f"   Continuing to create cluster...")
+                    self.logger.debug("   Continuing to create cluster...")
                     await self.new_cluster_node(connection, domain_id)
                     
             elif command_type == 'new_cluster_node':
                 cluster_id = data.get('cluster_id')
                 if cluster_id:
-                    self.logger.info(f"   Late response: cluster_id = {cluster_id}")
+                    self.logger.debug("   Late response: cluster_id = %s", cluster_id)
                     connection.cluster_id = cluster_id
                     # Continue with channel creation
-                    self.logger.info(f"   Continuing to create channel...")
+                    self.logger.debug("   Continuing to create channel...")
                     await self.new_channel_node(connection, connection.domain_id, cluster_id)
                     
             elif command_type == 'new_channel_node':
                 channel_id = data.get('channel_id')
                 if channel_id:
-                    self.logger.info(f"   Late response: channel_id = {channel_id}")
+                    self.logger.debug("   Late response: channel_id = %s", channel_id)
                     connection.channel_id = channel_id
                     # Add to channel pool
                     if connection.is_channel_main_node:
-                        if channel_id not in self.channel_pool:
-                            self.channel_pool[channel_id] = []
-                        self.channel_pool[channel_id].append(connection)
-                        self.logger.info(f"   ✅ Added to channel_pool[{channel_id}]")
-                    self.logger.info(f"   ✅ Full hierarchy completed via late response!")
+                        self.add_to_channel_pool(channel_id, connection)
+                        self.logger.debug("   ✅ Added to channel_pool[%s]", channel_id)
+                    self.logger.debug("   ✅ Full hierarchy completed via late response!")
                     
-            self.logger.info(f"✅ Late response processed successfully")
+            self.logger.info("✅ Late response processed successfully")
         except Exception as e:
             self.logger.error(f"❌ Error processing late response: {e}")
     
     # ===================== Count Peers Methods =====================
     
     async def count_peers(self, connection: ClientConnection, domain_id: Optional[str] = None, 
-                         cluster_id: Optional[str] = None, channel_id: Optional[str] = None) -> int:
-        """Count peers at specified level"""
+                         cluster_id: Optional[str] = None, channel_id: Optional[str] = None) -> Optional[int]:
+        """Count peers at specified level (None if the C-Client could not count)"""
         try:
             command = {
                 "type": "count_peers_amount",
@@ -770,14 +822,51 @@ class NodeManager:
             response = await self.send_to_c_client(connection, command)
             
             if response.get("success"):
-                return response.get("data", {}).get("count", 0)
+                return _response_data(response).get("count", 0)
             else:
                 self.logger.error(f"Failed to count peers: {response.get('error')}")
-                return 0
+                return None
                 
         except Exception as e:
             self.logger.error(f"Error in count_peers: {e}")
-            return 0
+            return None
+    
+    async def _pool_has_capacity(self, level: str, pool_id: str, unit: str,
+                                 domain_id: Optional[str] = None, cluster_id: Optional[str] = None) -> bool:
+        """
+        Check a pool's peer count through ANY of its connections (main node or regular node)
+        Returns False only when the pool is known to be full
+        """
+        # Get pool object (should exist even if main node is offline)
+        # Snapshot: count_peers awaits, and the pool may change meanwhile
+        connections = list(self._pools[level][0].get(pool_id, {}).values())
+        if not connections:
+            self.logger.debug("⚠️ %s pool %s is empty (no connections), skipping peer count", level.capitalize(), pool_id)
+            return True
+        
+        self.logger.debug("📊 %s pool has %d connection(s), counting peers...", level.capitalize(), len(connections))
+        # Ask every connection at once and use the first count that comes back, so one
+        # unresponsive node costs nothing as long as another one answers
+        tasks = [asyncio.create_task(self.count_peers(conn, domain_id, cluster_id, None)) for conn in connections]
+        try:
+            for next_count in asyncio.as_completed(tasks):
+                count = await next_count
+                if count is None:
+                    # Wait for the next connection's answer
+                    continue
+                
+                if count >= POOL_CAPACITY:
+                    self.logger.info("❌ %s %s is full (%s %s)", level.capitalize(), pool_id, count, unit)
+                    return False
+                self.logger.debug("✅ %s %s has capacity (%s < %s)", level.capitalize(), pool_id, count, POOL_CAPACITY)
+                return True
+        finally:
+            # Drop the probes still waiting (their pending request IDs are released on cancel)
+            for task in tasks:
+                task.cancel()
+        
+        self.logger.warning("⚠️ All connections failed to count peers, proceeding with assignment anyway")
+        return True
     
     # ===================== Assign To Methods =====================
     
@@ -785,42 +874,14 @@ class NodeManager:
                                channel_node_id: str) -> bool:
         """Assign C-Client to channel"""
         try:
-            # Get channel pool object (should exist even if main node is offline)
-            channel_connections = self.channel_pool.get(channel_id, [])
-            
-            # Try to count peers through ANY connection in the pool (main node or regular node)
-            node_count = 0
-            if channel_connections:
-                self.logger.info(f"📊 Channel pool has {len(channel_connections)} connection(s)")
-                self.logger.info(f"   → Attempting to count peers through available connections...")
-                
-                # Try to count through any available connection
-                count_success = False
-                for conn in channel_connections:
-                    try:
-                        node_count = await self.count_peers(conn, None, None, None)
-                        self.logger.info(f"✅ Successfully counted peers through node {conn.node_id}: {node_count} nodes")
-                        count_success = True
-                        break
-                    except Exception as e:
-                        self.logger.warning(f"⚠️ Failed to count through node {conn.node_id}: {e}")
-                        continue
-                
-                if count_success:
-                    if node_count >= 1000:
-                        self.logger.info(f"❌ Channel {channel_id} is full ({node_count} nodes)")
-                        return False
-                    else:
-                        self.logger.info(f"✅ Channel {channel_id} has capacity ({node_count} < 1000)")
-                else:
-                    self.logger.warning(f"⚠️ All connections failed to count peers, proceeding with assignment anyway")
-            else:
-                self.logger.info(f"⚠️ Channel pool {channel_id} is empty (no connections)")
-                self.logger.info(f"   → Skipping peer count, directly assigning (assuming available)")
+            # Refuse when the channel is already full; the C-Client also enforces capacity_limit
+            if not await self._pool_has_capacity('channel', channel_id, 'nodes'):
+                return False
             
             # Send assignToChannel command
             command = {
                 "type": "assign_to_channel",
+                "capacity_limit": POOL_CAPACITY,
                 "data": {
                     "domain_id": connection.domain_id,    # Add domain_id
                     "cluster_id": connection.cluster_id,  # Add cluster_id
@@ -836,14 +897,15 @@ class NodeManager:
                 self.add_to_channel_pool(channel_id, connection)
                 
                 # Notify all channel nodes about new peer
+                data = _response_data(response)
                 await self.add_new_node_to_peers(
-                    response.get("data", {}).get("domain_id"),
-                    response.get("data", {}).get("cluster_id"),
+                    data.get("domain_id"),
+                    data.get("cluster_id"),
                     channel_id,
                     connection.node_id
                 )
                 
-                self.logger.info(f"✅ Successfully assigned {connection.node_id} to channel {channel_id}")
+                self.logger.info("✅ Successfully assigned %s to channel %s", connection.node_id, channel_id)
                 return True
             else:
                 self.logger.error(f"❌ Failed to assign to channel: {response.get('error')}")
@@ -857,42 +919,14 @@ class NodeManager:
                                cluster_node_id: str) -> bool:
         """Assign C-Client to cluster"""
         try:
-            # Get cluster pool object (should exist even if main node is offline)
-            cluster_connections = self.cluster_pool.get(cluster_id, [])
-            
-            # Try to count peers through ANY connection in the pool (main node or regular node)
-            channel_count = 0
-            if cluster_connections:
-                self.logger.info(f"📊 Cluster pool has {len(cluster_connections)} connection(s)")
-                self.logger.info(f"   → Attempting to count peers through available connections...")
-                
-                # Try to count through any available connection
-                count_success = False
-                for conn in cluster_connections:
-                    try:
-                        channel_count = await self.count_peers(conn, None, cluster_id, None)
-                        self.logger.info(f"✅ Successfully counted peers through node {conn.node_id}: {channel_count} channels")
-                        count_success = True
-                        break
-                    except Exception as e:
-                        self.logger.warning(f"⚠️ Failed to count through node {conn.node_id}: {e}")
-                        continue
-                
-                if count_success:
-                    if channel_count >= 1000:
-                        self.logger.info(f"❌ Cluster {cluster_id} is full ({channel_count} channels)")
-                        return False
-                    else:
-                        self.logger.info(f"✅ Cluster {cluster_id} has capacity ({channel_count} < 1000)")
-                else:
-                    self.logger.warning(f"⚠️ All connections failed to count peers, proceeding with assignment anyway")
-            else:
-                self.logger.info(f"⚠️ Cluster pool {cluster_id} is empty (no connections)")
-                self.logger.info(f"   → Skipping peer count, directly assigning (assuming available)")
+            # Refuse when the cluster is already full; the C-Client also enforces capacity_limit
+            if not await self._pool_has_capacity('cluster', cluster_id, 'channels', cluster_id=cluster_id):
+                return False
             
             # Send assignToCluster command
             command = {
                 "type": "assign_to_cluster",
+                "capacity_limit": POOL_CAPACITY,
                 "data": {
                     "domain_id": connection.domain_id,  # Add domain_id
                     "cluster_id": cluster_id,
@@ -908,12 +942,12 @@ class NodeManager:
                 
                 # Try to assign to existing channel - try ALL channels in the cluster
                 channel_assigned = False
-                for channel_connection in self.cluster_pool.get(cluster_id, []):
+                for channel_connection in list(self.cluster_pool.get(cluster_id, {}).values()):
                     if channel_connection.channel_id:
-                        self.logger.info(f"🔍 Trying to assign to existing channel: {channel_connection.channel_id}")
+                        self.logger.debug("🔍 Trying to assign to existing channel: %s", channel_connection.channel_id)
                         if await self.assign_to_channel(connection, channel_connection.channel_id, 
                                                        channel_connection.node_id):
-                            self.logger.info(f"✅ Successfully assigned to existing channel: {channel_connection.channel_id}")
+                            self.logger.debug("✅ Successfully assigned to existing channel: %s", channel_connection.channel_id)
                             channel_assigned = True
                             break
                         else:
@@ -921,17 +955,15 @@ class NodeManager:
                 
                 # Only create new channel if NO existing channels were available
                 if not channel_assigned:
-                    self.logger.info(f"📍 No available channels found, creating new channel for cluster {cluster_id}")
+                    self.logger.debug("📍 No available channels found, creating new channel for cluster %s", cluster_id)
                     # Use connection's domain_id instead of response data
                     domain_id = connection.domain_id
                     if domain_id:
+                        # new_channel_node already makes this node the channel's main node and pools it,
+                        # so there is nothing left to assign (no count/assign round trip or peer broadcast)
                         await self.new_channel_node(connection, domain_id, cluster_id)
-                        # Assign to own channel
-                        if connection.channel_id:
-                            return await self.assign_to_channel(connection, connection.channel_id, 
-                                                              connection.node_id)
                 
-                self.logger.info(f"✅ Successfully assigned {connection.node_id} to cluster {cluster_id}")
+                self.logger.info("✅ Successfully assigned %s to cluster %s", connection.node_id, cluster_id)
                 return True
             else:
                 self.logger.error(f"❌ Failed to assign to cluster: {response.get('error')}")
@@ -945,42 +977,14 @@ class NodeManager:
                               domain_node_id: str) -> bool:
         """Assign C-Client to domain"""
         try:
-            # Get domain pool object (should exist even if main node is offline)
-            domain_connections = self.domain_pool.get(domain_id, [])
-            
-            # Try to count peers through ANY connection in the pool (main node or regular node)
-            cluster_count = 0
-            if domain_connections:
-                self.logger.info(f"📊 Domain pool has {len(domain_connections)} connection(s)")
-                self.logger.info(f"   → Attempting to count peers through available connections...")
-                
-                # Try to count through any available connection
-                count_success = False
-                for conn in domain_connections:
-                    try:
-                        cluster_count = await self.count_peers(conn, domain_id, None, None)
-                        self.logger.info(f"✅ Successfully counted peers through node {conn.node_id}: {cluster_count} clusters")
-                        count_success = True
-                        break
-                    except Exception as e:
-                        self.logger.warning(f"⚠️ Failed to count through node {conn.node_id}: {e}")
-                        continue
-                
-                if count_success:
-                    if cluster_count >= 1000:
-                        self.logger.info(f"❌ Domain {domain_id} is full ({cluster_count} clusters)")
-                        return False
-                    else:
-                        self.logger.info(f"✅ Domain {domain_id} has capacity ({cluster_count} < 1000)")
-                else:
-                    self.logger.warning(f"⚠️ All connections failed to count peers, proceeding with assignment anyway")
-            else:
-                self.logger.info(f"⚠️ Domain pool {domain_id} is empty (no connections)")
-                self.logger.info(f"   → Skipping peer count, directly assigning (assuming available)")
+            # Refuse when the domain is already full; the C-Client also enforces capacity_limit
+            if not await self._pool_has_capacity('domain', domain_id, 'clusters', domain_id=domain_id):
+                return False
             
             # Send assignToDomain command
             command = {
                 "type": "assign_to_domain",
+                "capacity_limit": POOL_CAPACITY,
                 "data": {
                     "domain_id": domain_id,
                     "node_id": connection.node_id
@@ -995,12 +999,12 @@ class NodeManager:
                 
                 # Try to assign to existing cluster - try ALL clusters in the domain
                 cluster_assigned = False
-                for cluster_connection in self.domain_pool.get(domain_id, []):
+                for cluster_connection in list(self.domain_pool.get(domain_id, {}).values()):
                     if cluster_connection.cluster_id:
-                        self.logger.info(f"🔍 Trying to assign to existing cluster: {cluster_connection.cluster_id}")
+                        self.logger.debug("🔍 Trying to assign to existing cluster: %s", cluster_connection.cluster_id)
                         if await self.assign_to_cluster(connection, cluster_connection.cluster_id, 
                                                        cluster_connection.node_id):
-                            self.logger.info(f"✅ Successfully assigned to existing cluster: {cluster_connection.cluster_id}")
+                            self.logger.debug("✅ Successfully assigned to existing cluster: %s", cluster_connection.cluster_id)
                             cluster_assigned = True
                             break
                         else:
@@ -1008,14 +1012,12 @@ class NodeManager:
                 
                 # Only create new cluster if NO existing clusters were available
                 if not cluster_assigned:
-                    self.logger.info(f"📍 No available clusters found, creating new cluster for domain {domain_id}")
+                    self.logger.debug("📍 No available clusters found, creating new cluster for domain %s", domain_id)
+                    # new_cluster_node already pools this node as main node of the new cluster and of
+                    # its first channel, so there is nothing left to assign
                     await self.new_cluster_node(connection, domain_id)
-                    # Assign to own cluster
-                    if connection.cluster_id:
-                        return await self.assign_to_cluster(connection, connection.cluster_id, 
-                                                          connection.node_id)
                 
-                self.logger.info(f"✅ Successfully assigned {connection.node_id} to domain {domain_id}")
+                self.logger.info("✅ Successfully assigned %s to domain %s", connection.node_id, domain_id)
                 return True
             else:
                 self.logger.error(f"❌ Failed to assign to domain: {response.get('error')}")
@@ -1048,7 +1050,7 @@ class NodeManager:
                 return False
             
             # Get channel_id from response
-            channel_id = response.get("data", {}).get("channel_id")
+            channel_id = _response_data(response).get("channel_id")
             if not channel_id:
                 self.logger.error("No channel_id in response")
                 return False
@@ -1091,7 +1093,7 @@ class NodeManager:
                 return False
             
             # Get cluster_id from response
-            cluster_id = response.get("data", {}).get("cluster_id")
+            cluster_id = _response_data(response).get("cluster_id")
             if not cluster_id:
                 self.logger.error("No cluster_id in response")
                 return False
@@ -1137,7 +1139,7 @@ class NodeManager:
                 return False
             
             # Get domain_id from response
-            domain_id = response.get("data", {}).get("domain_id")
+            domain_id = _response_data(response).get("domain_id")
             if not domain_id:
                 self.logger.error("No domain_id in response")
                 return False
@@ -1186,14 +1188,9 @@ class NodeManager:
             }
             
             # Send to all connections in channel
-            tasks = []
-            for connection in self.channel_pool[channel_id]:
-                task = self.send_to_c_client(connection, command)
-                tasks.append(task)
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-                self.logger.info(f"Notified {len(tasks)} nodes in channel {channel_id} about new peer {node_id}")
+            notified = self._broadcast(list(self.channel_pool[channel_id].values()), command)
+            if notified:
+                self.logger.info(f"Notified {notified} nodes in channel {channel_id} about new peer {node_id}")
                 
         except Exception as e:
             self.logger.error(f"Error in add_new_node_to_peers: {e}")
@@ -1217,14 +1214,9 @@ class NodeManager:
             }
             
             # Send to all connections in cluster
-            tasks = []
-            for connection in self.cluster_pool[cluster_id]:
-                task = self.send_to_c_client(connection, command)
-                tasks.append(task)
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-                self.logger.info(f"Notified {len(tasks)} nodes in cluster {cluster_id} about new channel {channel_id}")
+            notified = self._broadcast(list(self.cluster_pool[cluster_id].values()), command)
+            if notified:
+                self.logger.info(f"Notified {notified} nodes in cluster {cluster_id} about new channel {channel_id}")
                 
         except Exception as e:
             self.logger.error(f"Error in add_new_channel_to_peers: {e}")
@@ -1246,14 +1238,9 @@ class NodeManager:
             }
             
             # Send to all connections in domain
-            tasks = []
-            for connection in self.domain_pool[domain_id]:
-                task = self.send_to_c_client(connection, command)
-                tasks.append(task)
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-                self.logger.info(f"Notified {len(tasks)} nodes in domain {domain_id} about new cluster {cluster_id}")
+            notified = self._broadcast(list(self.domain_pool[domain_id].values()), command)
+            if notified:
+                self.logger.info(f"Notified {notified} nodes in domain {domain_id} about new cluster {cluster_id}")
                 
         except Exception as e:
             self.logger.error(f"Error in add_new_cluster_to_peers: {e}")
@@ -1270,15 +1257,12 @@ class NodeManager:
             }
             
             # Send to all domain connections
-            tasks = []
-            for connections in self.domain_pool.values():
-                for connection in connections:
-                    task = self.send_to_c_client(connection, command)
-                    tasks.append(task)
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-                self.logger.info(f"Notified {len(tasks)} domain nodes about new domain {domain_id}")
+            notified = self._broadcast(
+                [connection for connections in self.domain_pool.values() for connection in connections.values()],
+                command
+            )
+            if notified:
+                self.logger.info(f"Notified {notified} domain nodes about new domain {domain_id}")
                 
         except Exception as e:
             self.logger.error(f"Error in add_new_domain_to_peers: {e}")
@@ -1286,7 +1270,15 @@ class NodeManager:
     # ===================== Utility Methods =====================
     
     def get_pool_stats(self) -> Dict[str, Any]:
-        """Get statistics about connection pools"""
+        """Get statistics about connection pools (recomputed only after the pools change)"""
+        cached = self._pool_stats_cache
+        if cached is None or cached[0] != self.revision:
+            cached = (self.revision, self._compute_pool_stats())
+            self._pool_stats_cache = cached
+        return dict(cached[1])
+    
+    def _compute_pool_stats(self) -> Dict[str, Any]:
+        """Walk all pools and build the statistics returned by get_pool_stats"""
         return {
             "domains": len(self.domain_pool),
             "clusters": len(self.cluster_pool),
@@ -1337,8 +1329,8 @@ class NodeManager:
             if domain_id and domain_id in self.domain_pool:
                 domain_connections = self.domain_pool[domain_id]
                 # Find first valid connection that is marked as domain main
-                for conn in domain_connections:
-                    if self._is_websocket_valid(conn.websocket) and conn.is_domain_main_node:
+                for conn in domain_connections.values():
+                    if self._is_connection_valid(conn) and conn.is_domain_main_node:
                         result['domain_main_node_id'] = conn.node_id
                         self.logger.info(f"✅ Found domain main node: {conn.node_id}")
                         break
@@ -1352,8 +1344,8 @@ class NodeManager:
             if cluster_id and cluster_id in self.cluster_pool:
                 cluster_connections = self.cluster_pool[cluster_id]
                 # Find first valid connection that is marked as cluster main
-                for conn in cluster_connections:
-                    if self._is_websocket_valid(conn.websocket) and conn.is_cluster_main_node:
+                for conn in cluster_connections.values():
+                    if self._is_connection_valid(conn) and conn.is_cluster_main_node:
                         result['cluster_main_node_id'] = conn.node_id
                         self.logger.info(f"✅ Found cluster main node: {conn.node_id}")
                         break
@@ -1367,8 +1359,8 @@ class NodeManager:
             if channel_id and channel_id in self.channel_pool:
                 channel_connections = self.channel_pool[channel_id]
                 # Find first valid connection that is marked as channel main
-                for conn in channel_connections:
-                    if self._is_websocket_valid(conn.websocket) and conn.is_channel_main_node:
+                for conn in channel_connections.values():
+                    if self._is_connection_valid(conn) and conn.is_channel_main_node:
                         result['channel_main_node_id'] = conn.node_id
                         self.logger.info(f"✅ Found channel main node: {conn.node_id}")
                         break
@@ -1413,8 +1405,8 @@ class NodeManager:
             valid_connections = []
             invalid_connections = []
             
-            for conn in channel_connections:
-                if self._is_websocket_valid(conn.websocket):
+            for conn in channel_connections.values():
+                if self._is_connection_valid(conn):
                     valid_connections.append(conn)
                 else:
                     invalid_connections.append(conn)
@@ -1439,62 +1431,86 @@ class NodeManager:
             self.logger.error(f"Error getting channel nodes: {e}")
             return []
     
+    def _is_connection_valid(self, connection: ClientConnection) -> bool:
+        """Check a connection's websocket, remembering a negative result on the connection"""
+        if connection.ws_closed:
+            return False
+        if self._is_websocket_valid(connection.websocket):
+            return True
+        connection.ws_closed = True
+        return False
+    
     def _is_websocket_valid(self, websocket) -> bool:
-        """Check if a WebSocket connection is still valid using the same logic as WebSocketClient"""
+        """
+        Check if a WebSocket connection is still valid using the same logic as WebSocketClient
+        Only reads connection attributes (no probe is sent), so it is cheap enough to call per check
+        """
         try:
             # Check if connection was marked as closed by logout
-            if hasattr(websocket, '_closed_by_logout') and websocket._closed_by_logout:
-                self.logger.debug(f"🔍 NodeManager: Connection marked as closed by logout")
+            if getattr(websocket, '_closed_by_logout', False):
+                self.logger.debug("🔍 NodeManager: Connection marked as closed by logout")
                 return False
             
             # Check WebSocket closed attribute
-            if hasattr(websocket, 'closed') and websocket.closed:
-                self.logger.debug(f"🔍 NodeManager: Connection is closed (closed=True)")
+            if getattr(websocket, 'closed', False):
+                self.logger.debug("🔍 NodeManager: Connection is closed (closed=True)")
                 return False
             
             # Check connection state - use multiple methods for reliability
             connection_valid = True
             
             # Method 1: Check websockets state attribute
-            if hasattr(websocket, 'state'):
-                state_value = websocket.state
-                state_name = websocket.state.name if hasattr(websocket.state, 'name') else str(websocket.state)
+            state_value = getattr(websocket, 'state', None)
+            if state_value is not None:
+                state_name = getattr(state_value, 'name', None) or str(state_value)
                 
                 # Check state value (3 = CLOSED, 2 = CLOSING)
-                if state_value in [2, 3] or state_name in ['CLOSED', 'CLOSING']:
-                    self.logger.debug(f"🔍 NodeManager: Connection is in {state_name} state (value: {state_value})")
+                if state_value in (2, 3) or state_name in ('CLOSED', 'CLOSING'):
+                    self.logger.debug("🔍 NodeManager: Connection is in %s state (value: %s)", state_name, state_value)
                     connection_valid = False
             
             # Method 2: Check close_code
-            if hasattr(websocket, 'close_code') and websocket.close_code is not None:
-                self.logger.debug(f"🔍 NodeManager: Connection has close_code {websocket.close_code}")
+            close_code = getattr(websocket, 'close_code', None)
+            if close_code is not None:
+                self.logger.debug("🔍 NodeManager: Connection has close_code %s", close_code)
                 connection_valid = False
             
-            # Method 3: Try to access the websocket object
+            # Method 3: Check the adapter-level closed marker (lightweight, no data is sent)
             try:
-                # This is a lightweight check - just accessing the websocket object
-                # without actually sending data
-                if hasattr(websocket, '_closed') and websocket._closed:
-                    self.logger.debug(f"🔍 NodeManager: Connection is marked as _closed")
+                if getattr(websocket, '_closed', False):
+                    self.logger.debug("🔍 NodeManager: Connection is marked as _closed")
                     connection_valid = False
             except Exception:
-                self.logger.debug(f"🔍 NodeManager: Connection appears to be invalid (exception during ping test)")
+                self.logger.debug("🔍 NodeManager: Connection appears to be invalid (exception during ping test)")
                 connection_valid = False
             
-            if connection_valid:
-                self.logger.debug(f"🔍 NodeManager: Connection appears to be valid")
-            else:
-                self.logger.debug(f"🔍 NodeManager: Connection is invalid")
-            
+            self.logger.debug("🔍 NodeManager: Connection is %s", 'valid' if connection_valid else 'invalid')
             return connection_valid
             
         except Exception as e:
-            self.logger.debug(f"🔍 NodeManager: Error checking connection validity: {e}")
+            self.logger.debug("🔍 NodeManager: Error checking connection validity: %s", e)
             return False
     
+    def _node_validity(self):
+        """
+        Return a validity(node_id, connection) lookup for one pass over the pools
+        A node sits in up to three pools; its websocket is checked on first sight and memoized
+        """
+        results: Dict[str, bool] = {}
+        
+        def validity(node_id: str, connection: ClientConnection) -> bool:
+            valid = results.get(node_id)
+            if valid is None:
+                valid = results[node_id] = self._is_connection_valid(connection)
+            return valid
+        
+        return validity
+    
     async def cleanup_disconnected_connections(self):
         """Clean up disconnected connections from pools"""
-        disconnected_connections = []
+        # node_id -> connection (a node sits in up to three pools but is removed once)
+        disconnected_connections = {}
+        validity = self._node_validity()
         
         # Check all connections in all pools
         for pool_name, pool in [
@@ -1503,16 +1519,15 @@ class NodeManager:
             ('channel_pool', self.channel_pool)
         ]:
             for pool_id, connections in pool.items():
-                for connection in connections:
-                    if not self._is_websocket_valid(connection.websocket):
-                        disconnected_connections.append(connection)
+                for node_id, connection in connections.items():
+                    if not validity(node_id, connection):
+                        disconnected_connections[connection.node_id] = connection
                         self.logger.info(f"🔧 NodeManager: Found invalid connection in {pool_name}[{pool_id}]: node_id={connection.node_id}")
         
         # Remove disconnected connections
         if disconnected_connections:
             self.logger.info(f"🔧 NodeManager: Cleaning up {len(disconnected_connections)} invalid connections")
-            for connection in disconnected_connections:
-                self.remove_connection(connection)
+            self.remove_connections(list(disconnected_connections.values()))
             self.logger.info(f"🔧 NodeManager: Cleanup completed")
         else:
             self.logger.info(f"🔧 NodeManager: No invalid connections found")
@@ -1527,11 +1542,12 @@ class NodeManager:
                 'total_valid': 0,
                 'total_invalid': 0
             }
+            validity = self._node_validity()
             
             # Check domain pool
             for connections in self.domain_pool.values():
-                for conn in connections:
-                    if self._is_websocket_valid(conn.websocket):
+                for node_id, conn in connections.items():
+                    if validity(node_id, conn):
                         valid_counts['domains'] += 1
                         valid_counts['total_valid'] += 1
                     else:
@@ -1539,8 +1555,8 @@ class NodeManager:
             
             # Check cluster pool
             for connections in self.cluster_pool.values():
-                for conn in connections:
-                    if self._is_websocket_valid(conn.websocket):
+                for node_id, conn in connections.items():
+                    if validity(node_id, conn):
                         valid_counts['clusters'] += 1
                         valid_counts['total_valid'] += 1
                     else:
@@ -1548,8 +1564,8 @@ class NodeManager:
             
             # Check channel pool
             for connections in self.channel_pool.values():
-                for conn in connections:
-                    if self._is_websocket_valid(conn.websocket):
+                for node_id, conn in connections.items():
+                    if validity(node_id, conn):
                         valid_counts['channels'] += 1
                         valid_counts['total_valid'] += 1
                     else:
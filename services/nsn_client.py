@@ -5,6 +5,8 @@ Handles all NSN API integration and communication
 import os
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import time
 import secrets
@@ -18,13 +20,43 @@ from utils.logger import get_bclient_logger
 from utils.config_manager import get_nsn_url
 
 
+def create_nsn_session(workers=None):
+    """Create a keep-alive requests.Session with a connection pool sized for concurrent binds"""
+    if workers is None:
+        workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+    
+    # Connect errors are retried for every method (nothing reached NSN yet);
+    # status retries are limited to GET so signup/login POSTs are never replayed.
+    # Once retries run out the last 5xx response is returned (not RetryError) so callers still
+    # see response.status_code
+    retries = Retry(
+        total=2,
+        backoff_factor=0.1,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=max(16, workers),
+        pool_maxsize=max(32, 2 * workers),
+        max_retries=retries
+    )
+    
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    session.headers['Accept-Encoding'] = 'gzip'
+    return session
+
+
 class NSNClient:
     def __init__(self):
         # Initialize logger
         self.logger = get_bclient_logger('nsn_client')
         
         self.base_url = self.get_nsn_url()
-        self.session = requests.Session()
+        self.session = create_nsn_session()
     
     def get_nsn_url(self):
         """Get NSN URL based on current environment"""
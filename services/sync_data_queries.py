@@ -3,14 +3,13 @@ Sync Data Queries Service
 Handles database queries for sync_data table in cluster verification
 """
 import json
-import os
-import sys
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
 
-# Import logging system
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from sqlalchemy import bindparam, text
+
+# Import logging system (repo root is on sys.path: this module is only loaded via the services package)
 from utils.logger import get_bclient_logger
 
 # Initialize logger
@@ -21,6 +20,45 @@ db = None
 SyncData = None
 
 
+def _isoformat(value):
+    """ISO format datetimes; SQLite may already return them as text"""
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+# Verification-path statements, built once at import so each call skips TextClause
+# construction (bind-param parsing) and reuses SQLAlchemy's compiled-statement cache
+
+# Same grouping as get_valid_batches, newest 10 batches per channel via ROW_NUMBER()
+VALID_BATCHES_MULTI_QUERY = text("""
+    SELECT channel_id, batch_id, record_count, first_record_time, last_record_time
+    FROM (
+        SELECT 
+            channel_id,
+            batch_id,
+            COUNT(*) as record_count,
+            MIN(created_at) as first_record_time,
+            MAX(created_at) as last_record_time,
+            ROW_NUMBER() OVER (PARTITION BY channel_id ORDER BY MIN(created_at) DESC) as batch_rank
+        FROM sync_data 
+        WHERE channel_id IN :channel_ids 
+        GROUP BY channel_id, batch_id 
+        HAVING COUNT(*) > :min_batch_size
+    ) ranked_batches
+    WHERE batch_rank <= 10
+    ORDER BY channel_id, first_record_time DESC
+""").bindparams(bindparam('channel_ids', expanding=True))
+
+# First record of a batch
+BATCH_FIRST_RECORD_QUERY = text("""
+    SELECT * FROM sync_data 
+    WHERE batch_id = :batch_id 
+    ORDER BY created_at ASC 
+    LIMIT 1
+""")
+
+
 class SyncDataQueries:
     """Database queries for sync_data table"""
     
@@ -85,6 +123,47 @@ class SyncDataQueries:
             logger.error(f"Error querying valid batches: {e}")
             return []
     
+    def get_valid_batches_multi(self, channel_ids: List[str], min_batch_size: int = None) -> Dict[str, List[Dict]]:
+        """
+        Get valid batches for several channels in one query
+        
+        Args:
+            channel_ids: Channel IDs to filter by
+            min_batch_size: Minimum batch size (default: 3)
+            
+        Returns:
+            Dict of channel_id -> list of valid batch data (same shape and limit as get_valid_batches)
+        """
+        try:
+            if min_batch_size is None:
+                min_batch_size = self.min_batch_size
+            
+            logger.debug("Querying valid batches for %d channels with min size %s", len(channel_ids), min_batch_size)
+            
+            result = self.db.session.execute(
+                VALID_BATCHES_MULTI_QUERY, 
+                {
+                    'channel_ids': list(channel_ids),
+                    'min_batch_size': min_batch_size
+                }
+            ).fetchall()
+            
+            valid_batches = {channel_id: [] for channel_id in channel_ids}
+            for row in result:
+                valid_batches.setdefault(row.channel_id, []).append({
+                    'batch_id': row.batch_id,
+                    'record_count': row.record_count,
+                    'first_record_time': _isoformat(row.first_record_time),
+                    'last_record_time': _isoformat(row.last_record_time)
+                })
+            
+            logger.debug("Found %d valid batches across %d channels", len(result), len(channel_ids))
+            return valid_batches
+            
+        except Exception as e:
+            logger.error(f"Error querying valid batches for channels: {e}")
+            return {channel_id: [] for channel_id in channel_ids}
+    
     def get_batch_first_record(self, batch_id: str) -> Optional[Dict]:
         """
         Get the first record of a specific batch
@@ -96,28 +175,19 @@ class SyncDataQueries:
             First record data, or None if not found
         """
         try:
-            logger.info(f"Getting first record for batch {batch_id}")
-            
-            # Query to get the first record of the batch
-            query = """
-                SELECT * FROM sync_data 
-                WHERE batch_id = :batch_id 
-                ORDER BY created_at ASC 
-                LIMIT 1
-            """
+            logger.debug("Getting first record for batch %s", batch_id)
             
-            result = self.db.session.execute(query, {'batch_id': batch_id}).fetchone()
+            result = self.db.session.execute(BATCH_FIRST_RECORD_QUERY, {'batch_id': batch_id}).mappings().first()
             
             if result:
-                # Convert row to dictionary
-                record = dict(result._mapping)
-                
-                # Convert datetime objects to ISO format strings
-                for key, value in record.items():
-                    if isinstance(value, datetime):
-                        record[key] = value.isoformat()
+                # Build the plain dict in one pass, ISO-formatting datetimes as we go
+                # (the dict is cached and JSON-encoded as-is by the verification handler)
+                record = {
+                    key: value.isoformat() if isinstance(value, datetime) else value
+                    for key, value in result.items()
+                }
                 
-                logger.info(f"Found first record for batch {batch_id}")
+                logger.debug("Found first record for batch %s", batch_id)
                 return record
             else:
                 logger.warning(f"No records found for batch {batch_id}")
@@ -281,6 +351,15 @@ def get_valid_batches_for_channel(channel_id: str, min_batch_size: int = 3) -> L
     return sync_data_queries.get_valid_batches(channel_id, min_batch_size)
 
 
+def get_valid_batches_for_channels(channel_ids: List[str], min_batch_size: int = 3) -> Dict[str, List[Dict]]:
+    """Get valid batches for several channels in one query"""
+    if not sync_data_queries:
+        logger.error("Sync data queries service not initialized")
+        return {channel_id: [] for channel_id in channel_ids}
+    
+    return sync_data_queries.get_valid_batches_multi(channel_ids, min_batch_size)
+
+
 def get_batch_first_record_data(batch_id: str) -> Optional[Dict]:
     """Get first record data for a batch"""
     if not sync_data_queries:
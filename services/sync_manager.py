@@ -306,7 +306,7 @@ class SyncManager:
             user_connection = None
             for domain_id, connections in self.node_manager.domain_pool.items():
                 self.logger.debug(f"🔍 [SyncManager] Checking domain {domain_id} with {len(connections)} connections")
-                for conn in connections:
+                for conn in connections.values():
                     if conn.user_id == user_id:
                         user_connection = conn
                         self.logger.info(f"✅ [SyncManager] Found user connection in domain {domain_id}")
@@ -326,8 +326,8 @@ class SyncManager:
             
             self.logger.info(f"🎯 [SyncManager] Target channel: {channel_id}")
             
-            # Get all connections in the same channel
-            channel_connections = self.node_manager.channel_pool.get(channel_id, [])
+            # Get all connections in the same channel (snapshot: the forward loop awaits sends)
+            channel_connections = list(self.node_manager.channel_pool.get(channel_id, {}).values())
             
             self.logger.info(f"📡 [SyncManager] ===== CHANNEL NODES DISCOVERY =====")
             self.logger.info(f"🎯 [SyncManager] Channel {channel_id} has {len(channel_connections)} total connections")
@@ -24,6 +24,7 @@ except ImportError:
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from utils.logger import get_bclient_logger
 from utils.config_manager import get_nsn_url
+from utils import json_provider
 
 # Service imports
 from .cluster_verification import verify_user_cluster, ClusterVerificationService, get_cluster_verification_service
@@ -37,6 +38,9 @@ UserAccount = None
 send_session_to_client = None
 sync_manager = None
 
+# NSN root URL keyed by the environment overrides it depends on (config.json is only loaded once)
+_nsn_root_url_cache = {}
+
 
 def init_websocket_client(flask_app, database=None, user_cookie_model=None, user_account_model=None, send_session_func=None):
     """Initialize WebSocket client with Flask app and database models"""
@@ -52,6 +56,12 @@ def init_websocket_client(flask_app, database=None, user_cookie_model=None, user
         send_session_to_client = send_session_func
 
 
+def _resolve_feedback(feedback):
+    """Mark a session feedback future as received (runs on the future's own loop)"""
+    if not feedback.done():
+        feedback.set_result(True)
+
+
 class CClientWebSocketClient:
     def __init__(self):
         # Initialize logging system
@@ -107,9 +117,8 @@ class CClientWebSocketClient:
         try:
             connection_id = id(websocket)
             
-            if connection_id in self.connection_cluster_verification:
-                # Remove the instance from our tracking
-                del self.connection_cluster_verification[connection_id]
+            # Remove the instance from our tracking
+            if self.connection_cluster_verification.pop(connection_id, None) is not None:
                 self.logger.info(f"===== CLUSTER VERIFICATION INSTANCE CLEANED UP =====")
                 self.logger.info(f"Connection ID: {connection_id}")
                 self.logger.info(f"===== END CLUSTER VERIFICATION CLEANUP =====")
@@ -149,9 +158,10 @@ class CClientWebSocketClient:
             for key, value in nmp_params.items():
                 self.logger.info(f"🔗   {key}: {value}")
             
-            # Call NodeManager's handle_new_connection method
-            self.logger.info(f"🔗 Calling NodeManager.handle_new_connection()...")
-            connection = await self.node_manager.handle_new_connection(websocket, nmp_params)
+            # Register with NodeManager; only await assignment when the hierarchy is incomplete
+            connection, needs_assignment = self.node_manager.register_connection(websocket, nmp_params)
+            if needs_assignment:
+                await self.node_manager.finalize_connection(connection)
             
             if connection:
                 self.logger.info(f"🔗 ✅ NodeManager connection sync successful")
@@ -167,7 +177,7 @@ class CClientWebSocketClient:
                 
                 return True
             else:
-                self.logger.error(f"🔗 ❌ NodeManager.handle_new_connection() returned None")
+                self.logger.error(f"🔗 ❌ NodeManager.register_connection() returned None")
                 return False
                 
         except Exception as e:
@@ -198,9 +208,8 @@ class CClientWebSocketClient:
                 self.logger.info(f"🔗 Cluster ID: {nodemanager_connection.cluster_id}")
                 self.logger.info(f"🔗 Channel ID: {nodemanager_connection.channel_id}")
                 
-                # Call NodeManager's remove_connection method
-                self.logger.info(f"🔗 Calling NodeManager.remove_connection()...")
-                self.node_manager.remove_connection(nodemanager_connection)
+                # Queue removal; NodeManager removes disconnects from the same tick as one batch
+                self.node_manager.schedule_removal(nodemanager_connection)
                 
                 # Clear the reference
                 websocket.nodemanager_connection = None
@@ -208,28 +217,13 @@ class CClientWebSocketClient:
                 return True
             else:
                 self.logger.warning(f"🔗 ⚠️ No NodeManager connection reference found on websocket")
-                # Try to create a minimal connection object for cleanup
-                try:
-                    minimal_connection = ClientConnection(
-                        websocket=websocket,
-                        node_id=getattr(websocket, 'node_id', None),
-                        user_id=getattr(websocket, 'user_id', None),
-                        username=getattr(websocket, 'username', None),
-                        domain_id=getattr(websocket, 'domain_id', None),
-                        cluster_id=getattr(websocket, 'cluster_id', None),
-                        channel_id=getattr(websocket, 'channel_id', None),
-                        is_domain_main_node=getattr(websocket, 'is_domain_main_node', False),
-                        is_cluster_main_node=getattr(websocket, 'is_cluster_main_node', False),
-                        is_channel_main_node=getattr(websocket, 'is_channel_main_node', False)
-                    )
-                    
-                    self.logger.info(f"🔗 Created minimal connection object for cleanup: {minimal_connection}")
-                    self.node_manager.remove_connection(minimal_connection)
-                    self.logger.info(f"🔗 ✅ NodeManager disconnection sync with minimal connection successful")
+                # Fall back to the node_id stored on the websocket (NodeManager resolves the hierarchy)
+                node_id = getattr(websocket, 'node_id', None)
+                if node_id and self.node_manager.remove_by_node_id(node_id):
+                    self.logger.info(f"🔗 ✅ NodeManager disconnection sync by node_id successful")
                     return True
-                except Exception as e:
-                    self.logger.error(f"🔗 ❌ Error creating minimal connection for cleanup: {e}")
-                    return False
+                self.logger.warning(f"🔗 ⚠️ Node {node_id} not registered in NodeManager, nothing to clean up")
+                return False
                 
         except Exception as e:
             self.logger.error(f"🔗 ❌ Error syncing disconnection to NodeManager: {e}")
@@ -270,6 +264,7 @@ class CClientWebSocketClient:
                 # Clear logout flag if reconnected
                 if hasattr(nodemanager_connection.websocket, '_closed_by_logout'):
                     nodemanager_connection.websocket._closed_by_logout = False
+                    nodemanager_connection.ws_closed = False
                     self.logger.info(f"🔗 ✅ Cleared logout flag for reconnected connection")
             
             # Get updated pool statistics
@@ -315,7 +310,7 @@ class CClientWebSocketClient:
                     ('channel_pool', self.node_manager.channel_pool)
                 ]:
                     for pool_id, connections in pool.items():
-                        if nodemanager_connection in connections:
+                        if connections.get(nodemanager_connection.node_id) is nodemanager_connection:
                             found_in_pools = True
                             self.logger.debug(f"🔍 ✅ Connection found in {pool_name}[{pool_id}]")
                             break
@@ -377,6 +372,7 @@ class CClientWebSocketClient:
                 nodemanager_connection.is_cluster_main_node = getattr(websocket, 'is_cluster_main_node', nodemanager_connection.is_cluster_main_node)
                 nodemanager_connection.is_channel_main_node = getattr(websocket, 'is_channel_main_node', nodemanager_connection.is_channel_main_node)
             
+            self.node_manager.bump_revision()
             self.logger.info(f"🔗 ✅ Connection status sync completed")
             return True
             
@@ -431,7 +427,7 @@ class CClientWebSocketClient:
                 ('channel_pool', self.node_manager.channel_pool)
             ]:
                 for pool_id, connections in pool.items():
-                    for conn in connections:
+                    for conn in connections.values():
                         nodemanager_connections.add(conn.websocket)
             
             # Test 4: Check for orphaned connections
@@ -839,7 +835,7 @@ class CClientWebSocketClient:
             message = await websocket.recv()
             self.logger.info(f"Received message: {message}")
             
-            data = json.loads(message)
+            data = json_provider.loads(message)
             self.logger.info(f"Parsed message data: {data}")
             self.logger.info(f"Message type: {data.get('type')}")
             
@@ -984,10 +980,9 @@ class CClientWebSocketClient:
                 # Store connection in triple pools
                 # Node-based connection pool (node_id -> list of websockets)
                 if node_id:
-                    if node_id not in self.node_connections:
-                        self.node_connections[node_id] = []
-                    self.node_connections[node_id].append(websocket)
-                    self.logger.info(f"Node connection added: {node_id} (total: {len(self.node_connections[node_id])})")
+                    node_websockets = self.node_connections.setdefault(node_id, [])
+                    node_websockets.append(websocket)
+                    self.logger.info(f"Node connection added: {node_id} (total: {len(node_websockets)})")
                     self.logger.info(f"Current node connections: {list(self.node_connections.keys())}")
                 
                 # Client-based connection pool (client_id -> list of websockets)
@@ -1161,11 +1156,11 @@ class CClientWebSocketClient:
                                 return
                     
                     # Add new connection to client pool
-                    if client_id not in self.client_connections:
-                        self.client_connections[client_id] = []
+                    client_websockets = self.client_connections.setdefault(client_id, [])
+                    if not client_websockets:
                         self.logger.info(f"Created new client pool for {client_id}")
-                    self.client_connections[client_id].append(websocket)
-                    self.logger.info(f"Client connection added: {client_id} (total: {len(self.client_connections[client_id])})")
+                    client_websockets.append(websocket)
+                    self.logger.info(f"Client connection added: {client_id} (total: {len(client_websockets)})")
                     self.logger.info(f"Current client connections: {list(self.client_connections.keys())}")
                     
                     # Print detailed client pool status
@@ -1201,8 +1196,7 @@ class CClientWebSocketClient:
                     await self.handle_node_user_switch(node_id, user_id, username, websocket)
                     
                     # Add new connection to user pool
-                    if user_id not in self.user_connections:
-                        self.user_connections[user_id] = []
+                    if not self.user_connections.setdefault(user_id, []):
                         self.logger.info(f"Created new user pool for {user_id}")
                     
                     # Clean up old connections with closed_by_logout flag before adding new one
@@ -1436,7 +1430,7 @@ class CClientWebSocketClient:
                     self.logger.info(f"Starting message processing loop for {client_id}")
                 async for message in websocket:
                     try:
-                        data = json.loads(message)
+                        data = json_provider.loads(message)
                         await self.process_c_client_message(websocket, data, client_id, user_id)
                     except json.JSONDecodeError:
                         await self.send_error(websocket, "Invalid JSON format")
@@ -1497,36 +1491,7 @@ class CClientWebSocketClient:
                 connection = None
                 
                 if node_id:
-                    self.logger.info(f"Looking for connection with node_id: {node_id}")
-                    # Search in all pools
-                    for domain_id, connections in self.node_manager.domain_pool.items():
-                        for conn in connections:
-                            if conn.node_id == node_id:
-                                connection = conn
-                                self.logger.info(f"Found connection in domain_pool[{domain_id}]")
-                                break
-                        if connection:
-                            break
-                    
-                    if not connection:
-                        for cluster_id, connections in self.node_manager.cluster_pool.items():
-                            for conn in connections:
-                                if conn.node_id == node_id:
-                                    connection = conn
-                                    self.logger.info(f"Found connection in cluster_pool[{cluster_id}]")
-                                    break
-                            if connection:
-                                break
-                    
-                    if not connection:
-                        for channel_id, connections in self.node_manager.channel_pool.items():
-                            for conn in connections:
-                                if conn.node_id == node_id:
-                                    connection = conn
-                                    self.logger.info(f"Found connection in channel_pool[{channel_id}]")
-                                    break
-                            if connection:
-                                break
+                    connection = self.node_manager.node_index.get(node_id)
                 
                 if not connection:
                     self.logger.warning(f"Could not find ClientConnection object, creating temporary one")
@@ -1571,29 +1536,28 @@ class CClientWebSocketClient:
                     self.logger.info(f"Updating connection pools for node {node_id}...")
                     # Search for connection and update its IDs
                     for domain_id, connections in self.node_manager.domain_pool.items():
-                        for conn in connections:
-                            if conn.node_id == node_id:
-                                conn.domain_id = assign_data.get('domain_id') or conn.domain_id
-                                conn.cluster_id = assign_data.get('cluster_id') or conn.cluster_id
-                                conn.channel_id = assign_data.get('channel_id') or conn.channel_id
-                                self.logger.info(f"Updated connection in domain_pool: domain={conn.domain_id}, cluster={conn.cluster_id}, channel={conn.channel_id}")
-                                
-                                # Add to cluster pool if cluster_id exists and not already there
-                                if conn.cluster_id and conn.is_cluster_main_node:
-                                    if conn.cluster_id not in self.node_manager.cluster_pool:
-                                        self.node_manager.cluster_pool[conn.cluster_id] = []
-                                    if conn not in self.node_manager.cluster_pool[conn.cluster_id]:
-                                        self.node_manager.cluster_pool[conn.cluster_id].append(conn)
-                                        self.logger.info(f"Added to cluster_pool[{conn.cluster_id}]")
-                                
-                                # Add to channel pool if channel_id exists and not already there
-                                if conn.channel_id and conn.is_channel_main_node:
-                                    if conn.channel_id not in self.node_manager.channel_pool:
-                                        self.node_manager.channel_pool[conn.channel_id] = []
-                                    if conn not in self.node_manager.channel_pool[conn.channel_id]:
-                                        self.node_manager.channel_pool[conn.channel_id].append(conn)
-                                        self.logger.info(f"Added to channel_pool[{conn.channel_id}]")
-                                break
+                        conn = connections.get(node_id)
+                        if conn is None:
+                            continue
+                        
+                        conn.domain_id = assign_data.get('domain_id') or conn.domain_id
+                        conn.cluster_id = assign_data.get('cluster_id') or conn.cluster_id
+                        conn.channel_id = assign_data.get('channel_id') or conn.channel_id
+                        self.logger.info(f"Updated connection in domain_pool: domain={conn.domain_id}, cluster={conn.cluster_id}, channel={conn.channel_id}")
+                        
+                        # Add to cluster pool if cluster_id exists and not already there
+                        # (through NodeManager so node_index and the child-pool links stay in sync)
+                        if conn.cluster_id and conn.is_cluster_main_node:
+                            if conn.node_id not in self.node_manager.cluster_pool.get(conn.cluster_id, ()):
+                                self.node_manager.add_to_cluster_pool(conn.cluster_id, conn)
+                                self.logger.info(f"Added to cluster_pool[{conn.cluster_id}]")
+                        
+                        # Add to channel pool if channel_id exists and not already there
+                        if conn.channel_id and conn.is_channel_main_node:
+                            if conn.node_id not in self.node_manager.channel_pool.get(conn.channel_id, ()):
+                                self.node_manager.add_to_channel_pool(conn.channel_id, conn)
+                                self.logger.info(f"Added to channel_pool[{conn.channel_id}]")
+                        self.node_manager.bump_revision()
                     
                     # Also update WebSocket object attributes for proper cleanup on disconnect
                     websocket.domain_id = assign_data.get('domain_id') or websocket.domain_id
@@ -1603,12 +1567,12 @@ class CClientWebSocketClient:
                     # Update main node flags based on the connection's status in NodeManager
                     # Find the connection in NodeManager to get the correct flags
                     for domain_id, connections in self.node_manager.domain_pool.items():
-                        for conn in connections:
-                            if conn.node_id == node_id:
-                                websocket.is_domain_main_node = conn.is_domain_main_node
-                                websocket.is_cluster_main_node = conn.is_cluster_main_node
-                                websocket.is_channel_main_node = conn.is_channel_main_node
-                                break
+                        conn = connections.get(node_id)
+                        if conn is not None:
+                            websocket.is_domain_main_node = conn.is_domain_main_node
+                            websocket.is_cluster_main_node = conn.is_cluster_main_node
+                            websocket.is_channel_main_node = conn.is_channel_main_node
+                            break
                     
                     self.logger.info(f"Updated WebSocket attributes: domain={websocket.domain_id}, cluster={websocket.cluster_id}, channel={websocket.channel_id}")
                     self.logger.info(f"Updated WebSocket main node flags: domain_main={websocket.is_domain_main_node}, cluster_main={websocket.is_cluster_main_node}, channel_main={websocket.is_channel_main_node}")
@@ -1855,8 +1819,7 @@ class CClientWebSocketClient:
                                 verification_result = await verification_instance.verify_user_cluster(user_id, channel_id, node_id)
                             finally:
                                 # Clean up temporary instance after verification
-                                if connection_id in self.connection_cluster_verification:
-                                    del self.connection_cluster_verification[connection_id]
+                                if self.connection_cluster_verification.pop(connection_id, None) is not None:
                                     self.logger.info(f"🔍 Cleaned up temporary verification instance")
                             
                             self.logger.info(f"===== CLUSTER VERIFICATION COMPLETED =====")
@@ -2518,6 +2481,33 @@ class CClientWebSocketClient:
         if total_removed > 0:
             self.logger.info(f"Cleaned up {total_removed} invalid connections")
     
+    def remove_user_connection(self, websocket):
+        """Remove a connection from user_connections and return the user_id it was stored under
+        
+        Connections are stored under websocket.user_id, so the owning list is found with
+        one dict lookup; the full scan is only a fallback for connections whose user_id
+        changed without the pool being updated.
+        """
+        if not getattr(self, 'user_connections', None):
+            return None
+        
+        user_id = getattr(websocket, 'user_id', None)
+        connections = self.user_connections.get(user_id)
+        if connections is None or websocket not in connections:
+            user_id = None
+            for user_id_key, websockets in self.user_connections.items():
+                if websocket in websockets:
+                    user_id, connections = user_id_key, websockets
+                    break
+            else:
+                return None
+        
+        connections.remove(websocket)
+        if not connections:
+            del self.user_connections[user_id]
+            self.logger.info(f"Removed empty user connection list for {user_id}")
+        return user_id
+    
     def remove_invalid_connection(self, websocket):
         """Remove an invalid connection from all connection pools"""
         try:
@@ -2556,15 +2546,10 @@ class CClientWebSocketClient:
                             self.logger.info(f"🔌 ✅ Removed empty client {client_id}")
             
             # Remove from user_connections
-            if hasattr(self, 'user_connections'):
-                for user_id, connections in list(self.user_connections.items()):
-                    if websocket in connections:
-                        connections.remove(websocket)
-                        removed_from.append(f"user_{user_id}")
-                        self.logger.info(f"🔌 ✅ Removed from user {user_id}")
-                        if not connections:
-                            del self.user_connections[user_id]
-                            self.logger.info(f"🔌 ✅ Removed empty user {user_id}")
+            removed_user_id = self.remove_user_connection(websocket)
+            if removed_user_id is not None:
+                removed_from.append(f"user_{removed_user_id}")
+                self.logger.info(f"🔌 ✅ Removed from user {removed_user_id}")
             
             # Log current pool states after removal
             self.logger.info(f"🔌 Pool states AFTER removal:")
@@ -2637,17 +2622,10 @@ class CClientWebSocketClient:
                     break
         
         # Remove from user connections pool
-        if hasattr(self, 'user_connections') and self.user_connections:
-            for user_id_key, websockets in list(self.user_connections.items()):
-                if websocket in websockets:
-                    websockets.remove(websocket)
-                    removed_from.append(f"user({user_id_key})")
-                    self.logger.info(f"Removed from user connections: {user_id_key}")
-                    # Clean up empty user connection lists
-                    if not websockets:
-                        del self.user_connections[user_id_key]
-                        self.logger.info(f"Removed empty user connection list for {user_id_key}")
-                    break
+        removed_user_id = self.remove_user_connection(websocket)
+        if removed_user_id is not None:
+            removed_from.append(f"user({removed_user_id})")
+            self.logger.info(f"Removed from user connections: {removed_user_id}")
         
         # Remove from client connections pool
         if hasattr(self, 'client_connections') and self.client_connections:
@@ -2814,7 +2792,7 @@ class CClientWebSocketClient:
         """Send message to C-Client"""
         if self.websocket and self.is_connected:
             try:
-                await self.websocket.send(json.dumps(message))
+                await self.websocket.send(json_provider.dumps(message))
             except Exception as e:
                 self.logger.error(f"Error sending message to C-Client: {e}")
                 self.is_connected = False
@@ -2822,7 +2800,7 @@ class CClientWebSocketClient:
     async def send_message_to_websocket(self, websocket, message):
         """Send message to specific WebSocket connection"""
         try:
-            await websocket.send(json.dumps(message))
+            await websocket.send(json_provider.dumps(message))
         except Exception as e:
             self.logger.error(f"Error sending message to WebSocket: {e}")
     
@@ -2944,12 +2922,11 @@ class CClientWebSocketClient:
         
         # Wait for all feedback with longer timeout for stability
         timeout = timeout or 10  # 10 second timeout, ensure all C-Clients have time to respond
-        start_time = asyncio.get_event_loop().time()
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
         check_interval = 0.1  # 100ms check interval
         
-        while asyncio.get_event_loop().time() - start_time < timeout:
-            elapsed = asyncio.get_event_loop().time() - start_time
-            
+        while (elapsed := loop.time() - start_time) < timeout:
             # Check if all feedback has been received
             if all(feedback_received.values()):
                 self.logger.info(f"All logout feedback received for user {user_id} in {elapsed:.2f}s")
@@ -3233,11 +3210,14 @@ class CClientWebSocketClient:
             
             # Mark this connection's feedback as received
             if hasattr(websocket, '_session_feedback_tracking'):
-                # Update the shared feedback tracking dictionary
+                # Resolve this connection's future in the shared feedback tracking dictionary.
+                # The sender may be waiting on a different event loop (Flask thread), so
+                # hand the result over thread-safely.
                 feedback_dict = websocket._session_feedback_tracking
-                feedback_dict[websocket] = True
+                feedback = feedback_dict.get(websocket)
+                if feedback is not None and not feedback.done() and not feedback.get_loop().is_closed():
+                    feedback.get_loop().call_soon_threadsafe(_resolve_feedback, feedback)
                 self.logger.info(f"Marked session feedback as received for this connection")
-                self.logger.info(f"Feedback tracking status: {sum(feedback_dict.values())} / {len(feedback_dict)} received")
             else:
                 self.logger.warning(f"No feedback tracking found for this connection, feedback may be ignored")
             
@@ -3257,10 +3237,16 @@ class CClientWebSocketClient:
     
     def get_nsn_root_url(self):
         """Get NSN root URL based on current environment"""
-        # Use the config manager instead of directly reading config file
-        from utils.config_manager import get_nsn_base_url
-        base_url = get_nsn_base_url()
-        return base_url if base_url.endswith('/') else f"{base_url}/"
+        # Only re-resolve when the runtime environment overrides change
+        cache_key = (os.environ.get('B_CLIENT_ENVIRONMENT'), os.environ.get('NSN_PRODUCTION_URL'))
+        root_url = _nsn_root_url_cache.get(cache_key)
+        if root_url is None:
+            # Use the config manager instead of directly reading config file
+            from utils.config_manager import get_nsn_base_url
+            base_url = get_nsn_base_url()
+            root_url = base_url if base_url.endswith('/') else f"{base_url}/"
+            _nsn_root_url_cache[cache_key] = root_url
+        return root_url
     
     async def sync_session(self, user_id, session_data):
         """Sync session data with C-Client"""
@@ -3301,7 +3287,7 @@ class CClientWebSocketClient:
                         else:
                             self.logger.info(f"🔍 [Session Send] Single user detected ({total_users}), no message field needed")
                         
-                        await websocket.send(json.dumps(message))
+                        await websocket.send(json_provider.dumps(message))
                         self.logger.info(f"Session data sent to C-Client for user {user_id}")
                     except Exception as e:
                         self.logger.error(f"Failed to send session to C-Client: {e}")
@@ -3434,7 +3420,7 @@ class CClientWebSocketClient:
                 }
             }
             
-            await websocket.send(json.dumps(response))
+            await websocket.send(json_provider.dumps(response))
             security_logger.info(f"📱 Security code response sent: success={success}")
             
         except Exception as e:
@@ -31,6 +31,77 @@ def init_websocket_server(ws_module, async_module, ws_client):
 # Global flag to track if WebSocket server has been started
 websocket_server_started = False
 
+# Periodic coroutines that run on the loop serving WebSockets (registered by app.py)
+background_task_factories = []
+background_task_loop = None
+background_task_lock = threading.Lock()
+background_task_fallback = None
+
+# Seconds to wait for a WebSocket loop to claim the background tasks before they get a loop thread
+# of their own (processes that never serve WebSockets locally, e.g. run.py outside local mode)
+BACKGROUND_TASK_FALLBACK_DELAY = 30.0
+
+
+def register_background_task(factory):
+    """Register a coroutine function to run on the WebSocket event loop once it is up"""
+    with background_task_lock:
+        background_task_factories.append(factory)
+        loop = background_task_loop
+    
+    # Loop is already running (server thread started first): schedule it there directly
+    if loop is not None:
+        loop.call_soon_threadsafe(lambda: loop.create_task(factory()))
+
+
+def start_background_tasks(loop):
+    """Schedule registered background tasks on loop (only once per process); returns True if loop claimed them"""
+    global background_task_loop
+    
+    with background_task_lock:
+        if background_task_loop is not None:
+            return False
+        background_task_loop = loop
+        factories = list(background_task_factories)
+    
+    for factory in factories:
+        loop.create_task(factory())
+    logger.info(f"Started {len(factories)} background task(s) on WebSocket event loop")
+    return True
+
+
+def schedule_background_task_fallback(delay=BACKGROUND_TASK_FALLBACK_DELAY):
+    """Run the background tasks on a dedicated loop thread if no WebSocket loop claims them within delay seconds"""
+    global background_task_fallback
+    
+    with background_task_lock:
+        if background_task_fallback is not None or background_task_loop is not None:
+            return
+        background_task_fallback = threading.Timer(delay, _run_background_task_thread)
+        background_task_fallback.daemon = True
+        background_task_fallback.name = "BackgroundTasks"
+    background_task_fallback.start()
+
+
+def _run_background_task_thread():
+    """Fallback loop for background tasks in a process without a WebSocket event loop"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if not start_background_tasks(loop):
+        # A WebSocket loop claimed them in the meantime
+        loop.close()
+        return
+    
+    logger.info("No WebSocket event loop claimed the background tasks - running them on a fallback thread")
+    loop.run_forever()
+
+def enable_eager_tasks(loop):
+    """Run new tasks on loop eagerly (Python 3.12+): tasks that finish without blocking skip the scheduler"""
+    eager_task_factory = getattr(asyncio, 'eager_task_factory', None)
+    if eager_task_factory is not None:
+        loop.set_task_factory(eager_task_factory)
+        logger.info("Eager task factory enabled on WebSocket event loop")
+
+
 def start_websocket_server():
     """Start WebSocket server for C-Client connections in background thread"""
     global websocket_server_started
@@ -51,6 +122,7 @@ def start_websocket_server():
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
+            enable_eager_tasks(loop)
             # B-Client as server, use configured address and port
             host = c_client_ws.config.get('server_host', '0.0.0.0')
             port = c_client_ws.config.get('server_port', 8766)
@@ -60,6 +132,7 @@ def start_websocket_server():
             server = loop.run_until_complete(c_client_ws.start_server(host=host, port=port))
             if server:
                 logger.info(f"WebSocket server started successfully on {host}:{port}")
+                start_background_tasks(loop)
                 # Keep the server running
                 loop.run_forever()
             else:
@@ -0,0 +1,7 @@
+"""
+Shared test setup: make the B-Client modules importable from the repo root
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
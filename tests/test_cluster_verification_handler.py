@@ -0,0 +1,58 @@
+"""
+Tests for the cluster verification handler's DB pool lookups
+"""
+import asyncio
+
+import pytest
+
+flask = pytest.importorskip('flask')
+flask_sqlalchemy = pytest.importorskip('flask_sqlalchemy')
+from sqlalchemy import text
+
+from services import cluster_verification_handler as handler_module
+from services import sync_data_queries
+
+
+@pytest.fixture
+def app_and_db():
+    app = flask.Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    database = flask_sqlalchemy.SQLAlchemy(app)
+    with app.app_context():
+        database.session.execute(text(
+            "CREATE TABLE sync_data (id INTEGER PRIMARY KEY, batch_id TEXT, channel_id TEXT, "
+            "user_id TEXT, created_at TIMESTAMP)"
+        ))
+        database.session.execute(text(
+            "INSERT INTO sync_data (batch_id, channel_id, user_id, created_at) VALUES "
+            "('batch-1', 'channel-1', 'user-1', '2025-01-01 00:00:00'), "
+            "('batch-1', 'channel-1', 'user-1', '2025-01-01 00:00:01')"
+        ))
+        database.session.commit()
+    sync_data_queries.init_sync_data_queries(database)
+    handler_module._first_record_cache.clear()
+    yield app, database
+    sync_data_queries.sync_data_queries = None
+    handler_module._first_record_cache.clear()
+
+
+def test_first_record_lookup_runs_on_db_pool(app_and_db):
+    """A cache-miss lookup runs on a pool thread (no app context of its own) and still reads the DB"""
+    app, database = app_and_db
+    handler = handler_module.ClusterVerificationHandler(None, database, app)
+    
+    record = asyncio.run(handler._get_first_record('batch-1'))
+    
+    assert record is not None
+    assert record['batch_id'] == 'batch-1'
+    assert record['user_id'] == 'user-1'
+    assert handler_module._first_record_cache['batch-1'] == record
+    handler._db_pool.shutdown(wait=True)
+
+
+def test_handler_defaults_to_current_app(app_and_db):
+    app, database = app_and_db
+    with app.app_context():
+        handler = handler_module.ClusterVerificationHandler(None, database)
+    assert handler.app is app
+    handler._db_pool.shutdown(wait=True)
@@ -0,0 +1,70 @@
+"""
+Tests for the NSN login cookie upsert
+"""
+from datetime import datetime
+
+import pytest
+
+flask = pytest.importorskip('flask')
+pytest.importorskip('flask_sqlalchemy')
+
+from services.db_operations import store_login_cookie
+from services.models import db, UserCookie
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _rows(user_id):
+    db.session.expire_all()
+    return {row.username: row for row in UserCookie.query.filter_by(user_id=user_id)}
+
+
+def test_first_login_inserts_cookie(app):
+    store_login_cookie(db, UserCookie, 'u1', 'alice', '{"v": 1}', datetime(2025, 1, 1, 12, 0))
+    
+    rows = _rows('u1')
+    assert list(rows) == ['alice']
+    assert rows['alice'].cookie == '{"v": 1}'
+    assert rows['alice'].auto_refresh is True
+    assert rows['alice'].refresh_time == datetime(2025, 1, 1, 12, 0)
+    assert rows['alice'].create_time is not None
+
+
+def test_repeat_login_updates_cookie_and_keeps_creation_data(app):
+    store_login_cookie(db, UserCookie, 'u1', 'alice', '{"v": 1}', datetime(2025, 1, 1, 12, 0))
+    row = _rows('u1')['alice']
+    row.node_id = 'node-1'
+    row.create_time = created = datetime(2024, 6, 1)
+    db.session.commit()
+    
+    store_login_cookie(db, UserCookie, 'u1', 'alice', '{"v": 2}', datetime(2025, 1, 2, 12, 0))
+    
+    rows = _rows('u1')
+    assert list(rows) == ['alice']
+    assert rows['alice'].cookie == '{"v": 2}'
+    assert rows['alice'].refresh_time == datetime(2025, 1, 2, 12, 0)
+    assert rows['alice'].create_time == created
+    assert rows['alice'].node_id == 'node-1'
+
+
+def test_username_change_replaces_old_rows(app):
+    store_login_cookie(db, UserCookie, 'u1', 'alice', '{"v": 1}', datetime(2025, 1, 1, 12, 0))
+    store_login_cookie(db, UserCookie, 'u2', 'bob', '{"v": 1}', datetime(2025, 1, 1, 12, 0))
+    
+    store_login_cookie(db, UserCookie, 'u1', 'alice2', '{"v": 2}', datetime(2025, 1, 2, 12, 0))
+    
+    rows = _rows('u1')
+    assert list(rows) == ['alice2']
+    assert rows['alice2'].cookie == '{"v": 2}'
+    # Other users' cookies are untouched
+    assert list(_rows('u2')) == ['bob']
@@ -0,0 +1,25 @@
+"""
+Tests for the orjson-backed JSON helpers
+"""
+import json
+
+import pytest
+
+pytest.importorskip('flask')
+
+from utils import json_provider
+
+
+def test_dumps_stringifies_non_str_keys_like_stdlib():
+    payload = {'type': 'sync', 'counts': {1: 'a', 2: 'b'}}
+    
+    encoded = json_provider.dumps(payload)
+    
+    assert isinstance(encoded, str)
+    assert json.loads(encoded) == json.loads(json.dumps(payload))
+
+
+def test_loads_round_trip():
+    payload = {'request_id': 'notify-1', 'data': {'nodes': [1, 2, 3]}}
+    assert json_provider.loads(json_provider.dumps(payload)) == payload
+    assert json_provider.loads(json_provider.dumps(payload).encode('utf-8')) == payload
@@ -0,0 +1,142 @@
+"""
+Tests for NodeManager pool bookkeeping and C-Client command sends
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('websockets')
+pytest.importorskip('flask')
+pytest.importorskip('sqlalchemy')  # services package imports the sync_data queries
+
+from services.nodeManager import NodeManager
+
+
+class FakeWebSocket:
+    """Stand-in for a C-Client websocket: records sent frames, closed on demand"""
+    
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+    
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def test_send_to_c_client_encodes_non_str_keys():
+    """A command with int dict keys is sent (keys stringified) instead of failing to encode"""
+    async def scenario():
+        manager = NodeManager()
+        websocket = FakeWebSocket()
+        connection, _ = manager.register_connection(websocket, {
+            'nmp_node_id': 'node-1', 'nmp_domain_id': 'd1', 'nmp_cluster_id': 'c1', 'nmp_channel_id': 'h1',
+        })
+        
+        send = asyncio.create_task(manager.send_to_c_client(
+            connection, {'type': 'count_peers_amount', 'data': {1: 'one'}}))
+        await asyncio.sleep(0)
+        assert len(websocket.sent) == 1
+        assert '"1":"one"' in websocket.sent[0]
+        
+        request_id = next(iter(manager.pending_requests))
+        await manager.handle_c_client_response(connection, {'request_id': request_id, 'success': True})
+        return await send
+    
+    response = asyncio.run(scenario())
+    assert response['success'] is True
+
+
+def _register(manager, websocket, node_id, main=False, **hierarchy):
+    """register_connection with a full domain/cluster/channel hierarchy (main: main node at every level)"""
+    params = {
+        'nmp_node_id': node_id,
+        'nmp_domain_id': hierarchy.get('domain_id', 'd1'),
+        'nmp_cluster_id': hierarchy.get('cluster_id', 'c1'),
+        'nmp_channel_id': hierarchy.get('channel_id', 'h1'),
+    }
+    if main:
+        params.update(nmp_domain_main_node_id=node_id, nmp_cluster_main_node_id=node_id,
+                      nmp_channel_main_node_id=node_id)
+    connection, needs_assignment = manager.register_connection(websocket, params)
+    assert not needs_assignment
+    return connection
+
+
+def test_reconnect_before_drain_keeps_node():
+    """A disconnect followed by a reconnect in the same tick does not remove the reconnected node"""
+    async def scenario():
+        manager = NodeManager()
+        old_websocket = FakeWebSocket()
+        connection = _register(manager, old_websocket, 'node-1')
+        
+        old_websocket.closed = True
+        manager.schedule_removal(connection)
+        new_websocket = FakeWebSocket()
+        reconnected = _register(manager, new_websocket, 'node-1')
+        await asyncio.sleep(0)  # Let _drain_removals run
+        return manager, reconnected, new_websocket
+    
+    manager, reconnected, new_websocket = asyncio.run(scenario())
+    assert manager.node_index['node-1'] is reconnected
+    assert reconnected.websocket is new_websocket
+    assert 'node-1' in manager.channel_pool['h1']
+    assert 'node-1' in manager.cluster_pool['c1']
+    assert 'node-1' in manager.domain_pool['d1']
+
+
+def test_stale_disconnect_is_removed_on_drain():
+    async def scenario():
+        manager = NodeManager()
+        websocket = FakeWebSocket()
+        connection = _register(manager, websocket, 'node-1')
+        _register(manager, FakeWebSocket(), 'node-2')
+        
+        websocket.closed = True
+        manager.schedule_removal(connection)
+        await asyncio.sleep(0)
+        return manager
+    
+    manager = asyncio.run(scenario())
+    assert 'node-1' not in manager.node_index
+    assert list(manager.channel_pool['h1']) == ['node-2']
+
+
+def test_main_node_disconnect_removes_pools_and_child_links():
+    """Removing the only (main) node deletes its channel/cluster/domain pools and their reverse links"""
+    async def scenario():
+        manager = NodeManager()
+        websocket = FakeWebSocket()
+        connection = _register(manager, websocket, 'main-1', main=True)
+        assert manager.cluster_channels == {'c1': {'h1'}}
+        assert manager.domain_clusters == {'d1': {'c1'}}
+        
+        websocket.closed = True
+        manager.schedule_removal(connection)
+        await asyncio.sleep(0)
+        return manager
+    
+    manager = asyncio.run(scenario())
+    assert manager.channel_pool == {}
+    assert manager.cluster_pool == {}
+    assert manager.domain_pool == {}
+    assert manager.cluster_channels == {}
+    assert manager.domain_clusters == {}
+    assert manager.node_index == {}
+
+
+def test_fast_path_reregister_resets_ws_closed():
+    """Re-registering a pooled node with the same hierarchy clears the remembered closed state"""
+    manager = NodeManager()
+    old_websocket = FakeWebSocket()
+    connection = _register(manager, old_websocket, 'node-1')
+    
+    old_websocket.closed = True
+    assert not manager._is_connection_valid(connection)
+    assert connection.ws_closed
+    
+    new_websocket = FakeWebSocket()
+    reconnected = _register(manager, new_websocket, 'node-1')
+    
+    assert reconnected is connection
+    assert not reconnected.ws_closed
+    assert manager._is_connection_valid(reconnected)
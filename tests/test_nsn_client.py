@@ -0,0 +1,46 @@
+"""
+Tests for the NSN keep-alive session's retry behaviour
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+from services.nsn_client import create_nsn_session
+
+
+class _UnavailableHandler(BaseHTTPRequestHandler):
+    """Answers every GET with 503 and counts the requests it saw"""
+    hits = 0
+    
+    def do_GET(self):
+        type(self).hits += 1
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def unavailable_server():
+    _UnavailableHandler.hits = 0
+    server = HTTPServer(('127.0.0.1', 0), _UnavailableHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_returns_last_503_after_retries(unavailable_server):
+    """Exhausted status retries hand back the 503 response instead of raising RetryError"""
+    session = create_nsn_session(workers=1)
+    
+    response = session.get(f"{unavailable_server}/api/health", timeout=5)
+    
+    assert response.status_code == 503
+    assert _UnavailableHandler.hits == 3  # First attempt + 2 retries
@@ -0,0 +1,52 @@
+"""
+Tests for C-Client message handling in the WebSocket client
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('websockets')
+pytest.importorskip('flask')
+pytest.importorskip('sqlalchemy')  # services package imports the sync_data queries
+
+from services.nodeManager import NodeManager
+from services.websocket_client import CClientWebSocketClient
+
+
+class FakeWebSocket:
+    """Stand-in for a C-Client websocket carrying the attributes the client sets on it"""
+    
+    def __init__(self):
+        self.closed = False
+        self.domain_id = self.cluster_id = self.channel_id = None
+    
+    async def send(self, message):
+        pass
+
+
+def test_assign_confirmed_links_new_pools():
+    """Pools created by assignConfirmed are indexed like any NodeManager pool, so the parent domain is kept"""
+    client = CClientWebSocketClient()
+    manager = client.node_manager = NodeManager()
+    websocket = FakeWebSocket()
+    connection, needs_assignment = manager.register_connection(websocket, {
+        'nmp_node_id': 'main-1', 'nmp_domain_id': 'd1', 'nmp_domain_main_node_id': 'main-1',
+    })
+    assert needs_assignment
+    connection.is_cluster_main_node = connection.is_channel_main_node = True
+    
+    asyncio.run(client.process_c_client_message(websocket, {
+        'type': 'assignConfirmed',
+        'data': {'node_id': 'main-1', 'domain_id': 'd1', 'cluster_id': 'c1', 'channel_id': 'h1'},
+    }, 'client-1'))
+    
+    assert manager.cluster_pool['c1'] == {'main-1': connection}
+    assert manager.channel_pool['h1'] == {'main-1': connection}
+    assert manager.domain_clusters == {'d1': {'c1'}}
+    assert manager.cluster_channels == {'c1': {'h1'}}
+    assert manager.node_index['main-1'] is connection
+    
+    # A peer leaving the domain does not take the domain (which still has a cluster) with it
+    peer, _ = manager.register_connection(FakeWebSocket(), {'nmp_node_id': 'peer-1', 'nmp_domain_id': 'd1'})
+    manager.remove_connection(peer)
+    assert 'd1' in manager.domain_pool
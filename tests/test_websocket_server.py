@@ -0,0 +1,59 @@
+"""
+Tests for the background task registry in the WebSocket server module
+"""
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('sqlalchemy')  # services package imports the sync_data queries
+
+from services import websocket_server
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(websocket_server, 'asyncio', asyncio)
+    monkeypatch.setattr(websocket_server, 'background_task_factories', [])
+    monkeypatch.setattr(websocket_server, 'background_task_loop', None)
+    monkeypatch.setattr(websocket_server, 'background_task_fallback', None)
+    yield websocket_server
+    
+    # Stop a fallback thread's loop so it doesn't outlive the test
+    fallback = websocket_server.background_task_fallback
+    loop = websocket_server.background_task_loop
+    if fallback is not None and loop is not None:
+        loop.call_soon_threadsafe(loop.stop)
+        fallback.join(5)
+        loop.close()
+
+
+def test_fallback_thread_runs_unclaimed_tasks(registry):
+    """Without a WebSocket loop the registered tasks still run, on the fallback thread"""
+    ran = threading.Event()
+    
+    async def task():
+        ran.set()
+    
+    registry.register_background_task(task)
+    registry.schedule_background_task_fallback(delay=0.01)
+    
+    assert ran.wait(5)
+    assert registry.background_task_loop is not None
+    # Tasks are claimed once per process
+    probe_loop = asyncio.new_event_loop()
+    try:
+        assert registry.start_background_tasks(probe_loop) is False
+    finally:
+        probe_loop.close()
+
+
+def test_fallback_skipped_when_loop_claims_tasks(registry):
+    loop = asyncio.new_event_loop()
+    try:
+        assert registry.start_background_tasks(loop) is True
+        registry.schedule_background_task_fallback(delay=0.01)
+        assert registry.background_task_fallback is None
+    finally:
+        loop.close()
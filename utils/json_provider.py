@@ -0,0 +1,52 @@
+"""
+JSON Provider
+Fast JSON encoding/decoding for B-Client, backed by orjson when available
+"""
+
+# Standard library imports
+import json
+
+# Third-party imports
+from flask.json.provider import DefaultJSONProvider
+
+# Optional third-party imports
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """Serialize obj to a JSON string (orjson if installed, stdlib json otherwise)"""
+    if orjson is not None:
+        # Non-str dict keys are stringified like json.dumps does instead of raising TypeError
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj)
+
+
+def loads(data):
+    """Deserialize a JSON str/bytes payload (orjson if installed, stdlib json otherwise)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that uses orjson and falls back to the default provider"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+
+        # Let Flask's default() keep handling dates so responses don't change format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
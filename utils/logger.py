@@ -3,6 +3,8 @@ B-Client Logging System
 Unified logging management for all B-Client modules
 """
 import os
+import atexit
+import queue
 import logging
 import logging.handlers
 from datetime import datetime
@@ -32,8 +34,28 @@ class BClientLogger:
         self.security_code_log_file = self.log_dir / f"bclient_security_code_{start_time}.log"
         self.history_log_file = self.log_dir / f"bclient_history_{start_time}.log"
         
+        # Loggers only enqueue records; one background listener thread does the file/console I/O
+        # so a burst of log calls never blocks the asyncio event loop on disk or stdout writes
+        self.log_queue = queue.SimpleQueue()
+        self.formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        
+        # Console handler - show INFO and above levels for better debugging (shared by all loggers)
+        self.console_handler = logging.StreamHandler(sys.stdout)
+        self.console_handler.setLevel(logging.INFO)
+        self.console_handler.setFormatter(self.formatter)
+        self.output_handlers = [self.console_handler]
+        
         # Initialize loggers for each module
         self._setup_loggers()
+        
+        self.listener = logging.handlers.QueueListener(
+            self.log_queue, *self.output_handlers, respect_handler_level=True
+        )
+        self.listener.start()
+        atexit.register(self.listener.stop)
     
     def _setup_loggers(self):
         """Setup loggers for each module"""
@@ -117,22 +139,12 @@ class BClientLogger:
             encoding='utf-8'
         )
         file_handler.setLevel(level)
+        file_handler.setFormatter(self.formatter)
+        # The listener sees every logger's records; only write this logger's to its file
+        file_handler.addFilter(logging.Filter(name))
+        self.output_handlers.append(file_handler)
         
-        # Console handler - show INFO and above levels for better debugging
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)  # Show INFO and above levels
-        
-        # Log format
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-        
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        logger.addHandler(logging.handlers.QueueHandler(self.log_queue))
         
         return logger
     
@@ -11,6 +11,7 @@ import time
 
 # Import Flask app and WebSocket client
 from app import app, c_client_ws
+from services.websocket_server import enable_eager_tasks, start_background_tasks
 from utils.logger import get_bclient_logger
 
 # Initialize logger
@@ -34,6 +35,7 @@ def start_websocket_server_thread():
         # Create new event loop for this thread
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        enable_eager_tasks(loop)
         
         # Start WebSocket server
         websocket_server = loop.run_until_complete(
@@ -42,6 +44,7 @@ def start_websocket_server_thread():
         
         if websocket_server:
             logger.info(f"WebSocket server started successfully on port {ws_port}")
+            start_background_tasks(loop)
             # Keep server running
             loop.run_until_complete(websocket_server.wait_closed())
         else: